@@ -0,0 +1,334 @@
+"""
+Occupancy, turn and rejection analytics over the booking history, and a
+what-if simulator replaying that demand on other floor plans
+
+The reservations for a range of days, archived ones included, are loaded
+once into NumPy arrays in the order they were made. Heatmaps come from
+difference arrays over a grid of SLOT_MINUTES slots: every reservation
+holding a table adds one at the slot it starts and takes one away when the
+table is released, and a cumulative sum along time gives what is occupied
+in every slot. A table is counted as held for one conflict window after
+the reservation time, as the allocator assumes.
+
+The simulator books every request again, in the order it was made, at the
+smallest table of the alternative layout that has no booking within the
+turn duration on either side, as assign_tables does with CONFLICT_WINDOW.
+Only single tables are used, so parties larger than every table are lost.
+
+NumPy is an optional dependency; without it AVAILABLE is False and the
+endpoint and command say so.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, type_coerce
+
+from models import db, Table, TableTurn, Reservation, ReservationArchive
+from availability import CONFLICT_WINDOW
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+AVAILABLE = np is not None
+
+SLOT_MINUTES = 30
+
+# Reservations that kept their table until the end of the turn
+HELD_STATUSES = ('confirmed', 'seated')
+TURN_MINUTES = int(CONFLICT_WINDOW.total_seconds() // 60)
+
+
+def _minutes(values):
+    """
+    Datetimes, or the ISO strings SQLite stores them as, as datetime64
+    minutes; missing ones are NaT
+    """
+    return np.array(values, dtype='datetime64[s]').astype('datetime64[m]')
+
+
+class History:
+    """
+    The reservations for times in [start, end), whole days, as arrays with
+    one entry per reservation in the order they were made
+
+    rows are (id, created_at, reservation_time, party_size, status,
+    table_id or 0, joined_table_ids) and tables (id, table_number, capacity)
+    ordered by id.
+    """
+
+    def __init__(self, start, end, rows, tables):
+        self.start = start
+        self.end = end
+        self.days = (end - start).days
+        self.table_ids, self.table_numbers, self.capacities = (
+            np.array(column, dtype=np.int64) for column in (zip(*tables) if tables else ((), (), ())))
+
+        ids, created, times, party_sizes, statuses, table_ids, joined = zip(*rows) if rows else ((),) * 7
+        times = _minutes(times)
+        # Archived rows may have no created_at; they were made no later than their time
+        created = _minutes(created)
+        created = np.where(np.isnat(created), times, created)
+        order = np.lexsort((np.array(ids, dtype=np.int64), created))
+
+        self.times = (times - _minutes([start])[0]).astype(np.int64)[order]
+        self.party_sizes = np.array(party_sizes, dtype=np.int64)[order]
+        statuses = np.array(statuses, dtype=str)[order]
+        table_ids = np.array(table_ids, dtype=np.int64)[order]
+        self.cancelled = statuses == 'cancelled'
+        self.held = np.isin(statuses, HELD_STATUSES)
+        self.no_show = statuses == 'no_show'
+        self.rejected = (table_ids == 0) & ~self.cancelled
+
+        # One (reservation, table index) pair per table held, joined ones included
+        joined = np.array(joined, dtype=object)[order]
+        with_joined = np.flatnonzero(joined).tolist()
+        rows = np.flatnonzero(table_ids)
+        table_ids = table_ids[rows]
+        if with_joined:
+            rows = np.concatenate((rows, [i for i in with_joined for _ in joined[i].split(',')]))
+            table_ids = np.concatenate((table_ids, [int(table_id) for i in with_joined
+                                                    for table_id in joined[i].split(',')]))
+        tables, known = self.table_index(table_ids)
+        self.pair_rows = rows[known].astype(np.int64)
+        self.pair_tables = tables[known]
+
+    def __len__(self):
+        return len(self.times)
+
+    def table_index(self, table_ids):
+        """
+        The position of each table id in the table arrays, and whether that
+        table still exists
+        """
+        table_ids = np.asarray(table_ids, dtype=np.int64)
+        if not len(self.table_ids):
+            return np.zeros(len(table_ids), dtype=np.int64), np.zeros(len(table_ids), dtype=bool)
+        tables = np.minimum(np.searchsorted(self.table_ids, table_ids), len(self.table_ids) - 1)
+        return tables, self.table_ids[tables] == table_ids
+
+
+def load_history(start, end):
+    """
+    Load the reservations, live and archived, for the days from start up to
+    but not including end
+    """
+    # Plain Core rows, with times read as stored and parsed by NumPy in one go
+    connection = db.session.connection()
+    rows = []
+    for model in (Reservation, ReservationArchive):
+        rows.extend(connection.execute(select(
+            model.id, type_coerce(model.created_at, db.String), type_coerce(model.reservation_time, db.String),
+            model.party_size, func.coalesce(model.status, 'pending'), func.coalesce(model.table_id, 0),
+            model.joined_table_ids
+        ).where(model.reservation_time >= start, model.reservation_time < end)).all())
+    tables = db.session.execute(select(Table.id, Table.table_number, Table.capacity).order_by(Table.id)).all()
+    return History(start, end, rows, tables)
+
+
+def _slot_of_day(minutes, slot_minutes):
+    return (minutes % 1440) // slot_minutes
+
+
+def occupancy(history, slot_minutes=SLOT_MINUTES, turn_minutes=TURN_MINUTES):
+    """
+    Tables held in every slot of the range, as a (tables, slots) array of 0/1,
+    and the covers in the house in every slot
+    """
+    slots = history.days * 1440 // slot_minutes
+    held = history.held[history.pair_rows]
+    rows = history.pair_rows[held]
+    tables = history.pair_tables[held]
+    first = np.clip(history.times[rows] // slot_minutes, 0, slots)
+    last = np.clip(-(-(history.times[rows] + turn_minutes) // slot_minutes), 0, slots)
+
+    counts = np.zeros((len(history.table_ids), slots + 1), dtype=np.int32)
+    np.add.at(counts, (tables, first), 1)
+    np.add.at(counts, (tables, last), -1)
+    tables_held = (np.cumsum(counts, axis=1)[:, :slots] > 0).astype(np.int8)
+
+    # Covers are counted once per reservation, not once per joined table
+    first = np.clip(history.times[history.held] // slot_minutes, 0, slots)
+    last = np.clip(-(-(history.times[history.held] + turn_minutes) // slot_minutes), 0, slots)
+    covers = np.bincount(first, history.party_sizes[history.held], minlength=slots + 1)
+    covers -= np.bincount(last, history.party_sizes[history.held], minlength=slots + 1)
+    return tables_held, np.cumsum(covers)[:slots]
+
+
+def summary(history, slot_minutes=SLOT_MINUTES, heatmaps=True):
+    """
+    Demand, rejection and turn figures for the range, per table and per slot
+    of the day, with occupancy heatmaps when heatmaps is set
+    """
+    slots_per_day = 1440 // slot_minutes
+    demand = ~history.cancelled
+    tables_held, covers = occupancy(history, slot_minutes)
+    seats = int(history.capacities.sum())
+
+    # Slot by slot, then folded into days x slots of the day
+    by_day = tables_held.reshape(len(history.table_ids), history.days, slots_per_day)
+    table_occupancy = by_day.mean(axis=1)
+    seat_use = covers.reshape(history.days, slots_per_day) / max(seats, 1)
+    weekdays = (np.arange(history.days) + history.start.weekday()) % 7
+    weekday_days = np.bincount(weekdays, minlength=7)
+    by_weekday = np.zeros((7, slots_per_day))
+    np.add.at(by_weekday, weekdays, seat_use)
+    by_weekday /= np.maximum(weekday_days, 1)[:, None]
+
+    slot_of_day = _slot_of_day(history.times, slot_minutes)
+    requested = np.bincount(slot_of_day[demand], minlength=slots_per_day)
+    rejected = np.bincount(slot_of_day[history.rejected], minlength=slots_per_day)
+
+    booked = history.held[history.pair_rows]
+    per_table_bookings = np.bincount(history.pair_tables[booked], minlength=len(history.table_ids))
+    per_table_covers = np.bincount(history.pair_tables[booked], history.party_sizes[history.pair_rows[booked]],
+                                   minlength=len(history.table_ids))
+    turns = table_turns(history)
+
+    result = {
+        'start': history.start.date().isoformat(),
+        'end': history.end.date().isoformat(),
+        'days': history.days,
+        'slot_minutes': slot_minutes,
+        'requests': int(demand.sum()),
+        'covers_requested': int(history.party_sizes[demand].sum()),
+        'rejected': int(history.rejected.sum()),
+        'covers_lost': int(history.party_sizes[history.rejected].sum()),
+        'rejection_rate': _rate(history.rejected.sum(), demand.sum()),
+        'no_show_rate': _rate(history.no_show.sum(), (demand & ~history.rejected).sum()),
+        'seat_utilization': round(float(seat_use.mean()), 4),
+        'rejection_rate_by_slot': [_rate(r, n) for r, n in zip(rejected.tolist(), requested.tolist())],
+        'tables': [{
+            'table_number': int(number),
+            'capacity': int(capacity),
+            'occupancy': round(float(table_occupancy[i].mean()), 4),
+            'bookings_per_day': round(per_table_bookings[i] / history.days, 3),
+            'covers_per_day': round(per_table_covers[i] / history.days, 3),
+            'fill': _rate(per_table_covers[i], per_table_bookings[i] * capacity),
+            'turns_per_day': round(turns[0][i] / history.days, 3),
+            'mean_turn_minutes': round(float(turns[1][i]), 1)
+        } for i, (number, capacity) in enumerate(zip(history.table_numbers.tolist(), history.capacities.tolist()))]
+    }
+    if heatmaps:
+        result['table_occupancy'] = np.round(table_occupancy, 3).tolist()
+        result['seat_utilization_by_weekday'] = np.round(by_weekday, 3).tolist()
+    return result
+
+
+def table_turns(history):
+    """
+    Turns per table over the range and their mean length in minutes, from the
+    recorded seatings of reservations and walk-ins alike
+    """
+    rows = db.session.execute(select(
+        TableTurn.table_id, type_coerce(TableTurn.seated_at, db.String), type_coerce(TableTurn.freed_at, db.String)
+    ).where(TableTurn.seated_at >= history.start, TableTurn.seated_at < history.end)).all()
+    table_ids, seated_at, freed_at = zip(*rows) if rows else ((), (), ())
+    tables, known = history.table_index(table_ids)
+    lengths = (_minutes(freed_at) - _minutes(seated_at)).astype(np.int64)
+    count = np.bincount(tables[known], minlength=len(history.table_ids)).astype(float)
+    total = np.bincount(tables[known], lengths[known], minlength=len(history.table_ids)).astype(float)
+    return count, np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+
+
+def _rate(part, whole):
+    return round(float(part) / float(whole), 4) if whole else 0.0
+
+
+def simulate(history, capacities, turn_minutes=TURN_MINUTES):
+    """
+    Book every non-cancelled request of history again on tables of the given
+    capacities, holding each for turn_minutes on either side of its time
+    """
+    capacities = np.sort(np.asarray(capacities, dtype=np.int64))
+    demand = ~history.cancelled
+    times = history.times[demand]
+    party_sizes = history.party_sizes[demand]
+
+    # Only the requested times are ever checked, so the grid is just those,
+    # and where each request looks and what it blocks is found up front
+    moments = np.unique(times)
+    at = np.searchsorted(moments, times).tolist()
+    lows = np.searchsorted(moments, times - turn_minutes, side='left').tolist()
+    highs = np.searchsorted(moments, times + turn_minutes, side='right').tolist()
+    fitting = np.searchsorted(capacities, party_sizes, side='left').tolist()
+
+    # The replay itself is sequential; each moment keeps a bitmask of the
+    # blocked tables, smallest capacity in the lowest bit
+    every_table = (1 << len(capacities)) - 1
+    large_enough = [every_table >> first << first for first in range(len(capacities) + 1)]
+    blocked = [0] * len(moments)
+    seated = []
+    for moment, low, high, first in zip(at, lows, highs, fitting):
+        free = large_enough[first] & ~blocked[moment]
+        if free:
+            table = free & -free
+            for other in range(low, high):
+                blocked[other] |= table
+        seated.append(bool(free))
+    seated = np.array(seated, dtype=bool)
+
+    lost = ~seated
+    return {
+        'layout': capacities.tolist(),
+        'seats': int(capacities.sum()),
+        'turn_minutes': turn_minutes,
+        'requests': int(len(times)),
+        'rejected': int(lost.sum()),
+        'covers_seated': int(party_sizes[seated].sum()),
+        'covers_lost': int(party_sizes[lost].sum()),
+        'rejection_rate': _rate(lost.sum(), len(times)),
+        'rejected_by_party_size': {int(size): int(count) for size, count in
+                                   enumerate(np.bincount(party_sizes[lost])) if count}
+    }
+
+
+def report(start, end, layouts=(), turn_minutes=(), slot_minutes=SLOT_MINUTES, heatmaps=True):
+    """
+    The summary for [start, end) and a simulation of every layout, the
+    current one first, with every turn duration, the current one first
+    """
+    if not 1 <= slot_minutes <= 1440 or 1440 % slot_minutes:
+        raise ValueError("slot_minutes must divide a day into whole slots")
+    if any(minutes < 1 for minutes in turn_minutes):
+        raise ValueError("turn_minutes must be positive")
+    history = load_history(start, end)
+    layouts = [history.capacities.tolist()] + [list(layout) for layout in layouts]
+    durations = [TURN_MINUTES] + [minutes for minutes in turn_minutes if minutes != TURN_MINUTES]
+    result = summary(history, slot_minutes, heatmaps)
+    result['simulations'] = [simulate(history, layout, minutes) for layout in layouts for minutes in durations]
+    return result
+
+
+def day_range(days, end=None):
+    """
+    The days days before end, by default tomorrow so that today's bookings
+    count, as (start, end) midnights
+    """
+    if days < 1:
+        raise ValueError("days must be positive")
+    end = end or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    return end - timedelta(days=days), end
+
+
+def parse_layout(value, max_tables=None):
+    """
+    Turn '2,2,4x3,6' into [2, 2, 4, 4, 4, 6]
+    Raises ValueError for a layout of more than max_tables tables
+    """
+    capacities = []
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        capacity, times, count = part.partition('x')
+        count = int(count) if times else 1
+        if count < 1:
+            raise ValueError(f"Invalid layout {value!r}")
+        # Checked before the list is built, so a huge count costs nothing
+        if max_tables is not None and len(capacities) + count > max_tables:
+            raise ValueError(f"A layout can have at most {max_tables} tables")
+        capacities.extend([int(capacity)] * count)
+    if not capacities or min(capacities) < 1:
+        raise ValueError(f"Invalid layout {value!r}")
+    return capacities
@@ -0,0 +1,412 @@
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+from heapq import merge
+import threading
+import time as clock
+
+from flask import current_app
+
+from models import db, Table, Reservation, TableAdjacency
+from table_combinations import TableCombinations
+from tenancy import PerRestaurant
+import changes
+
+# A reservation blocks its table from 1.5 hours before to 1.5 hours after its start
+CONFLICT_WINDOW = timedelta(hours=1.5)
+ACTIVE_STATUSES = ('confirmed', 'pending')
+
+
+def naive(value):
+    """
+    SQLite stores datetimes without their UTC offset, so compare them the same way
+    """
+    if value is not None and value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    return value
+
+
+def reservation_tables(table_id, joined_table_ids):
+    """
+    Every table a reservation holds: table_id, then the tables joined to it
+    """
+    if table_id is None:
+        return ()
+    if not joined_table_ids:
+        return (table_id,)
+    return (table_id,) + tuple(int(joined) for joined in joined_table_ids.split(','))
+
+
+def joined_ids(table_ids):
+    """
+    The joined_table_ids value for a reservation holding table_ids
+    """
+    return ','.join(str(table_id) for table_id in table_ids[1:]) or None
+
+
+class AvailabilityIndex:
+    """
+    In-memory view of which tables are booked when
+
+    Keeps the start times of every active reservation in a sorted list per table,
+    so checking a table for a conflict is a bisect instead of a query.
+    Reservations are loaded one day at a time the first time that day is
+    searched and kept up to date from committed changes afterwards. When no
+    single table is free, groups of adjacent tables are searched with the
+    TableCombinations of the floor plan.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._tables = None      # [(capacity, table_id)] ordered smallest first
+            self._capacities = []
+            self._combinations = None
+            self._times = {}         # table_id -> sorted reservation start times
+            self._booked = {}        # reservation_id -> (table_ids, reservation_time)
+            self._days = set()       # dates whose reservations have been loaded
+
+    def _load_tables(self):
+        rows = db.session.query(Table.id, Table.capacity).order_by(Table.capacity, Table.id).all()
+        self._tables = [(capacity, table_id) for table_id, capacity in rows]
+        self._capacities = [capacity for capacity, _ in self._tables]
+        pairs = db.session.query(TableAdjacency.table_id, TableAdjacency.adjacent_id).all()
+        self._combinations = TableCombinations(self._tables, pairs, current_app.config['MAX_COMBINED_TABLES'])
+
+    def _load_days(self, start, end):
+        days = []
+        day = start.date()
+        while day <= end.date():
+            days.append(day)
+            day += timedelta(days=1)
+
+        missing = [day for day in days if day not in self._days]
+        if not missing:
+            return
+
+        # Load the whole missing range with one query
+        range_start = datetime.combine(missing[0], time.min)
+        range_end = datetime.combine(missing[-1] + timedelta(days=1), time.min)
+        rows = db.session.query(
+            Reservation.id, Reservation.table_id, Reservation.joined_table_ids, Reservation.reservation_time
+        ).filter(
+            Reservation.table_id.isnot(None),
+            Reservation.status.in_(ACTIVE_STATUSES),
+            Reservation.reservation_time >= range_start,
+            Reservation.reservation_time < range_end
+        ).all()
+
+        for reservation_id, table_id, joined_table_ids, reservation_time in rows:
+            if reservation_time.date() not in self._days:
+                self._add(reservation_id, reservation_tables(table_id, joined_table_ids), reservation_time)
+
+        day = missing[0]
+        while day <= missing[-1]:
+            self._days.add(day)
+            day += timedelta(days=1)
+
+    def _add(self, reservation_id, table_ids, reservation_time):
+        self._booked[reservation_id] = (table_ids, reservation_time)
+        for table_id in table_ids:
+            insort(self._times.setdefault(table_id, []), reservation_time)
+
+    def _discard(self, reservation_id):
+        booked = self._booked.pop(reservation_id, None)
+        if booked is None:
+            return
+        table_ids, reservation_time = booked
+        for table_id in table_ids:
+            times = self._times.get(table_id, [])
+            i = bisect_left(times, reservation_time)
+            if i < len(times) and times[i] == reservation_time:
+                del times[i]
+
+    @staticmethod
+    def _conflicts(times, start, end):
+        if not times:
+            return False
+        i = bisect_left(times, start)
+        return i < len(times) and times[i] <= end
+
+    def _busy(self, table_id, start, end, tentative):
+        if self._conflicts(self._times.get(table_id), start, end):
+            return True
+        return bool(tentative) and self._conflicts(tentative.get(table_id), start, end)
+
+    def _find(self, party_size, reservation_time, tentative=None):
+        start = reservation_time - CONFLICT_WINDOW
+        end = reservation_time + CONFLICT_WINDOW
+        first = bisect_left(self._capacities, party_size)
+        for _, table_id in self._tables[first:]:
+            if not self._busy(table_id, start, end, tentative):
+                return (table_id,)
+        if not self._combinations:
+            return None
+        busy = self._combinations.mask(table_id for _, table_id in self._tables
+                                       if self._busy(table_id, start, end, tentative))
+        return self._combinations.find(party_size, busy)
+
+    def combinations(self):
+        """
+        The TableCombinations of the current floor plan
+        """
+        with self._lock:
+            if self._tables is None:
+                self._load_tables()
+            return self._combinations
+
+    def find_tables(self, party_size, reservation_time):
+        """
+        Return the ids of the smallest table that fits the party and has no
+        active reservation within the conflict window, as a 1-tuple, or else
+        of the free group of adjacent tables with the fewest seats that fits
+        it, or None
+        """
+        reservation_time = naive(reservation_time)
+        with self._lock:
+            if self._tables is None:
+                self._load_tables()
+            self._load_days(reservation_time - CONFLICT_WINDOW, reservation_time + CONFLICT_WINDOW)
+            return self._find(party_size, reservation_time)
+
+    def find_table_ids(self, requests):
+        """
+        Allocate a batch of (party_size, reservation_time) requests in order
+
+        Each allocation is held tentatively so later requests in the batch
+        cannot take the same tables at an overlapping time. Returns a tuple of
+        table ids as find_tables does, or None, per request; nothing is
+        recorded in the index itself.
+        """
+        requests = [(party_size, naive(reservation_time)) for party_size, reservation_time in requests]
+        if not requests:
+            return []
+
+        with self._lock:
+            if self._tables is None:
+                self._load_tables()
+            times = [reservation_time for _, reservation_time in requests]
+            self._load_days(min(times) - CONFLICT_WINDOW, max(times) + CONFLICT_WINDOW)
+
+            tentative = {}
+            table_ids = []
+            for party_size, reservation_time in requests:
+                found = self._find(party_size, reservation_time, tentative)
+                for table_id in found or ():
+                    insort(tentative.setdefault(table_id, []), reservation_time)
+                table_ids.append(found)
+            return table_ids
+
+    def invalidate(self, start, end):
+        """
+        Forget the loaded days from start to end so they are read from the
+        database again, e.g. after another worker booked a table in them
+        """
+        start, end = naive(start).date(), naive(end).date()
+        with self._lock:
+            stale = [reservation_id for reservation_id, (_, reservation_time) in self._booked.items()
+                     if start <= reservation_time.date() <= end]
+            for reservation_id in stale:
+                self._discard(reservation_id)
+            self._days = {day for day in self._days if not start <= day <= end}
+
+    def apply(self, committed):
+        """
+        Update the index from a list of committed changes
+        """
+        with self._lock:
+            for change in committed:
+                if change.model == 'Table':
+                    if change.op != 'update' or change.changed('capacity'):
+                        self._tables = None
+                    if change.op == 'delete':
+                        self._times.pop(change.id, None)
+                elif change.model == 'TableAdjacency':
+                    self._tables = None
+                elif change.model == 'Reservation':
+                    self._discard(change.id)
+                    values = change.values
+                    if change.op == 'delete' or values['table_id'] is None:
+                        continue
+                    if values['status'] not in ACTIVE_STATUSES:
+                        continue
+                    reservation_time = naive(values['reservation_time'])
+                    if reservation_time.date() in self._days:
+                        self._add(change.id, reservation_tables(values['table_id'], values['joined_table_ids']),
+                                  reservation_time)
+
+
+availability_index = PerRestaurant(AvailabilityIndex)
+changes.subscribe(availability_index.apply)
+
+
+def booked_out_intervals(times_by_table, groups):
+    """
+    Return the closed (start, end) intervals during which every group in
+    groups, each a tuple of table ids, has a table blocked by a reservation
+
+    Each start time r in times_by_table blocks its table over
+    [r - CONFLICT_WINDOW, r + CONFLICT_WINDOW]. Overlapping blocks of one
+    group are merged first so each group is counted once, then a single
+    sweep over all block edges tracks how many groups are blocked.
+    """
+    events = []
+    for group in groups:
+        start = end = None
+        times = merge(*(times_by_table.get(table_id, ()) for table_id in group))
+        for reservation_time in times:
+            if end is not None and reservation_time - CONFLICT_WINDOW <= end:
+                end = reservation_time + CONFLICT_WINDOW
+                continue
+            if end is not None:
+                events += [(start, 0), (end, 1)]
+            start, end = reservation_time - CONFLICT_WINDOW, reservation_time + CONFLICT_WINDOW
+        if end is not None:
+            events += [(start, 0), (end, 1)]
+
+    # Blocks are closed, so at equal times a start counts before an end
+    events.sort()
+    intervals = []
+    blocked = 0
+    for at, is_end in events:
+        if is_end:
+            if blocked == len(groups):
+                intervals.append((full_since, at))
+            blocked -= 1
+        else:
+            blocked += 1
+            if blocked == len(groups):
+                full_since = at
+    return intervals
+
+
+def _intersect(intervals, others):
+    """
+    The overlaps of two sorted lists of disjoint closed intervals
+    """
+    overlaps = []
+    i = j = 0
+    while i < len(intervals) and j < len(others):
+        start = max(intervals[i][0], others[j][0])
+        end = min(intervals[i][1], others[j][1])
+        if start <= end:
+            overlaps.append((start, end))
+        if intervals[i][1] < others[j][1]:
+            i += 1
+        else:
+            j += 1
+    return overlaps
+
+
+class FreeSlotSearch:
+    """
+    Finds when a party can still book during a service window
+
+    A party fits the tables of its capacity class (the smallest table
+    capacity that fits it) and larger, and the groups of adjacent tables of
+    its group class (the smallest total capacity of a group that fits it) and
+    larger. The intervals in which every table of a class, or every group of
+    a class, is booked are cached per (window, class), and the party is booked
+    out where both overlap. Cached windows are dropped when a reservation
+    inside them changes, when the tables or their adjacency change, after
+    max_age seconds, and least recently used first beyond max_entries.
+    """
+
+    def __init__(self, max_entries=1024):
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._tables = None      # [(capacity, table_id)] ordered smallest first
+            self._cache = OrderedDict()
+
+    def _cached(self, key, max_age):
+        cached = self._cache.get(key)
+        if cached is None or clock.monotonic() - cached[0] >= max_age:
+            return None
+        self._cache.move_to_end(key)
+        return cached[1]
+
+    def booked_out(self, party_size, window_start, window_end, max_age):
+        """
+        Return the closed intervals between window_start and window_end when
+        no table or group of adjacent tables that fits the party is free, or
+        None if nothing is large enough
+        """
+        combinations = availability_index.combinations()
+        with self._lock:
+            if self._tables is None:
+                rows = db.session.query(Table.id, Table.capacity).order_by(Table.capacity, Table.id).all()
+                self._tables = [(capacity, table_id) for table_id, capacity in rows]
+            tables = self._tables
+            capacities = [capacity for capacity, _ in tables]
+            first = bisect_left(capacities, party_size)
+            group_class = combinations.size_class(party_size)
+            keys = []
+            if first < len(tables):
+                keys.append((window_start, window_end, 'tables', capacities[first]))
+            if group_class is not None:
+                keys.append((window_start, window_end, 'groups', group_class))
+            if not keys:
+                return None
+            cached = [self._cached(key, max_age) for key in keys]
+            if None not in cached:
+                return _intersect(*cached) if len(cached) == 2 else cached[0]
+
+        # One query for the window, then one sweep per capacity class
+        rows = db.session.query(Reservation.table_id, Reservation.joined_table_ids, Reservation.reservation_time).filter(
+            Reservation.table_id.isnot(None),
+            Reservation.status.in_(ACTIVE_STATUSES),
+            Reservation.reservation_time >= window_start - CONFLICT_WINDOW,
+            Reservation.reservation_time <= window_end + CONFLICT_WINDOW
+        ).order_by(Reservation.reservation_time).all()
+        times_by_table = {}
+        for table_id, joined_table_ids, reservation_time in rows:
+            for held in reservation_tables(table_id, joined_table_ids):
+                times_by_table.setdefault(held, []).append(reservation_time)
+
+        now = clock.monotonic()
+        with self._lock:
+            for i, capacity in enumerate(capacities):
+                if i and capacities[i - 1] == capacity:
+                    continue
+                intervals = booked_out_intervals(times_by_table, [(table_id,) for _, table_id in tables[i:]])
+                self._cache[(window_start, window_end, 'tables', capacity)] = (now, intervals)
+            if group_class is not None:
+                groups = combinations.fitting(group_class)
+                # Without a group worth asking about, groups add no free time
+                intervals = booked_out_intervals(times_by_table, groups) if groups else [(window_start, window_end)]
+                self._cache[(window_start, window_end, 'groups', group_class)] = (now, intervals)
+            results = [self._cache[key][1] for key in keys]
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+            return _intersect(*results) if len(results) == 2 else results[0]
+
+    def apply(self, committed):
+        """
+        Drop cached windows affected by a list of committed changes
+        """
+        with self._lock:
+            for change in committed:
+                if change.model == 'Table':
+                    if change.op != 'update' or change.changed('capacity'):
+                        self._tables = None
+                        self._cache.clear()
+                elif change.model == 'TableAdjacency':
+                    self._cache.clear()
+                elif change.model == 'Reservation':
+                    times = [naive(change.values.get('reservation_time')), naive(change.previous.get('reservation_time'))]
+                    for key in list(self._cache):
+                        window_start, window_end = key[:2]
+                        if any(t is not None and window_start - CONFLICT_WINDOW <= t <= window_end + CONFLICT_WINDOW
+                               for t in times):
+                            del self._cache[key]
+
+
+free_slots = PerRestaurant(FreeSlotSearch)
+changes.subscribe(free_slots.apply)
@@ -0,0 +1,86 @@
+"""
+Time the analytics report over a year of history: loading it into arrays,
+the heatmaps and summary, and each what-if simulation
+
+The simulator is checked against a plain Python replay of the same demand
+that keeps a sorted list of booked times per table.
+
+    python -m benchmarks.analytics --reservations 100000 --days 365
+"""
+import argparse
+from bisect import bisect_left, insort
+import json
+import time
+
+from benchmarks.common import make_app, remove_database, seed_history
+import analytics
+
+LAYOUTS = ([2] * 10 + [4] * 10 + [6] * 5 + [8] * 5, [2] * 6 + [4] * 14 + [6] * 6 + [8] * 4)
+
+
+def replay(history, capacities, turn_minutes):
+    """
+    The seated count of the simulation, one request and table at a time
+    """
+    tables = sorted(capacities)
+    booked = [[] for _ in tables]
+    seated = 0
+    for minutes, party_size, cancelled in zip(history.times.tolist(), history.party_sizes.tolist(),
+                                              history.cancelled.tolist()):
+        if cancelled:
+            continue
+        for i, capacity in enumerate(tables):
+            if capacity < party_size:
+                continue
+            times = booked[i]
+            j = bisect_left(times, minutes - turn_minutes)
+            if j == len(times) or times[j] > minutes + turn_minutes:
+                insort(times, minutes)
+                seated += 1
+                break
+    return seated
+
+
+def timed(function):
+    started = time.perf_counter()
+    value = function()
+    return value, round(time.perf_counter() - started, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reservations', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--turn-minutes', default='75,90,120')
+    args = parser.parse_args()
+
+    app, path = make_app([(10, 2), (10, 4), (5, 6), (5, 8)])
+    seed_history(path, args.reservations, days=args.days)
+    turns = [int(minutes) for minutes in args.turn_minutes.split(',')]
+    result = {'config': vars(args)}
+    with app.app_context():
+        start, end = analytics.day_range(args.days)
+        history, result['load_seconds'] = timed(lambda: analytics.load_history(start, end))
+        summary, result['summary_seconds'] = timed(lambda: analytics.summary(history))
+        result['requests'] = summary['requests']
+        result['simulations'] = []
+        for layout in LAYOUTS:
+            for minutes in turns:
+                simulated, seconds = timed(lambda: analytics.simulate(history, layout, minutes))
+                reference, reference_seconds = timed(lambda: replay(history, layout, minutes))
+                result['simulations'].append({
+                    'seats': simulated['seats'],
+                    'turn_minutes': minutes,
+                    'rejection_rate': simulated['rejection_rate'],
+                    'seconds': seconds,
+                    'python_replay_seconds': reference_seconds,
+                    'matches_replay': simulated['requests'] - simulated['rejected'] == reference
+                })
+        _, result['report_seconds'] = timed(lambda: analytics.report(
+            start, end, LAYOUTS[1:], [minutes for minutes in turns if minutes != analytics.TURN_MINUTES]))
+    remove_database(path)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Time GET /api/availability against probing every candidate start time with
+its own free-table query, on a busy day, and check both give the same slots
+
+    python -m benchmarks.availability --bookings 400 --history 100000
+"""
+import argparse
+import json
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import make_app, seed_history, remove_database
+from availability import free_slots, ACTIVE_STATUSES, CONFLICT_WINDOW
+from models import db, Table, Reservation
+
+PARTY_SIZES = (2, 4, 6, 8)
+
+
+def seed_day(path, day, bookings, seed=3):
+    """
+    Book random tables at random quarter hours between 11:00 and 22:00 on day,
+    stored the way SQLAlchemy writes datetimes so range bounds compare exactly
+    """
+    rng = random.Random(seed)
+    connection = sqlite3.connect(path)
+    table_ids = [table_id for (table_id,) in connection.execute('SELECT id FROM "table"')]
+    rows = []
+    for i in range(bookings):
+        reservation_time = (day + timedelta(hours=11, minutes=15 * rng.randrange(45))).isoformat(' ', 'microseconds')
+        rows.append((f"Diner {i}", f"777{i:07d}", '', 2, reservation_time, reservation_time,
+                     rng.choice(('confirmed', 'confirmed', 'pending', 'cancelled')), rng.choice(table_ids)))
+    connection.executemany(
+        "INSERT INTO reservation (customer_name, phone_number, email, party_size, reservation_time, created_at, status, table_id) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    connection.commit()
+    connection.close()
+
+
+def probe_slots(party_size, day, granularity):
+    """
+    One query per candidate time asking whether any fitting table is free
+    """
+    slots = []
+    candidate = day + timedelta(hours=11)
+    while candidate <= day + timedelta(hours=22):
+        busy = db.session.query(Reservation.table_id).filter(
+            Reservation.table_id.isnot(None),
+            Reservation.status.in_(ACTIVE_STATUSES),
+            Reservation.reservation_time.between(candidate - CONFLICT_WINDOW, candidate + CONFLICT_WINDOW)
+        )
+        if Table.query.filter(Table.capacity >= party_size, ~Table.id.in_(busy)).first():
+            slots.append(candidate.isoformat())
+        candidate += timedelta(minutes=granularity)
+    return slots
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return round((time.perf_counter() - started) / repeat * 1000, 3), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=400, help="reservations on the searched day")
+    parser.add_argument('--history', type=int, default=100000, help="past reservations to seed")
+    parser.add_argument('--granularity', type=int, default=15, help="minutes between candidate times")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app, path = make_app([(10, 2), (10, 4), (6, 6), (4, 8)])
+    seed_history(path, args.history)
+    day = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=7)
+    seed_day(path, day, args.bookings)
+    client = app.test_client()
+
+    def endpoint(party_size):
+        url = f'/api/availability?party_size={party_size}&date={day.date()}&granularity={args.granularity}'
+        return client.get(url).get_json()['slots']
+
+    result = {'config': vars(args)}
+    with app.app_context():
+        for party_size in PARTY_SIZES:
+            probe_ms, expected = timed(lambda: probe_slots(party_size, day, args.granularity), args.repeat)
+            db.session.remove()
+
+            def cold():
+                free_slots.reset()
+                return endpoint(party_size)
+
+            cold_ms, cold_slots = timed(cold, args.repeat)
+            warm_ms, warm_slots = timed(lambda: endpoint(party_size), args.repeat)
+            result[f'party_of_{party_size}'] = {
+                'free_slots': len(expected),
+                'probe_per_slot_ms': probe_ms,
+                'endpoint_cold_ms': cold_ms,
+                'endpoint_cached_ms': warm_ms,
+                'matches': cold_slots == expected and warm_slots == expected
+            }
+    remove_database(path)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
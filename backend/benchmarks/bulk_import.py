@@ -0,0 +1,73 @@
+"""
+Compare importing reservations one POST at a time with POST /reservations/bulk
+
+    python -m benchmarks.bulk_import --rows 2000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import make_app, remove_database
+
+
+def generate_rows(count, seed=1):
+    rng = random.Random(seed)
+    start = datetime(2030, 1, 1, 17, 0)
+    rows = []
+    for i in range(count):
+        slot = start + timedelta(days=rng.randrange(30), minutes=15 * rng.randrange(20))
+        rows.append({
+            'customer_name': f"Guest {i}",
+            'phone_number': f"555{i:07d}",
+            'party_size': rng.choice((1, 2, 2, 3, 4, 4, 5, 6, 8)),
+            'reservation_time': slot.isoformat()
+        })
+    return rows
+
+
+def run_single(rows, tables):
+    app, path = make_app(tables)
+    client = app.test_client()
+    started = time.perf_counter()
+    for row in rows:
+        client.post('/api/reservations', json=row)
+    elapsed = time.perf_counter() - started
+    remove_database(path)
+    return elapsed
+
+
+def run_bulk(rows, tables, ndjson=False):
+    app, path = make_app(tables)
+    client = app.test_client()
+    started = time.perf_counter()
+    if ndjson:
+        body = '\n'.join(json.dumps(row) for row in rows)
+        client.post('/api/reservations/bulk', data=body, content_type='application/x-ndjson')
+    else:
+        client.post('/api/reservations/bulk', json=rows)
+    elapsed = time.perf_counter() - started
+    remove_database(path)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--tables', type=int, default=30, help="number of tables of each size (2, 4, 6, 8)")
+    args = parser.parse_args()
+
+    tables = [(args.tables, capacity) for capacity in (2, 4, 6, 8)]
+    rows = generate_rows(args.rows)
+    results = {'rows': args.rows}
+    for name, runner in (('single', lambda: run_single(rows, tables)),
+                         ('bulk_json', lambda: run_bulk(rows, tables)),
+                         ('bulk_ndjson', lambda: run_bulk(rows, tables, ndjson=True))):
+        elapsed = runner()
+        results[name] = {'seconds': round(elapsed, 3), 'rows_per_second': round(args.rows / elapsed, 1)}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
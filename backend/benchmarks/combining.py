@@ -0,0 +1,103 @@
+"""
+Time finding tables for large parties as the floor plan grows, on a busy day
+
+Each floor has rows of ten tables, every table adjacent to its neighbours in
+the row and to the table behind it. For every size the day is booked with
+single-table reservations, then a search for a party too large for any one
+table is timed on its own and through GET /api/availability. Each group
+found is checked against the database: free, and no free group with fewer
+seats exists.
+
+    python -m benchmarks.combining --tables 50,200,500 --bookings-per-table 4
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import make_app, remove_database
+from benchmarks.availability import seed_day
+from availability import availability_index, free_slots, ACTIVE_STATUSES, CONFLICT_WINDOW
+from models import db, Reservation, TableAdjacency
+
+CAPACITIES = (2, 2, 4, 4, 6)
+ROW = 10
+
+
+def floor_plan(count):
+    tables = [(1, CAPACITIES[i % len(CAPACITIES)]) for i in range(count)]
+    pairs = [(i, i + 1) for i in range(1, count) if i % ROW] + [(i, i + ROW) for i in range(1, count - ROW + 1)]
+    return tables, pairs
+
+
+def check(group, party_size, reservation_time, combinations):
+    busy = {table_id for (table_id,) in db.session.query(Reservation.table_id).filter(
+        Reservation.status.in_(ACTIVE_STATUSES),
+        Reservation.reservation_time.between(reservation_time - CONFLICT_WINDOW, reservation_time + CONFLICT_WINDOW)
+    )}
+    seats = lambda tables: sum(combinations.capacity_of[table_id] for table_id in tables)
+    best = min((seats(other) for other in combinations
+                if seats(other) >= party_size and not busy & set(other)), default=None)
+    if group is None:
+        return best is None
+    return not busy & set(group) and seats(group) == best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tables', default='50,200,500', help="comma separated floor sizes")
+    parser.add_argument('--bookings-per-table', type=int, default=4)
+    parser.add_argument('--party-size', type=int, default=14)
+    parser.add_argument('--searches', type=int, default=200)
+    args = parser.parse_args()
+
+    day = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    rng = random.Random(5)
+    result = {'config': vars(args)}
+    for count in [int(size) for size in args.tables.split(',')]:
+        tables, pairs = floor_plan(count)
+        app, path = make_app(tables)
+        seed_day(path, day, count * args.bookings_per_table)
+        with app.app_context():
+            db.session.add_all([TableAdjacency(table_id=a, adjacent_id=b) for a, b in pairs])
+            db.session.commit()
+            availability_index.reset()
+
+            started = time.perf_counter()
+            combinations = availability_index.combinations()
+            load_ms = round((time.perf_counter() - started) * 1000, 1)
+
+            times = [day + timedelta(hours=11, minutes=15 * rng.randrange(45)) for _ in range(args.searches)]
+            found = []
+            started = time.perf_counter()
+            for reservation_time in times:
+                found.append(availability_index.find_tables(args.party_size, reservation_time))
+            search_ms = (time.perf_counter() - started) * 1000 / args.searches
+
+            correct = all(check(group, args.party_size, reservation_time, combinations)
+                          for group, reservation_time in list(zip(found, times))[:20])
+            db.session.remove()
+
+        client = app.test_client()
+        url = f'/api/availability?party_size={args.party_size}&date={day.date().isoformat()}'
+        free_slots.reset()
+        started = time.perf_counter()
+        slots = client.get(url).json['slots']
+        availability_ms = round((time.perf_counter() - started) * 1000, 1)
+        remove_database(path)
+
+        result[f'{count}_tables'] = {
+            'groups': len(combinations),
+            'floor_plan_load_ms': load_ms,
+            'search_ms': round(search_ms, 3),
+            'found': sum(group is not None for group in found),
+            'correct': correct,
+            'availability_cold_ms': availability_ms,
+            'free_slots': len(slots)
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+# Allow running as `python -m benchmarks.<name>` from the backend directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from models import db, Table
+import storage
+from availability import availability_index, free_slots
+from dashboard import dashboard_counters
+from wait_times import wait_estimator
+from response_cache import response_cache
+from routes import api
+
+
+def open_app(path, **config):
+    """
+    Build an app with the API blueprint on an existing SQLite file
+    config overrides settings, e.g. STORAGE_PROFILE='default'
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+    app.config.update(config)
+    db.init_app(app)
+    storage.init_app(app)
+    app.register_blueprint(api, url_prefix='/api')
+    return app
+
+
+def remove_database(path):
+    """
+    Delete a benchmark database along with its WAL and shared-memory files
+    """
+    for name in (path, path + '-wal', path + '-shm'):
+        if os.path.exists(name):
+            os.remove(name)
+
+
+def make_app(tables=((2, 2), (2, 4), (1, 6), (1, 8)), **config):
+    """
+    Build an app with the API blueprint on a fresh SQLite file
+    tables is a sequence of (count, capacity) pairs to seed
+    """
+    path = tempfile.mktemp(prefix='bench_', suffix='.db')
+    app = open_app(path, **config)
+
+    with app.app_context():
+        db.create_all()
+        number = 1
+        for count, capacity in tables:
+            for _ in range(count):
+                db.session.add(Table(table_number=number, capacity=capacity))
+                number += 1
+        db.session.commit()
+    availability_index.reset()
+    free_slots.reset()
+    dashboard_counters.reset()
+    wait_estimator.reset()
+    response_cache.reset()
+    return app, path
+
+
+def seed_history(path, reservations, waitlist=0, waiting=0, days=3 * 365, seed=1):
+    """
+    Bulk load synthetic history straight into the SQLite file at path:
+    reservations spread over the last days days on the existing tables,
+    waitlist parties that have already been seated or left, and waiting
+    parties who joined within the last hour
+    """
+    rng = random.Random(seed)
+    connection = sqlite3.connect(path)
+    table_ids = [table_id for (table_id,) in connection.execute('SELECT id FROM "table"')]
+    now = datetime.utcnow()
+    start = now - timedelta(days=days)
+    slots = days * 24 * 4
+
+    def reservation_rows():
+        for i in range(reservations):
+            reservation_time = (start + timedelta(minutes=15 * rng.randrange(slots))).isoformat(' ')
+            yield (f"Guest {i}", f"555{i:07d}", '', rng.randint(1, 8), reservation_time, reservation_time,
+                   rng.choice(('confirmed', 'seated', 'seated', 'cancelled', 'pending')), rng.choice(table_ids),
+                   f"guest {i}", f"555{i:07d}")
+
+    def waitlist_rows():
+        for i in range(waitlist):
+            joined_at = (start + timedelta(minutes=rng.randrange(slots * 15))).isoformat(' ')
+            yield (f"Walk-in {i}", f"444{i:07d}", '', rng.randint(1, 8), joined_at, rng.choice(('seated', 'left')), 15,
+                   f"walk-in {i}", f"444{i:07d}")
+        for i in range(waiting):
+            joined_at = (now - timedelta(minutes=rng.randrange(60))).isoformat(' ')
+            yield (f"Waiting {i}", f"333{i:07d}", '', rng.randint(1, 8), joined_at, 'waiting', 15,
+                   f"waiting {i}", f"333{i:07d}")
+
+    connection.executemany(
+        "INSERT INTO reservation (customer_name, phone_number, email, party_size, reservation_time, created_at, status, table_id, "
+        "name_key, phone_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", reservation_rows())
+    connection.executemany(
+        "INSERT INTO waitlist (customer_name, phone_number, email, party_size, joined_at, status, estimated_wait_time, "
+        "name_key, phone_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", waitlist_rows())
+    connection.commit()
+    connection.close()
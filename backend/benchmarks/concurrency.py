@@ -0,0 +1,114 @@
+"""
+Book and seat from several worker processes at once and check that no table
+was double-booked or seated twice
+
+Every process opens its own app on one shared SQLite file and books parties
+into a handful of evening slots, so workers keep competing for the same
+tables, while also walking parties in from the waitlist. Afterwards the
+database is checked for overlapping active reservations on a table and for
+more seated parties than occupied tables.
+
+    python -m benchmarks.concurrency --workers 8 --bookings 200
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import make_app, open_app, remove_database
+
+CONFLICT_SECONDS = 1.5 * 3600
+
+
+def worker(path, number, bookings, walk_ins, slots, start_at):
+    app = open_app(path)
+    client = app.test_client()
+    rng = random.Random(number)
+    statuses = {}
+
+    while time.time() < start_at:
+        time.sleep(0.001)
+    started = time.perf_counter()
+    operations = ['book'] * bookings + ['walk_in'] * walk_ins
+    rng.shuffle(operations)
+    for i, operation in enumerate(operations):
+        guest = {'customer_name': f"Worker {number}-{i}", 'phone_number': f"111{number:03d}{i:04d}",
+                 'party_size': rng.choice((2, 2, 3, 4, 4, 6))}
+        if operation == 'book':
+            slot = rng.choice(slots)
+            response = client.post('/api/reservations', json=dict(guest, reservation_time=slot))
+            key = f"book {response.status_code} {(response.get_json() or {}).get('status')}"
+        else:
+            response = client.post('/api/waitlist', json=guest)
+            key = f"walk_in {response.status_code} {'seated' if 'message' in (response.get_json() or {}) else 'waiting'}"
+        statuses[key] = statuses.get(key, 0) + 1
+    return time.perf_counter() - started, statuses
+
+
+def check(path):
+    """
+    Count overlapping active reservations per table and compare seated
+    walk-ins with occupied tables
+    """
+    connection = sqlite3.connect(path)
+    rows = connection.execute(
+        "SELECT table_id, reservation_time FROM reservation "
+        "WHERE table_id IS NOT NULL AND status IN ('confirmed', 'pending') ORDER BY table_id, reservation_time"
+    ).fetchall()
+    double_booked = 0
+    for (table_id, time_a), (other_id, time_b) in zip(rows, rows[1:]):
+        gap = datetime.fromisoformat(time_b) - datetime.fromisoformat(time_a)
+        if table_id == other_id and gap.total_seconds() <= CONFLICT_SECONDS:
+            double_booked += 1
+    seated = connection.execute("SELECT COUNT(*) FROM waitlist WHERE status = 'seated'").fetchone()[0]
+    occupied = connection.execute('SELECT COUNT(*) FROM "table" WHERE is_occupied').fetchone()[0]
+    connection.close()
+    return {
+        'confirmed': len(rows),
+        'double_booked': double_booked,
+        'seated_walk_ins': seated,
+        'occupied_tables': occupied,
+        'seated_twice': max(0, seated - occupied)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=8, help="processes booking at the same time")
+    parser.add_argument('--bookings', type=int, default=200, help="reservation requests per worker")
+    parser.add_argument('--walk-ins', type=int, default=10, help="waitlist parties per worker")
+    parser.add_argument('--slots', type=int, default=4, help="distinct reservation times competed for")
+    parser.add_argument('--tables', type=int, default=40, help="tables of each capacity 2, 4, 6 and 8")
+    args = parser.parse_args()
+
+    app, path = make_app([(args.tables, capacity) for capacity in (2, 4, 6, 8)])
+    evening = datetime.utcnow().replace(hour=18, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    slots = [(evening + timedelta(minutes=30 * i)).isoformat() for i in range(args.slots)]
+
+    start_at = time.time() + 1
+    with multiprocessing.Pool(args.workers) as pool:
+        results = pool.starmap(worker, [(path, number, args.bookings, args.walk_ins, slots, start_at)
+                                        for number in range(args.workers)])
+
+    statuses = {}
+    for _, counts in results:
+        for key, count in counts.items():
+            statuses[key] = statuses.get(key, 0) + count
+    elapsed = max(seconds for seconds, _ in results)
+    requests = args.workers * (args.bookings + args.walk_ins)
+    result = {
+        'config': vars(args),
+        'seconds': round(elapsed, 2),
+        'requests_per_second': round(requests / elapsed, 1),
+        'responses': dict(sorted(statuses.items())),
+        'check': check(path)
+    }
+    remove_database(path)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Time looking a guest up by phone and by name through GET /api/guests/search
+against downloading every reservation and waitlist entry and filtering them,
+and time a booking retried with the same Idempotency-Key
+
+    python -m benchmarks.guests --reservations 100000 --waitlist 20000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from benchmarks.common import make_app, remove_database, seed_history
+from guests import prefix_filter
+from models import db, Reservation
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for i in range(repeat):
+        function(i)
+    return round((time.perf_counter() - started) / repeat * 1000, 3)
+
+
+def download_all(client):
+    """
+    Every reservation, page by page, and the whole waitlist
+    """
+    rows = []
+    cursor = None
+    while True:
+        response = client.get('/api/reservations?limit=1000' + (f'&cursor={cursor}' if cursor else ''))
+        rows.extend(response.json)
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+    return rows, client.get('/api/waitlist').json
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reservations', type=int, default=100000)
+    parser.add_argument('--waitlist', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    app, path = make_app(RESPONSE_CACHE_SECONDS=0)
+    seed_history(path, args.reservations, waitlist=args.waitlist)
+    client = app.test_client()
+    rng = random.Random(3)
+    phones = [f"555{rng.randrange(args.reservations):07d}"[:8] for _ in range(args.repeat)]
+    names = [f"Guest {rng.randrange(args.reservations)}"[:9] for _ in range(args.repeat)]
+
+    with app.app_context():
+        query = db.session.query(Reservation.id).filter(prefix_filter(Reservation.phone_key, '5551234'))
+        plan = db.session.execute(text('EXPLAIN QUERY PLAN ' + str(query.statement.compile(
+            compile_kwargs={'literal_binds': True})))).all()
+
+    started = time.perf_counter()
+    reservations, waitlist = download_all(client)
+    matches = [row for row in reservations + waitlist if row['phone_number'].startswith(phones[0])]
+    download_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    tomorrow = datetime.utcnow().replace(hour=19, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    booking = {'customer_name': "Retry", 'phone_number': "555 000 1111", 'party_size': 2,
+               'reservation_time': tomorrow.isoformat()}
+    first_ms = timed(lambda i: client.post('/api/reservations', json=booking, headers={'Idempotency-Key': 'retry'}), 1)
+    replay_ms = timed(lambda i: client.post('/api/reservations', json=booking, headers={'Idempotency-Key': 'retry'}),
+                      args.repeat)
+    with app.app_context():
+        retry_rows = Reservation.query.filter_by(customer_name="Retry").count()
+
+    result = {
+        'config': vars(args),
+        'query_plan': [row[-1] for row in plan],
+        'download_and_filter_ms': download_ms,
+        'download_matches': len(matches),
+        'search_phone_ms': timed(lambda i: client.get(f'/api/guests/search?q={phones[i]}&limit=20'), args.repeat),
+        'search_name_ms': timed(lambda i: client.get(f'/api/guests/search?q={names[i]}&limit=20'), args.repeat),
+        'search_matches': len(client.get(f'/api/guests/search?q={phones[0]}&limit=50').json['reservations']),
+        'booking_first_ms': first_ms,
+        'booking_replayed_ms': replay_ms,
+        'rows_after_retries': retry_rows
+    }
+    remove_database(path)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Time the hot-path queries on large databases before and after the index migration
+
+    python -m benchmarks.indexes --sizes 10000,100000,1000000
+"""
+import argparse
+import json
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import make_app, seed_history, remove_database
+from models import db, Table, Reservation, Waitlist
+from migrations import upgrade
+
+TABLE_LAYOUT = [(20, 2), (20, 4), (12, 6), (8, 8)]
+REPEAT = 200
+
+
+def hot_queries(rng):
+    """
+    The queries issued by allocation, wait estimates, the dashboard and the
+    reservation list, keyed by name
+    """
+    now = datetime.utcnow()
+    table_ids = [table_id for (table_id,) in db.session.query(Table.id)]
+
+    def conflict_check():
+        reservation_time = now - timedelta(minutes=15 * rng.randrange(4 * 24 * 365))
+        Reservation.query.filter(
+            Reservation.table_id == rng.choice(table_ids),
+            Reservation.status.in_(['confirmed', 'pending']),
+            Reservation.reservation_time.between(reservation_time - timedelta(hours=1.5),
+                                                 reservation_time + timedelta(hours=1.5))
+        ).first()
+
+    def wait_estimate():
+        Waitlist.query.filter(
+            Waitlist.status == 'waiting',
+            Waitlist.party_size <= rng.randint(1, 8),
+            Waitlist.joined_at < now
+        ).count()
+
+    def waiting_list():
+        Waitlist.query.filter(Waitlist.status == 'waiting').order_by(Waitlist.joined_at).all()
+
+    def today_count():
+        Reservation.query.filter(
+            Reservation.reservation_time >= now.replace(hour=0, minute=0, second=0),
+            Reservation.reservation_time < now.replace(hour=23, minute=59, second=59)
+        ).count()
+
+    def free_table():
+        Table.query.filter(Table.capacity >= rng.randint(1, 8), Table.is_occupied == False).order_by(Table.capacity).first()
+
+    def reservation_page():
+        since = now - timedelta(days=rng.randrange(3 * 365))
+        Reservation.query.filter(Reservation.reservation_time >= since) \
+            .order_by(Reservation.reservation_time, Reservation.id).limit(100).all()
+
+    return {
+        'conflict_check': conflict_check,
+        'wait_estimate': wait_estimate,
+        'waiting_list': waiting_list,
+        'today_count': today_count,
+        'free_table': free_table,
+        'reservation_page': reservation_page
+    }
+
+
+def time_queries(repeat):
+    results = {}
+    for name, query in hot_queries(random.Random(7)).items():
+        started = time.perf_counter()
+        for _ in range(repeat):
+            query()
+            db.session.rollback()
+        results[name] = round((time.perf_counter() - started) * 1000 / repeat, 3)
+    return results
+
+
+def run(size, repeat):
+    app, path = make_app(TABLE_LAYOUT)
+
+    # Start from the schema as it was before the indexes existed
+    connection = sqlite3.connect(path)
+    for (name,) in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'ix_%'").fetchall():
+        connection.execute(f"DROP INDEX {name}")
+    connection.commit()
+    connection.close()
+    seed_history(path, size, waitlist=size // 10, waiting=size // 10000)
+
+    with app.app_context():
+        before = time_queries(repeat)
+        started = time.perf_counter()
+        upgrade(db.engine)
+        migration_seconds = round(time.perf_counter() - started, 2)
+        after = time_queries(repeat)
+        db.session.remove()
+
+    remove_database(path)
+    return {
+        'migration_seconds': migration_seconds,
+        'queries_ms': {name: {'before': before[name], 'after': after[name]} for name in before}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='10000,100000,1000000', help="comma separated reservation counts")
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="runs per query, averaged")
+    args = parser.parse_args()
+
+    results = {}
+    for size in (int(size) for size in args.sizes.split(',')):
+        results[size] = run(size, args.repeat)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
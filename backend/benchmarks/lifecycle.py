@@ -0,0 +1,53 @@
+"""
+Time the first lifecycle sweep over a long history and the hot-path queries
+before and after it moved closed rows into the archive tables
+
+    python -m benchmarks.lifecycle --history 1000000 --days 1095
+"""
+import argparse
+import json
+import time
+
+from benchmarks.common import make_app, seed_history, remove_database
+from benchmarks.indexes import TABLE_LAYOUT, time_queries
+from lifecycle import lifecycle_sweeper
+from models import db, Reservation, Waitlist
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--history', type=int, default=1000000, help="reservations to seed")
+    parser.add_argument('--days', type=int, default=3 * 365, help="days of history they span")
+    parser.add_argument('--repeat', type=int, default=200, help="runs per query, averaged")
+    parser.add_argument('--batch', type=int, default=1000, help="rows per sweep transaction")
+    args = parser.parse_args()
+
+    app, path = make_app(TABLE_LAYOUT, LIFECYCLE_SWEEP=False, SWEEP_BATCH_SIZE=args.batch)
+    lifecycle_sweeper.init_app(app)
+    seed_history(path, args.history, waitlist=args.history // 10, waiting=args.history // 10000, days=args.days)
+
+    with app.app_context():
+        live_before = {'reservations': Reservation.query.count(), 'waitlist': Waitlist.query.count()}
+        before = time_queries(args.repeat)
+        started = time.perf_counter()
+        swept = lifecycle_sweeper.sweep()
+        sweep_seconds = round(time.perf_counter() - started, 2)
+        started = time.perf_counter()
+        lifecycle_sweeper.sweep()
+        steady_ms = round((time.perf_counter() - started) * 1000, 1)
+        live_after = {'reservations': Reservation.query.count(), 'waitlist': Waitlist.query.count()}
+        after = time_queries(args.repeat)
+        db.session.remove()
+
+    remove_database(path)
+    print(json.dumps({
+        'config': vars(args),
+        'first_sweep': dict(swept, seconds=sweep_seconds),
+        'steady_sweep_ms': steady_ms,
+        'live_rows': {'before': live_before, 'after': live_after},
+        'queries_ms': {name: {'before': before[name], 'after': after[name]} for name in before}
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+"""
+Drive the reservation API with concurrent clients and report latency per endpoint
+
+Seeds a synthetic restaurant into a fresh SQLite file and runs the API
+in-process through the Flask test client, or targets a running server with
+--url (nothing is seeded then). Each client loops over a weighted mix of
+operations until the duration is up:
+
+  poll      GET tables, reservations (from today), waitlist and dashboard
+  book      POST /api/reservations within the next week
+  waitlist  POST /api/waitlist
+  seat      PUT /api/tables/<id> toggling is_occupied
+
+Results are printed as JSON (and written to --output); pass an earlier
+result file as --baseline to get the relative change per endpoint.
+
+    python -m benchmarks.loadtest --clients 8 --duration 20 --output bench_output.json
+    python -m benchmarks.loadtest --url http://localhost:5000 --baseline bench_output.json
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+
+from benchmarks.common import make_app, seed_history, remove_database
+
+
+def parse_pairs(value, cast=int):
+    """
+    Parse 'a=1,b=2' (or 'a:1,b:2') into [(a, 1), (b, 2)]
+    """
+    pairs = []
+    for item in value.split(','):
+        key, _, amount = item.replace(':', '=').partition('=')
+        pairs.append((key.strip(), cast(amount)))
+    return pairs
+
+
+class FlaskTransport:
+    """
+    Sends requests through a Flask test client, one per thread
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, body=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpTransport:
+    """
+    Sends requests to a running server over HTTP
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status, json.loads(response.read() or 'null')
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+
+class Recorder:
+    """
+    Collects latencies and errors per endpoint
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, endpoint, seconds, ok):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, duration):
+        def percentile(values, fraction):
+            return round(values[min(len(values) - 1, int(len(values) * fraction))] * 1000, 3)
+
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            endpoints[endpoint] = {
+                'requests': len(values),
+                'errors': self.errors.get(endpoint, 0),
+                'requests_per_second': round(len(values) / duration, 1),
+                'p50_ms': percentile(values, 0.5),
+                'p99_ms': percentile(values, 0.99)
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        return {
+            'endpoints': endpoints,
+            'total': {
+                'requests': total,
+                'errors': sum(self.errors.values()),
+                'requests_per_second': round(total / duration, 1)
+            }
+        }
+
+
+class Client:
+    """
+    One simulated host stand or booking channel
+    """
+
+    def __init__(self, transport, recorder, table_ids, rng):
+        self.transport = transport
+        self.recorder = recorder
+        self.table_ids = table_ids
+        self.rng = rng
+
+    def call(self, endpoint, method, path, body=None):
+        started = time.perf_counter()
+        try:
+            status, data = self.transport.request(method, path, body)
+        except Exception:
+            status, data = 599, None
+        self.recorder.record(endpoint, time.perf_counter() - started, status < 400)
+        return data
+
+    def guest(self):
+        number = self.rng.randrange(10 ** 7)
+        return {
+            'customer_name': f"Load {number}",
+            'phone_number': f"222{number:07d}",
+            'party_size': self.rng.choice((1, 2, 2, 2, 3, 4, 4, 5, 6, 8))
+        }
+
+    def poll(self):
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
+        self.call('GET /api/tables', 'GET', '/api/tables')
+        self.call('GET /api/reservations', 'GET', f'/api/reservations?from={today}')
+        self.call('GET /api/waitlist', 'GET', '/api/waitlist')
+        self.call('GET /api/dashboard', 'GET', '/api/dashboard')
+
+    def book(self):
+        slot = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + \
+            timedelta(days=self.rng.randrange(7), minutes=15 * self.rng.randrange(4 * 12))
+        self.call('POST /api/reservations', 'POST', '/api/reservations',
+                  dict(self.guest(), reservation_time=slot.isoformat()))
+
+    def waitlist(self):
+        self.call('POST /api/waitlist', 'POST', '/api/waitlist', self.guest())
+
+    def seat(self):
+        if self.table_ids:
+            table_id = self.rng.choice(self.table_ids)
+            self.call('PUT /api/tables/<id>', 'PUT', f'/api/tables/{table_id}',
+                      {'is_occupied': self.rng.random() < 0.5})
+
+
+def run(transport, mix, clients, duration, seed=1):
+    table_ids = [table['id'] for table in transport.request('GET', '/api/tables')[1] or []]
+    recorder = Recorder()
+    operations, weights = zip(*mix)
+    deadline = None
+    barrier = threading.Barrier(clients + 1)
+
+    def worker(number):
+        client = Client(transport, recorder, table_ids, random.Random(seed * 1000 + number))
+        barrier.wait()
+        while time.perf_counter() < deadline:
+            getattr(client, client.rng.choices(operations, weights)[0])()
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(clients)]
+    for thread in threads:
+        thread.start()
+    deadline = time.perf_counter() + duration
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    return recorder.summary(duration)
+
+
+def compare(result, baseline):
+    """
+    Relative change of each endpoint's latency and throughput against a baseline
+    """
+    def change(new, old):
+        return f"{(new - old) / old * 100:+.1f}%" if old else None
+
+    comparison = {}
+    for endpoint, stats in result['endpoints'].items():
+        old = baseline.get('endpoints', {}).get(endpoint)
+        if old:
+            comparison[endpoint] = {key: change(stats[key], old[key])
+                                    for key in ('p50_ms', 'p99_ms', 'requests_per_second')}
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="base URL of a running server instead of the in-process app")
+    parser.add_argument('--tables', default='2:10,4:10,6:6,8:4', help="capacity:count pairs to seed")
+    parser.add_argument('--history', type=int, default=50000, help="past reservations to seed")
+    parser.add_argument('--waitlist-history', type=int, default=5000, help="closed waitlist entries to seed")
+    parser.add_argument('--waiting', type=int, default=20, help="parties currently waiting")
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20, help="seconds")
+    parser.add_argument('--mix', default='poll=70,book=15,waitlist=10,seat=5', help="operation weights")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="write the JSON result to this file")
+    parser.add_argument('--baseline', help="earlier JSON result to compare against")
+    args = parser.parse_args()
+
+    mix = parse_pairs(args.mix)
+    unknown = [name for name, _ in mix if name not in ('poll', 'book', 'waitlist', 'seat')]
+    if unknown:
+        parser.error(f"unknown operations in --mix: {', '.join(unknown)}")
+
+    path = None
+    if args.url:
+        transport = HttpTransport(args.url)
+    else:
+        tables = [(count, capacity) for capacity, count in parse_pairs(args.tables)]
+        app, path = make_app(tables)
+        seed_history(path, args.history, waitlist=args.waitlist_history, waiting=args.waiting, seed=args.seed)
+        transport = FlaskTransport(app)
+
+    result = {
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'started_at': datetime.utcnow().isoformat()
+    }
+    result.update(run(transport, mix, args.clients, args.duration, args.seed))
+    if path:
+        remove_database(path)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            result['compared_to_baseline'] = compare(result, json.load(f))
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Time booking, waitlist and list requests without instrumentation, with
+request and SQL metrics, and with the slow-request profiler sampling as well
+
+    python -m benchmarks.metrics --repeat 300
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import make_app, remove_database
+from metrics import request_metrics
+from profiler import slow_request_profiler
+
+# Metrics hook every engine once enabled, so the plain run goes first
+MODES = (
+    ('plain', {'METRICS': False, 'PROFILE_SLOW_REQUESTS': False}),
+    ('metrics', {'METRICS': True, 'PROFILE_SLOW_REQUESTS': False}),
+    ('metrics_and_profiler', {'METRICS': True, 'PROFILE_SLOW_REQUESTS': True, 'PROFILE_SLOW_MS': 60000}),
+)
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for i in range(repeat):
+        function(i)
+    return round((time.perf_counter() - started) / repeat * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=300)
+    args = parser.parse_args()
+
+    tomorrow = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    result = {'config': vars(args)}
+    for mode, config in MODES:
+        app, path = make_app([(10, 2), (10, 4), (6, 6), (4, 8)], **config)
+        request_metrics.init_app(app)
+        slow_request_profiler.init_app(app)
+        client = app.test_client()
+        result[mode] = {
+            'create_reservation_ms': timed(lambda i: client.post('/api/reservations', json={
+                'customer_name': f"Guest {i}", 'phone_number': f"333{i:07d}", 'party_size': 2 + i % 6,
+                'reservation_time': (tomorrow + timedelta(days=i // 40, minutes=15 * (i % 40))).isoformat()
+            }), args.repeat),
+            'add_to_waitlist_ms': timed(lambda i: client.post('/api/waitlist', json={
+                'customer_name': f"Walk-in {i}", 'phone_number': f"444{i:07d}", 'party_size': 2 + i % 6
+            }), args.repeat),
+            'get_tables_ms': timed(lambda i: client.get(f'/api/tables?fields=id,capacity&n={i}'), args.repeat)
+        }
+        remove_database(path)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Time dashboard polls of the read endpoints: rebuilding every response, a
+changed poll served from the response cache, and an unchanged poll answered
+with 304, plus the share of 304s when writes arrive between polls
+
+    python -m benchmarks.polling --history 100000 --waiting 500
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import make_app, seed_history, remove_database
+from response_cache import response_cache
+
+TODAY = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+URLS = ('/api/tables', f'/api/reservations?from={TODAY.isoformat()}', '/api/waitlist', '/api/dashboard')
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return round((time.perf_counter() - started) / repeat * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--history', type=int, default=100000, help="reservations to seed")
+    parser.add_argument('--waiting', type=int, default=500, help="parties on the waitlist")
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--polls', type=int, default=400, help="dashboard polls in the mixed run")
+    parser.add_argument('--write-every', type=int, default=10, help="polls between bookings in the mixed run")
+    args = parser.parse_args()
+
+    app, path = make_app([(10, 2), (10, 4), (6, 6), (4, 8)])
+    seed_history(path, args.history, waiting=args.waiting, days=60)
+    client = app.test_client()
+
+    def poll(url, etags=None):
+        headers = {'If-None-Match': etags[url]} if etags and url in etags else {}
+        response = client.get(url, headers=headers)
+        if etags is not None:
+            etags[url] = response.headers['ETag']
+        return response.status_code
+
+    result = {'config': vars(args)}
+    for url in URLS:
+        def rebuild():
+            response_cache.reset()
+            poll(url)
+
+        poll(url)
+        etags = {}
+        poll(url, etags)
+        result[url] = {
+            'rebuild_ms': timed(rebuild, args.repeat),
+            'cached_ms': timed(lambda: poll(url), args.repeat),
+            'not_modified_ms': timed(lambda: poll(url, etags), args.repeat)
+        }
+
+    # Poll the whole dashboard repeatedly, booking a table now and then, once
+    # rebuilding every response and once with ETags and the cache
+    for run, conditional in (('mixed_rebuild', False), ('mixed_conditional', True)):
+        rng = random.Random(1)
+        etags = {}
+        statuses = {}
+        started = time.perf_counter()
+        for i in range(args.polls):
+            if i % args.write_every == 0:
+                slot = TODAY + timedelta(days=rng.randrange(1, 30), hours=rng.randrange(11, 22))
+                client.post('/api/reservations', json={'customer_name': f"Poller {i}", 'phone_number': f"222{i:07d}",
+                                                       'party_size': rng.randint(1, 8),
+                                                       'reservation_time': slot.isoformat()})
+            for url in URLS:
+                if not conditional:
+                    response_cache.reset()
+                status = poll(url, etags if conditional else None)
+                statuses[status] = statuses.get(status, 0) + 1
+        result[run] = {
+            'ms_per_dashboard_poll': round((time.perf_counter() - started) * 1000 / args.polls, 3),
+            'responses': statuses
+        }
+    remove_database(path)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
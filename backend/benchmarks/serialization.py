@@ -0,0 +1,103 @@
+"""
+Time the list endpoints against the former ORM + to_dict + jsonify path and
+compare body sizes of the record and columnar formats
+
+Both paths must return the same records; the run fails loudly if they do not.
+
+    python -m benchmarks.serialization --rows 10000 --waiting 5000
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from flask import jsonify
+
+from benchmarks.common import make_app, seed_history, remove_database
+from models import Table, Reservation, Waitlist
+from wait_times import wait_estimator
+import serialization
+
+
+def orm_reservations(start, limit):
+    rows = Reservation.query.filter(Reservation.reservation_time >= start) \
+        .order_by(Reservation.reservation_time, Reservation.id).limit(limit).all()
+    return jsonify([row.to_dict() for row in rows])
+
+
+def orm_waitlist():
+    rows = Waitlist.query.filter(Waitlist.status == 'waiting').order_by(Waitlist.joined_at).all()
+    estimates = wait_estimator.estimates()
+    entries = []
+    for row in rows:
+        entry = row.to_dict()
+        entry['estimated_wait_time'] = estimates.get(row.id, row.estimated_wait_time)
+        entries.append(entry)
+    return jsonify(entries)
+
+
+def orm_tables():
+    return jsonify([table.to_dict() for table in Table.query.all()])
+
+
+def body(response):
+    return b''.join(response.response) if response.is_streamed else response.get_data()
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return round((time.perf_counter() - started) / repeat * 1000, 2), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000, help="reservations returned by one page")
+    parser.add_argument('--waiting', type=int, default=5000, help="parties on the waitlist")
+    parser.add_argument('--tables', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--json', action='store_true', help="encode with the json module even if orjson is installed")
+    args = parser.parse_args()
+    if args.json:
+        serialization.orjson = None
+
+    app, path = make_app([(args.tables // 4, capacity) for capacity in (2, 4, 6, 8)],
+                         RESERVATIONS_MAX_PAGE_SIZE=args.rows)
+    seed_history(path, args.rows * 2, waiting=args.waiting, days=30)
+    start = datetime.utcnow() - timedelta(days=15)
+    # Serve the former path through the client too, so both pay for dispatch
+    app.add_url_rule('/former/reservations', 'former_reservations', lambda: orm_reservations(start, args.rows))
+    app.add_url_rule('/former/waitlist', 'former_waitlist', orm_waitlist)
+    app.add_url_rule('/former/tables', 'former_tables', orm_tables)
+    client = app.test_client()
+    urls = {
+        'reservations': f'/api/reservations?from={start.isoformat()}&limit={args.rows}',
+        'waitlist': '/api/waitlist',
+        'tables': '/api/tables'
+    }
+
+    result = {'config': vars(args), 'encoder': 'orjson' if serialization.orjson else 'json'}
+    for name, url in urls.items():
+        former_ms, response = timed(lambda: body(client.get(f'/former/{name}')), args.repeat)
+        records_ms, records = timed(lambda: body(client.get(url)), args.repeat)
+        columnar_ms, columnar = timed(lambda: body(client.get(url + ('&' if '?' in url else '?') + 'format=columnar')),
+                                      args.repeat)
+
+        expected, got = json.loads(response), json.loads(records)
+        assert got == expected, f"{name}: responses differ"
+        result[name] = {
+            'rows': len(got),
+            'former_ms': former_ms,
+            'records_ms': records_ms,
+            'columnar_ms': columnar_ms,
+            'former_kb': round(len(response) / 1024, 1),
+            'records_kb': round(len(records) / 1024, 1),
+            'columnar_kb': round(len(columnar) / 1024, 1)
+        }
+    remove_database(path)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Measure worker cold start: importing the app, create_app() and the first
+request, each run in a fresh interpreter against an existing database
+
+    python -m benchmarks.startup --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import remove_database
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+app.test_client().get('/api/tables')
+served = time.perf_counter()
+print(json.dumps({'import_ms': (imported - started) * 1000, 'create_app_ms': (created - imported) * 1000,
+                  'first_request_ms': (served - created) * 1000}))
+"""
+
+
+def probe(env):
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=BACKEND, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--no-auto-migrate', action='store_true', help="set AUTO_MIGRATE=false as after `flask init-db`")
+    args = parser.parse_args()
+
+    path = tempfile.mktemp(prefix='bench_', suffix='.db')
+    env = dict(os.environ, DATABASE_URI='sqlite:///' + path)
+    if args.no_auto_migrate:
+        env['AUTO_MIGRATE'] = 'false'
+    subprocess.run([sys.executable, '-m', 'flask', 'init-db'], cwd=BACKEND, check=True, capture_output=True,
+                   env=dict(env, FLASK_APP='app:create_app'))
+
+    probe(env)
+    runs = [probe(env) for _ in range(args.runs)]
+    remove_database(path)
+
+    result = {'config': vars(args)}
+    for key in ('import_ms', 'create_app_ms', 'first_request_ms'):
+        result[key] = round(statistics.median(run[key] for run in runs), 1)
+    result['total_ms'] = round(result['import_ms'] + result['create_app_ms'] + result['first_request_ms'], 1)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
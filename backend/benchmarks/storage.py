@@ -0,0 +1,116 @@
+"""
+Compare read throughput during write bursts under the 'default' and
+'production' storage profiles
+
+For each profile a fresh SQLite file is seeded with history, then reader
+processes page through today's reservations and list the tables for the
+whole run while writer processes book reservations, one request at a time
+or in bulk batches, during its middle third. Reads per second, p99 latency
+and errors are reported separately for the quiet thirds and the write burst.
+
+    python -m benchmarks.storage --readers 4 --writers 2 --duration 15
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import make_app, open_app, seed_history, remove_database
+
+PROFILES = ('default', 'production')
+
+
+def reader(path, profile, start_at, duration):
+    client = open_app(path, STORAGE_PROFILE=profile).test_client()
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
+    samples = []
+    while time.time() < start_at:
+        time.sleep(0.001)
+    while time.time() < start_at + duration:
+        for url in (f'/api/reservations?from={today}&limit=100', '/api/tables'):
+            started = time.time()
+            try:
+                ok = client.get(url).status_code == 200
+            except Exception:
+                ok = False
+            samples.append((started - start_at, time.time() - started, ok))
+    return samples
+
+
+def writer(path, profile, number, start_at, duration, batch):
+    client = open_app(path, STORAGE_PROFILE=profile).test_client()
+    rng = random.Random(number)
+    rows = errors = 0
+    while time.time() < start_at + duration / 3:
+        time.sleep(0.001)
+    while time.time() < start_at + 2 * duration / 3:
+        slot = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(days=rng.randrange(1, 60))
+        body = [{'customer_name': f"Writer {number}", 'phone_number': f"999{number:07d}",
+                 'party_size': rng.randint(1, 8), 'reservation_time': (slot + timedelta(minutes=15 * i % 600)).isoformat()}
+                for i in range(batch)]
+        try:
+            if batch == 1:
+                response = client.post('/api/reservations', json=body[0])
+            else:
+                response = client.post('/api/reservations/bulk', json=body)
+            if response.status_code < 400:
+                rows += batch
+            else:
+                errors += 1
+        except Exception:
+            errors += 1
+    return rows, errors
+
+
+def summarize(samples, seconds):
+    window = sorted(latency for _, latency, ok in samples if ok)
+    return {
+        'reads_per_second': round(len(window) / seconds, 1),
+        'p99_ms': round(window[int(len(window) * 0.99)] * 1000, 1) if window else None,
+        'errors': sum(1 for _, _, ok in samples if not ok)
+    }
+
+
+def run(profile, args):
+    app, path = make_app([(10, 2), (10, 4), (6, 6), (4, 8)], STORAGE_PROFILE=profile)
+    seed_history(path, args.history)
+    start_at = time.time() + 2
+    with multiprocessing.Pool(args.readers + args.writers) as pool:
+        readers = [pool.apply_async(reader, (path, profile, start_at, args.duration)) for _ in range(args.readers)]
+        writers = [pool.apply_async(writer, (path, profile, number, start_at, args.duration, args.batch))
+                   for number in range(args.writers)]
+        samples = [sample for result in readers for sample in result.get()]
+        written = [result.get() for result in writers]
+    remove_database(path)
+
+    third = args.duration / 3
+    burst = [sample for sample in samples if third <= sample[0] < 2 * third]
+    quiet = [sample for sample in samples if not third <= sample[0] < 2 * third]
+    return {
+        'quiet': summarize(quiet, 2 * third),
+        'write_burst': summarize(burst, third),
+        'rows_written_per_second': round(sum(rows for rows, _ in written) / third, 1),
+        'write_errors': sum(errors for _, errors in written)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=4, help="reader processes")
+    parser.add_argument('--writers', type=int, default=2, help="writer processes during the burst")
+    parser.add_argument('--duration', type=float, default=15, help="seconds")
+    parser.add_argument('--batch', type=int, default=1, help="reservations per write request; above 1 uses the bulk endpoint")
+    parser.add_argument('--history', type=int, default=100000, help="past reservations to seed")
+    parser.add_argument('--profile', choices=PROFILES, help="run only this profile")
+    args = parser.parse_args()
+
+    result = {'config': vars(args)}
+    for profile in [args.profile] if args.profile else PROFILES:
+        result[profile] = run(profile, args)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Time one restaurant's writes while another restaurant is busy, with both
+restaurants in one SQLite file and with one file per restaurant
+
+Busy writer processes keep adding parties to the 'busy' restaurant's
+waitlist while one process adds parties to the 'quiet' restaurant's at a
+steady pace. Latency and errors of the quiet restaurant's writes are
+reported for both layouts.
+
+    python -m benchmarks.tenancy --busy-writers 3 --duration 10
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.common import Config
+from app import create_app
+
+LAYOUTS = ('shared', 'sharded')
+
+
+def build_app(directory, layout, profile):
+    # Without a {restaurant} placeholder every restaurant opens the same file
+    template = 'restaurants.db' if layout == 'shared' else 'restaurant-{restaurant}.db'
+    config = type('TenancyConfig', (Config,), {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, 'restaurants.db'),
+        'RESTAURANT_DATABASE_URI': 'sqlite:///' + os.path.join(directory, template),
+        'RESTAURANTS': 'busy,quiet',
+        'STORAGE_PROFILE': profile,
+        'AUTO_SEAT': False,
+        'LIFECYCLE_SWEEP': False
+    })
+    return create_app(config)
+
+
+def writer(directory, layout, profile, restaurant, number, start_at, duration, pause):
+    client = build_app(directory, layout, profile).test_client()
+    url = f'/api/restaurants/{restaurant}/waitlist'
+    samples = []
+    errors = 0
+    while time.time() < start_at:
+        time.sleep(0.001)
+    i = 0
+    while time.time() < start_at + duration:
+        started = time.time()
+        try:
+            ok = client.post(url, json={'customer_name': f"{restaurant} {number}", 'phone_number': f"{number:03d}{i:07d}",
+                                        'party_size': 2 + i % 6}).status_code == 201
+        except Exception:
+            ok = False
+        samples.append(time.time() - started)
+        errors += not ok
+        i += 1
+        time.sleep(pause)
+    return samples, errors
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else None
+
+
+def run(layout, args):
+    directory = tempfile.mkdtemp(prefix='bench_tenancy_')
+    client = build_app(directory, layout, args.profile).test_client()
+    # The first request of each restaurant creates its schema
+    for restaurant in ('busy', 'quiet'):
+        client.get(f'/api/restaurants/{restaurant}/tables')
+
+    start_at = time.time() + 2
+    jobs = [('busy', number, 0) for number in range(args.busy_writers)] + [('quiet', 900, args.quiet_pause)]
+    with multiprocessing.Pool(len(jobs)) as pool:
+        results = pool.starmap(writer, [(directory, layout, args.profile, restaurant, number, start_at, args.duration, pause)
+                                        for restaurant, number, pause in jobs])
+    shutil.rmtree(directory)
+
+    busy = [sample for samples, _ in results[:-1] for sample in samples]
+    quiet, quiet_errors = results[-1]
+    return {
+        'busy_writes_per_second': round(len(busy) / args.duration, 1),
+        'quiet_writes': len(quiet),
+        'quiet_errors': quiet_errors,
+        'quiet_p50_ms': round(percentile(quiet, 0.5) * 1000, 1),
+        'quiet_p99_ms': round(percentile(quiet, 0.99) * 1000, 1),
+        'quiet_max_ms': round(max(quiet) * 1000, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--busy-writers', type=int, default=3, help="processes writing to the busy restaurant")
+    parser.add_argument('--quiet-pause', type=float, default=0.05, help="seconds between the quiet restaurant's writes")
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--profile', choices=('production', 'default'), default='production', help="storage profile")
+    args = parser.parse_args()
+
+    print(json.dumps({'config': vars(args), **{layout: run(layout, args) for layout in LAYOUTS}}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
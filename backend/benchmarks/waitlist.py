@@ -0,0 +1,69 @@
+"""
+Time wait estimates on a deep waitlist: the former COUNT query per estimate
+against the in-memory estimator, for one joining party and the whole queue
+
+    python -m benchmarks.waitlist --waiting 5000 --history 200000
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+
+from benchmarks.common import make_app, seed_history, remove_database
+from models import Table, Waitlist
+from wait_times import wait_estimator
+
+
+def count_estimate(party_size):
+    """
+    The estimate calculate_wait_time used to make: 15 minutes per waiting
+    party of the same or smaller size, spread over the tables that fit
+    """
+    waiting_ahead = Waitlist.query.filter(
+        Waitlist.status == 'waiting',
+        Waitlist.party_size <= party_size,
+        Waitlist.joined_at < datetime.utcnow()
+    ).count()
+    suitable_tables = Table.query.filter(Table.capacity >= party_size).count()
+    if suitable_tables > 0:
+        return max(15, (waiting_ahead * 15) // suitable_tables)
+    return waiting_ahead * 15
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return round((time.perf_counter() - started) / repeat * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--waiting', type=int, default=5000, help="parties currently waiting")
+    parser.add_argument('--history', type=int, default=200000, help="closed waitlist entries")
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app, path = make_app([(10, 2), (10, 4), (6, 6), (4, 8)])
+    seed_history(path, 0, waitlist=args.history, waiting=args.waiting)
+
+    with app.app_context():
+        queue = Waitlist.query.filter_by(status='waiting').all()
+        wait_estimator.estimate(2)
+        result = {
+            'config': vars(args),
+            'join_ms': {
+                'count_query': timed(lambda: count_estimate(4), args.repeat),
+                'estimator': timed(lambda: wait_estimator.estimate(4), args.repeat)
+            },
+            'whole_queue_ms': {
+                'count_query': timed(lambda: [count_estimate(entry.party_size) for entry in queue], 1),
+                'estimator': timed(wait_estimator.estimates, 5)
+            }
+        }
+    remove_database(path)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Bookings per second from many concurrent clients, with every request
+committing on its own and with the write pipeline batching them
+
+Client threads of one process post reservations spread over a week of
+evenings, with the odd walk-in, under each storage profile. Afterwards the
+database is checked for double-booked tables and parties seated twice.
+
+    python -m benchmarks.write_pipeline --clients 16 --requests 100
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import make_app, remove_database
+from benchmarks.concurrency import check
+from write_pipeline import write_pipeline
+
+
+def client_thread(app, number, requests, walk_in_every, slots, barrier, latencies):
+    client = app.test_client()
+    rng = random.Random(number)
+    barrier.wait()
+    for i in range(requests):
+        guest = {'customer_name': f"Client {number}-{i}", 'phone_number': f"555{number:03d}{i:04d}",
+                 'party_size': rng.choice((2, 2, 3, 4, 4, 6))}
+        started = time.perf_counter()
+        if walk_in_every and i % walk_in_every == walk_in_every - 1:
+            response = client.post('/api/waitlist', json=guest)
+        else:
+            response = client.post('/api/reservations', json=dict(guest, reservation_time=rng.choice(slots)))
+        assert response.status_code == 201, response.data
+        latencies.append(time.perf_counter() - started)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * fraction))] * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=16, help="threads posting at the same time")
+    parser.add_argument('--requests', type=int, default=100, help="requests per client")
+    parser.add_argument('--walk-in-every', type=int, default=10, help="every n-th request joins the waitlist")
+    parser.add_argument('--tables', type=int, default=40, help="tables of each capacity 2, 4, 6 and 8")
+    parser.add_argument('--batch-max', type=int, default=64)
+    parser.add_argument('--batch-latency-ms', type=int, default=5)
+    args = parser.parse_args()
+
+    first = datetime.utcnow().replace(hour=17, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    slots = [(first + timedelta(days=day, minutes=30 * i)).isoformat() for day in range(7) for i in range(10)]
+
+    result = {'config': vars(args)}
+    for profile in ('default', 'production'):
+        for pipeline in (False, True):
+            app, path = make_app([(args.tables, capacity) for capacity in (2, 4, 6, 8)],
+                                 STORAGE_PROFILE=profile, WRITE_PIPELINE=pipeline,
+                                 WRITE_BATCH_MAX=args.batch_max, WRITE_BATCH_LATENCY_MS=args.batch_latency_ms)
+            write_pipeline.init_app(app)
+            barrier = threading.Barrier(args.clients + 1)
+            latencies = []
+            threads = [threading.Thread(target=client_thread,
+                                        args=(app, number, args.requests, args.walk_in_every, slots, barrier, latencies))
+                       for number in range(args.clients)]
+            for thread in threads:
+                thread.start()
+            barrier.wait()
+            started = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+            result[f"{profile}_{'pipeline' if pipeline else 'direct'}"] = {
+                'seconds': round(elapsed, 2),
+                'requests_per_second': round(len(latencies) / elapsed, 1),
+                'p50_ms': percentile(latencies, 0.5),
+                'p99_ms': percentile(latencies, 0.99),
+                'check': check(path)
+            }
+            remove_database(path)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+# Callbacks invoked with the list of committed changes
+_subscribers = []
+
+_PENDING_KEY = 'pending_changes'
+
+
+class Change:
+    """
+    A committed insert, update or delete of a model row
+    values holds the row's column values after the change (before it for deletes)
+    previous holds the old value of every column that was modified
+    """
+    __slots__ = ('model', 'op', 'id', 'values', 'previous')
+
+    def __init__(self, model, op, id, values, previous):
+        self.model = model
+        self.op = op
+        self.id = id
+        self.values = values
+        self.previous = previous
+
+    def changed(self, column):
+        return column in self.previous
+
+    def __repr__(self):
+        return f"<Change {self.op} {self.model} {self.id}>"
+
+
+def subscribe(callback):
+    """
+    Register a callback that receives a list of Change objects after every commit
+    Callbacks run outside of any transaction and must not touch the session
+    """
+    _subscribers.append(callback)
+    return callback
+
+
+def _snapshot(obj, op):
+    state = inspect(obj)
+    values = {}
+    previous = {}
+    for attr in state.mapper.column_attrs:
+        values[attr.key] = state.dict.get(attr.key)
+        if op == 'update':
+            history = state.attrs[attr.key].history
+            if history.added:
+                previous[attr.key] = history.deleted[0] if history.deleted else None
+    return values, previous
+
+
+@event.listens_for(Session, 'before_flush')
+def _load_expired(session, flush_context, instances):
+    # Rows modified after a commit only carry the changed columns; load the rest
+    # now so every Change describes the whole row
+    for obj in session.dirty:
+        state = inspect(obj)
+        unloaded = state.unloaded & set(state.mapper.column_attrs.keys())
+        if unloaded:
+            getattr(obj, next(iter(unloaded)))
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, [])
+    for op, objects in (('insert', session.new), ('update', session.dirty), ('delete', session.deleted)):
+        for obj in objects:
+            if op == 'update' and not session.is_modified(obj, include_collections=False):
+                continue
+            values, previous = _snapshot(obj, op)
+            pending.append(Change(type(obj).__name__, op, values.get('id'), values, previous))
+
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch_changes(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if not changes:
+        return
+    for callback in _subscribers:
+        callback(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop(_PENDING_KEY, None)
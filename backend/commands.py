@@ -0,0 +1,89 @@
+import json
+
+import click
+
+from sqlalchemy import select
+
+from models import db, Table
+from migrations import schema_lock, upgrade
+from lifecycle import lifecycle_sweeper
+from tenancy import restaurants, restaurant_context
+import analytics
+
+# (table_number, capacity) of the floor plan added by `flask seed`
+DEFAULT_TABLES = [(1, 2), (2, 2), (3, 4), (4, 4), (5, 6), (6, 8)]
+
+
+def seed_tables(connection):
+    """
+    Add the default tables if there are none yet, on a connection holding
+    the schema lock so that two processes cannot both add them
+    Returns the number of tables added
+    """
+    if connection.execute(select(Table.id).limit(1)).first() is not None:
+        return 0
+    connection.execute(Table.__table__.insert(), [{'table_number': number, 'capacity': capacity}
+                                                  for number, capacity in DEFAULT_TABLES])
+    return len(DEFAULT_TABLES)
+
+
+def register_commands(app):
+    # Each command runs for every restaurant unless one is named
+    restaurant_option = click.option('--restaurant', help="Only this restaurant's database")
+
+    def each_restaurant(only):
+        keys = restaurants(app.config)
+        if only is not None and only not in keys:
+            raise click.BadParameter(f"Unknown restaurant {only}", param_hint='--restaurant')
+        for restaurant in [only] if only is not None else keys:
+            with restaurant_context(app, restaurant):
+                yield restaurant
+
+    @app.cli.command('init-db')
+    @restaurant_option
+    def init_db(restaurant):
+        """Create the tables and apply pending schema migrations."""
+        for restaurant in each_restaurant(restaurant):
+            db.create_all()
+            applied = upgrade(db.engine)
+            click.echo(f"{restaurant}: " + (f"Applied migrations: {applied}" if applied else "Database is up to date"))
+
+    @app.cli.command('seed')
+    @restaurant_option
+    def seed(restaurant):
+        """Add the default tables to an empty database."""
+        for restaurant in each_restaurant(restaurant):
+            with schema_lock(db.engine) as connection:
+                added = seed_tables(connection)
+            click.echo(f"{restaurant}: " + (f"Added {added} tables" if added else "Tables already exist"))
+
+    @app.cli.command('sweep')
+    @restaurant_option
+    def sweep(restaurant):
+        """Mark no-shows, free overdue tables and archive closed rows once."""
+        for restaurant in each_restaurant(restaurant):
+            for step, count in lifecycle_sweeper.sweep().items():
+                click.echo(f"{restaurant} {step}: {count}")
+
+    @app.cli.command('analytics')
+    @restaurant_option
+    @click.option('--days', type=int, default=365, show_default=True, help="Days of history up to today")
+    @click.option('--layout', 'layouts', multiple=True, help="Table capacities to simulate, e.g. 2x4,4x6,8")
+    @click.option('--turn-minutes', type=int, multiple=True, help="Turn duration to simulate")
+    @click.option('--slot-minutes', type=int, default=analytics.SLOT_MINUTES, show_default=True)
+    @click.option('--heatmaps/--no-heatmaps', default=False, help="Include the occupancy heatmaps")
+    def analytics_report(restaurant, days, layouts, turn_minutes, slot_minutes, heatmaps):
+        """Report occupancy, turns and rejections and simulate other layouts."""
+        if not analytics.AVAILABLE:
+            raise click.ClickException("Analytics need NumPy, which is not installed")
+        try:
+            layouts = [analytics.parse_layout(layout) for layout in layouts]
+            start, end = analytics.day_range(days)
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+        for restaurant in each_restaurant(restaurant):
+            try:
+                result = analytics.report(start, end, layouts, turn_minutes, slot_minutes, heatmaps)
+            except ValueError as e:
+                raise click.ClickException(str(e))
+            click.echo(json.dumps({'restaurant': restaurant, **result}, indent=2))
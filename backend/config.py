@@ -8,4 +8,128 @@ class Config:
     # SQLite database
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URI', 'sqlite:///restaurant.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SECRET_KEY = os.getenv('SECRET_KEY', 'dev_key_for_development')
\ No newline at end of file
+    SECRET_KEY = os.getenv('SECRET_KEY', 'dev_key_for_development')
+    
+    # Further restaurants served under /api/restaurants/<restaurant>, as a comma
+    # separated list of keys, each with its own database made from the template;
+    # /api serves the 'default' restaurant from DATABASE_URI
+    RESTAURANTS = os.getenv('RESTAURANTS', '')
+    RESTAURANT_DATABASE_URI = os.getenv('RESTAURANT_DATABASE_URI', 'sqlite:///restaurant-{restaurant}.db')
+    
+    # Storage profile, see storage.py: 'production' runs SQLite in WAL mode with
+    # pooled, tuned connections; 'default' leaves SQLite as it ships
+    STORAGE_PROFILE = os.getenv('STORAGE_PROFILE', 'production')
+    
+    # Connections kept open per worker, extra ones allowed under load, and the
+    # age in seconds after which a server database connection is replaced
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    
+    # SQLite page cache and memory-mapped I/O per connection in MiB, and how long
+    # a writer waits for the lock before "database is locked" in milliseconds
+    SQLITE_CACHE_MB = int(os.getenv('SQLITE_CACHE_MB', 64))
+    SQLITE_MMAP_MB = int(os.getenv('SQLITE_MMAP_MB', 256))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    
+    # Service hours as HH:MM: the first and last times a party can be seated,
+    # and the default step between start times returned by GET /api/availability
+    SERVICE_OPENS = os.getenv('SERVICE_OPENS', '11:00')
+    SERVICE_LAST_SEATING = os.getenv('SERVICE_LAST_SEATING', '22:00')
+    AVAILABILITY_GRANULARITY_MINUTES = int(os.getenv('AVAILABILITY_GRANULARITY_MINUTES', 15))
+    
+    # How long a day's availability is served from memory before it is
+    # recomputed, bounding how stale writes from other workers can be
+    AVAILABILITY_CACHE_SECONDS = int(os.getenv('AVAILABILITY_CACHE_SECONDS', 30))
+    
+    # Most tables pushed together for one party when no single table fits it;
+    # only tables paired through PUT /api/tables/adjacency are combined
+    MAX_COMBINED_TABLES = int(os.getenv('MAX_COMBINED_TABLES', 3))
+    
+    # Shortest query and most rows per list for GET /api/guests/search
+    GUEST_SEARCH_MIN_CHARS = int(os.getenv('GUEST_SEARCH_MIN_CHARS', 3))
+    GUEST_SEARCH_LIMIT = int(os.getenv('GUEST_SEARCH_LIMIT', 50))
+    
+    # POST /api/reservations and /api/waitlist answer a retry sent with the
+    # same Idempotency-Key with the first response, kept this long and for
+    # at most this many keys
+    IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', 86400))
+    IDEMPOTENCY_MAX_KEYS = int(os.getenv('IDEMPOTENCY_MAX_KEYS', 10000))
+    
+    # Largest batch accepted by POST /api/reservations/bulk
+    BULK_RESERVATION_LIMIT = int(os.getenv('BULK_RESERVATION_LIMIT', 5000))
+    
+    # Page sizes for GET /api/reservations
+    RESERVATIONS_PAGE_SIZE = int(os.getenv('RESERVATIONS_PAGE_SIZE', 100))
+    RESERVATIONS_MAX_PAGE_SIZE = int(os.getenv('RESERVATIONS_MAX_PAGE_SIZE', 1000))
+    
+    # List responses with more rows than this are streamed in chunks of
+    # STREAM_CHUNK_ROWS rows instead of being encoded in one piece; kept
+    # below RESERVATIONS_MAX_PAGE_SIZE so full reservation pages stream too
+    STREAM_RESPONSE_ROWS = int(os.getenv('STREAM_RESPONSE_ROWS', 500))
+    STREAM_CHUNK_ROWS = int(os.getenv('STREAM_CHUNK_ROWS', 250))
+    
+    # Read responses are cached and revalidated by ETag per resource version;
+    # versions only follow this process's writes, so ETags also expire after
+    # RESPONSE_CACHE_SECONDS to pick up other workers' writes
+    RESPONSE_CACHE_SECONDS = int(os.getenv('RESPONSE_CACHE_SECONDS', 10))
+    RESPONSE_CACHE_MB = int(os.getenv('RESPONSE_CACHE_MB', 32))
+    
+    # How often the in-memory dashboard counters are re-counted from the database
+    DASHBOARD_RECONCILE_SECONDS = int(os.getenv('DASHBOARD_RECONCILE_SECONDS', 300))
+    
+    # How often the in-memory waiting queues of the wait estimator and the
+    # seating scheduler are re-read from the database to pick up other
+    # workers' changes
+    QUEUE_RELOAD_SECONDS = int(os.getenv('QUEUE_RELOAD_SECONDS', 300))
+    
+    # Attempts made to book or seat again after losing a race to another worker,
+    # and the base of the exponential random backoff between them in seconds
+    ALLOCATION_RETRIES = int(os.getenv('ALLOCATION_RETRIES', 5))
+    ALLOCATION_RETRY_DELAY = float(os.getenv('ALLOCATION_RETRY_DELAY', 0.005))
+    
+    # Longest history GET /api/analytics reads, most layout and turn
+    # duration combinations it simulates in one request, and most tables in
+    # one simulated layout
+    ANALYTICS_MAX_DAYS = int(os.getenv('ANALYTICS_MAX_DAYS', 400))
+    ANALYTICS_MAX_SIMULATIONS = int(os.getenv('ANALYTICS_MAX_SIMULATIONS', 16))
+    ANALYTICS_MAX_TABLES = int(os.getenv('ANALYTICS_MAX_TABLES', 500))
+    
+    # Funnel bookings and waitlist joins through one writer thread per
+    # restaurant, which commits up to WRITE_BATCH_MAX of them together after
+    # waiting at most WRITE_BATCH_LATENCY_MS for the batch to fill; a request
+    # whose write is not done after WRITE_TIMEOUT_SECONDS gets a 503
+    WRITE_PIPELINE = os.getenv('WRITE_PIPELINE', 'false').lower() in ('1', 'true', 'yes')
+    WRITE_BATCH_MAX = int(os.getenv('WRITE_BATCH_MAX', 64))
+    WRITE_BATCH_LATENCY_MS = int(os.getenv('WRITE_BATCH_LATENCY_MS', 5))
+    WRITE_TIMEOUT_SECONDS = float(os.getenv('WRITE_TIMEOUT_SECONDS', 10))
+    
+    # Seat waiting parties automatically as soon as a table that fits them is freed
+    AUTO_SEAT = os.getenv('AUTO_SEAT', 'true').lower() in ('1', 'true', 'yes')
+    
+    # Sweep the reservation lifecycle every SWEEP_INTERVAL_SECONDS: active
+    # reservations this long past their time become no-shows, tables occupied
+    # longer than their expected turn plus a grace period are freed, and closed
+    # rows older than ARCHIVE_AFTER_DAYS move to the archive tables in batches
+    LIFECYCLE_SWEEP = os.getenv('LIFECYCLE_SWEEP', 'true').lower() in ('1', 'true', 'yes')
+    SWEEP_INTERVAL_SECONDS = int(os.getenv('SWEEP_INTERVAL_SECONDS', 60))
+    NO_SHOW_GRACE_MINUTES = int(os.getenv('NO_SHOW_GRACE_MINUTES', 30))
+    TABLE_RELEASE_GRACE_MINUTES = int(os.getenv('TABLE_RELEASE_GRACE_MINUTES', 30))
+    ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 30))
+    SWEEP_BATCH_SIZE = int(os.getenv('SWEEP_BATCH_SIZE', 1000))
+    
+    # Record request latency and SQL statistics, served at /metrics; a request
+    # running the same statement this many times is counted as an N+1 pattern
+    METRICS = os.getenv('METRICS', 'true').lower() in ('1', 'true', 'yes')
+    N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', 10))
+    
+    # Sample the stacks of requests every PROFILE_INTERVAL_MS and write those of
+    # requests slower than PROFILE_SLOW_MS to PROFILE_DIR as flamegraph input
+    PROFILE_SLOW_REQUESTS = os.getenv('PROFILE_SLOW_REQUESTS', 'false').lower() in ('1', 'true', 'yes')
+    PROFILE_SLOW_MS = int(os.getenv('PROFILE_SLOW_MS', 500))
+    PROFILE_INTERVAL_MS = int(os.getenv('PROFILE_INTERVAL_MS', 5))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    
+    # Check the schema on the first request and create or migrate it if needed;
+    # turn off when `flask init-db` runs as a deploy step instead
+    AUTO_MIGRATE = os.getenv('AUTO_MIGRATE', 'true').lower() in ('1', 'true', 'yes')
\ No newline at end of file
@@ -0,0 +1,132 @@
+from datetime import datetime
+import threading
+import time
+
+from models import Table, Reservation, Waitlist
+from availability import naive
+from tenancy import PerRestaurant
+import changes
+
+
+def today_range(now):
+    """
+    The reservation_time range counted as today's reservations
+    """
+    return now.replace(hour=0, minute=0, second=0, microsecond=0), now.replace(hour=23, minute=59, second=59, microsecond=0)
+
+
+class DashboardCounters:
+    """
+    Dashboard figures maintained from committed changes instead of being
+    counted on every request
+
+    The counters are rebuilt from the database the first time they are read,
+    when the day rolls over and every reconcile_interval seconds, which also
+    picks up writes made by other processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._loaded = False
+            self._reconciled_at = 0
+            self._day = None
+            self.today_reservations = 0
+            self.total_tables = 0
+            self.occupied_tables = 0
+            self.waitlist_count = 0
+
+    def reconcile(self):
+        now = datetime.utcnow()
+        start, end = today_range(now)
+
+        today_reservations = Reservation.query.filter(
+            Reservation.reservation_time >= start,
+            Reservation.reservation_time < end
+        ).count()
+        total_tables = Table.query.count()
+        occupied_tables = Table.query.filter_by(is_occupied=True).count()
+        waitlist_count = Waitlist.query.filter_by(status='waiting').count()
+
+        with self._lock:
+            self._day = now.date()
+            self.today_reservations = today_reservations
+            self.total_tables = total_tables
+            self.occupied_tables = occupied_tables
+            self.waitlist_count = waitlist_count
+            self._reconciled_at = time.monotonic()
+            self._loaded = True
+
+    def summary(self, reconcile_interval):
+        """
+        Return the dashboard figures, reconciling first if they are stale
+        """
+        if not self._loaded or self._day != datetime.utcnow().date() or \
+                time.monotonic() - self._reconciled_at >= reconcile_interval:
+            self.reconcile()
+        return self.snapshot()
+
+    def snapshot(self):
+        """
+        Return the current figures without reconciling, or None if they
+        have not been loaded yet
+        """
+        with self._lock:
+            if not self._loaded:
+                return None
+            return {
+                'today_reservations': self.today_reservations,
+                'total_tables': self.total_tables,
+                'occupied_tables': self.occupied_tables,
+                'available_tables': self.total_tables - self.occupied_tables,
+                'waitlist_count': self.waitlist_count
+            }
+
+    def _is_today(self, reservation_time):
+        if reservation_time is None:
+            return False
+        start, end = today_range(datetime.combine(self._day, datetime.min.time()))
+        return start <= naive(reservation_time) < end
+
+    def apply(self, committed):
+        """
+        Update the counters from a list of committed changes
+        """
+        with self._lock:
+            if not self._loaded:
+                return
+
+            for change in committed:
+                values = change.values
+                sign = -1 if change.op == 'delete' else 1
+
+                if change.model == 'Table':
+                    if change.op == 'update':
+                        if change.changed('is_occupied'):
+                            self.occupied_tables += bool(values['is_occupied']) - bool(change.previous['is_occupied'])
+                    else:
+                        self.total_tables += sign
+                        self.occupied_tables += sign * bool(values['is_occupied'])
+
+                elif change.model == 'Reservation':
+                    if change.op == 'update':
+                        if change.changed('reservation_time'):
+                            self.today_reservations += self._is_today(values['reservation_time']) - \
+                                self._is_today(change.previous['reservation_time'])
+                    else:
+                        self.today_reservations += sign * self._is_today(values['reservation_time'])
+
+                elif change.model == 'Waitlist':
+                    if change.op == 'update':
+                        if change.changed('status'):
+                            self.waitlist_count += (values['status'] == 'waiting') - \
+                                (change.previous['status'] == 'waiting')
+                    else:
+                        self.waitlist_count += sign * (values['status'] == 'waiting')
+
+
+dashboard_counters = PerRestaurant(DashboardCounters)
+changes.subscribe(dashboard_counters.apply)
@@ -0,0 +1,47 @@
+"""
+Normalized guest keys for looking guests up at the host stand
+
+Reservations and waitlist entries keep, next to what the guest typed, an
+indexed key per field: the digits of the phone number, the lower-cased
+email and the lower-cased name with single spaces. A search turns its query
+into the same form and looks for keys starting with it as a range on the
+index (key >= prefix and key < the next prefix), which any database answers
+from the index, unlike LIKE under SQLite's default case-insensitive matching.
+"""
+import re
+
+_NOT_DIGITS = re.compile(r'\D')
+_SPACES = re.compile(r'\s+')
+_PHONE_QUERY = re.compile(r'^[\d\s()+.\-]+$')
+
+
+def phone_key(value):
+    return _NOT_DIGITS.sub('', value or '')
+
+
+def email_key(value):
+    return (value or '').strip().lower()
+
+
+def name_key(value):
+    return _SPACES.sub(' ', (value or '').strip()).casefold()
+
+
+def parse_query(value):
+    """
+    Decide which key a search is for: ('phone', digits) for something that
+    looks like a phone number, ('email', ...) when it contains @, and
+    ('name', ...) otherwise
+    """
+    if _PHONE_QUERY.match(value) and phone_key(value):
+        return 'phone', phone_key(value)
+    if '@' in value:
+        return 'email', email_key(value)
+    return 'name', name_key(value)
+
+
+def prefix_filter(column, prefix):
+    """
+    column starts with prefix, as a range the column's index can serve
+    """
+    return (column >= prefix) & (column < prefix[:-1] + chr(ord(prefix[-1]) + 1))
@@ -0,0 +1,121 @@
+"""
+Idempotency-Key support for the booking endpoints
+
+A client that may retry a POST sends a unique Idempotency-Key header with
+it. The first successful response for a key is kept, and a retry with the
+same key and body gets that response back, marked Idempotent-Replayed,
+without booking or allocating again. The same key sent with another body
+is refused with 422, and a retry that arrives while the first request is
+still running gets 409. Failed requests are not kept, so they can be retried.
+
+Responses are kept in memory for IDEMPOTENCY_TTL_SECONDS, at most
+IDEMPOTENCY_MAX_KEYS of them, oldest dropped first. Keys are per process;
+with several workers a retry is only recognised by the worker that served
+the first attempt.
+"""
+from collections import OrderedDict
+from functools import wraps
+import hashlib
+import threading
+import time
+
+from flask import Response, current_app, jsonify, make_response, request
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# Marks a key whose first request has not finished yet
+_IN_FLIGHT = object()
+
+
+class IdempotencyCache:
+    """
+    Responses by (request path, key), in the order they were stored, which
+    is also the order they expire in
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._entries = OrderedDict()   # (path, key) -> (expires, fingerprint, response or _IN_FLIGHT)
+
+    def _expire(self, now):
+        while self._entries:
+            expires, _, response = next(iter(self._entries.values()))
+            if expires > now or response is _IN_FLIGHT:
+                break
+            self._entries.popitem(last=False)
+
+    def begin(self, key, fingerprint, ttl):
+        """
+        Claim key for a new request, returning None, or return what is
+        already stored for it: (fingerprint, response or _IN_FLIGHT)
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry[1:]
+            self._entries[key] = (now + ttl, fingerprint, _IN_FLIGHT)
+            return None
+
+    def finish(self, key, fingerprint, response, ttl, max_keys):
+        """
+        Store the response for key, or release key when response is None
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            if response is None:
+                return
+            self._entries[key] = (time.monotonic() + ttl, fingerprint, response)
+            while len(self._entries) > max_keys:
+                self._entries.popitem(last=False)
+
+
+idempotency_cache = IdempotencyCache()
+
+
+def idempotent(view):
+    """
+    Decorate a POST view so a retry carrying the same Idempotency-Key gets
+    the original response back
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f"{HEADER} must be at most {MAX_KEY_LENGTH} characters"}), 400
+
+        config = current_app.config
+        ttl = config['IDEMPOTENCY_TTL_SECONDS']
+        key = (request.path, key)
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        stored = idempotency_cache.begin(key, fingerprint, ttl)
+        if stored is not None:
+            stored_fingerprint, response = stored
+            if stored_fingerprint != fingerprint:
+                return jsonify({'error': f"{HEADER} was already used for a different request"}), 422
+            if response is _IN_FLIGHT:
+                return jsonify({'error': f"A request with this {HEADER} is still in progress"}), 409
+            body, status, headers = response
+            replayed = Response(body, status=status, headers=headers)
+            replayed.headers['Idempotent-Replayed'] = 'true'
+            return replayed
+
+        response = None
+        try:
+            response = make_response(view(*args, **kwargs))
+        finally:
+            keep = response is not None and response.status_code < 400 and not response.is_streamed
+            idempotency_cache.finish(
+                key, fingerprint,
+                (response.get_data(), response.status_code, list(response.headers)) if keep else None,
+                ttl, config['IDEMPOTENCY_MAX_KEYS'])
+        return response
+    return wrapper
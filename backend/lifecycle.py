@@ -0,0 +1,194 @@
+from datetime import datetime, timedelta
+import threading
+import time
+
+from sqlalchemy import and_, literal, select
+
+from models import db, Table, Reservation, Waitlist, ReservationArchive, WaitlistArchive
+from availability import ACTIVE_STATUSES
+from live import socketio
+from table_allocation import with_retries, AllocationConflict
+from tenancy import restaurants, restaurant_context
+from wait_times import wait_estimator
+
+
+class LifecycleSweeper:
+    """
+    Periodically closes out reservations and tables nobody closed by hand
+
+    Each sweep marks active reservations more than NO_SHOW_GRACE_MINUTES past
+    their time as no_show, frees tables occupied for longer than their
+    expected turn plus TABLE_RELEASE_GRACE_MINUTES, and moves closed
+    reservations and waitlist entries older than ARCHIVE_AFTER_DAYS into the
+    archive tables, SWEEP_BATCH_SIZE rows per transaction. No-shows and freed
+    tables go through the session, so caches, live clients and automatic
+    seating see them like any other change. Rows more than a day past that,
+    and archived rows, are older than anything kept in memory, so they are
+    changed with plain statements; cached responses can show them for up to
+    RESPONSE_CACHE_SECONDS.
+
+    Runs every SWEEP_INTERVAL_SECONDS over every restaurant in a background
+    task started by the first request when LIFECYCLE_SWEEP is on, or once
+    with `flask sweep`. With AUTO_MIGRATE the task is started by the schema
+    check instead and only sweeps the restaurants whose schema it has
+    prepared.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.app = None
+        self._started = False
+        self._ready = None   # restaurants to sweep, None for all of them
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['lifecycle_sweeper'] = self
+        if app.config['LIFECYCLE_SWEEP'] and not app.config['AUTO_MIGRATE']:
+            app.before_first_request(self.start)
+
+    def schema_ready(self, restaurant):
+        """
+        Sweep restaurant from now on, starting the task if it is not running
+        """
+        if not self.app.config['LIFECYCLE_SWEEP']:
+            return
+        with self._lock:
+            self._ready = (self._ready or set()) | {restaurant}
+        self.start()
+
+    def _in_batches(self, model, condition, *statements):
+        """
+        Run statements, each built from a row condition, over the rows of
+        model matching condition, lowest ids first and SWEEP_BATCH_SIZE rows
+        per transaction
+        Returns the number of rows
+        """
+        done = 0
+        while True:
+            ids = [row_id for (row_id,) in db.session.query(model.id).filter(condition)
+                   .order_by(model.id).limit(self.app.config['SWEEP_BATCH_SIZE'])]
+            if not ids:
+                return done
+            # Bound the batch by id rather than listing every id in the
+            # statements; the range also lets them walk the primary key
+            batch = and_(condition, model.id.between(ids[0], ids[-1]))
+            for statement in statements:
+                db.session.execute(statement(batch))
+            db.session.commit()
+            done += len(ids)
+
+    def mark_no_shows(self, now):
+        config = self.app.config
+        cutoff = now - timedelta(minutes=config['NO_SHOW_GRACE_MINUTES'])
+        active = Reservation.status.in_(ACTIVE_STATUSES)
+
+        # Nothing kept in memory follows days this far back, so a backlog there
+        # is closed with plain UPDATEs instead of one ORM change per row
+        horizon = cutoff - timedelta(days=1)
+        marked = self._in_batches(
+            Reservation, and_(active, Reservation.reservation_time < horizon),
+            lambda batch: Reservation.__table__.update().where(batch).values(status='no_show'))
+
+        while True:
+            reservations = Reservation.query.filter(
+                active, Reservation.reservation_time < cutoff
+            ).order_by(Reservation.reservation_time).limit(config['SWEEP_BATCH_SIZE']).all()
+            if not reservations:
+                return marked
+            for reservation in reservations:
+                reservation.status = 'no_show'
+            db.session.commit()
+            marked += len(reservations)
+
+    def release_tables(self, now):
+        grace = self.app.config['TABLE_RELEASE_GRACE_MINUTES']
+
+        def attempt():
+            released = 0
+            for table in Table.query.filter(Table.is_occupied == True).all():
+                if table.occupied_since is None:
+                    # Occupied before turns were recorded; start the clock now
+                    table.occupied_since = now
+                    continue
+                expected = timedelta(minutes=wait_estimator.turn_minutes(table.capacity) + grace)
+                if now - table.occupied_since > expected:
+                    # Clearing occupied_since as well keeps this guess out of the
+                    # recorded turns the expectation is based on
+                    table.is_occupied = False
+                    table.occupied_since = None
+                    released += 1
+            db.session.commit()
+            return released
+
+        try:
+            return with_retries(attempt)
+        except AllocationConflict:
+            return 0
+
+    def _archive(self, model, archive, condition, now):
+        names = [column.name for column in archive.__table__.columns if column.name != 'archived_at']
+        return self._in_batches(
+            model, condition,
+            lambda batch: archive.__table__.insert().from_select(
+                names + ['archived_at'], select(*[model.__table__.c[name] for name in names], literal(now)).where(batch)),
+            lambda batch: model.__table__.delete().where(batch))
+
+    def archive_closed(self, now):
+        cutoff = now - timedelta(days=self.app.config['ARCHIVE_AFTER_DAYS'])
+        reservations = self._archive(Reservation, ReservationArchive, and_(
+            Reservation.status.notin_(ACTIVE_STATUSES), Reservation.reservation_time < cutoff
+        ), now)
+        waitlist = self._archive(Waitlist, WaitlistArchive, and_(
+            Waitlist.status.notin_(('waiting', 'notified')), Waitlist.joined_at < cutoff
+        ), now)
+        return reservations, waitlist
+
+    def sweep(self, now=None):
+        """
+        Run every step once and return how many rows each one changed
+        """
+        now = now or datetime.utcnow()
+        no_shows = self.mark_no_shows(now)
+        released = self.release_tables(now)
+        reservations, waitlist = self.archive_closed(now)
+        return {
+            'no_shows': no_shows,
+            'released_tables': released,
+            'archived_reservations': reservations,
+            'archived_waitlist': waitlist
+        }
+
+    def _sleep(self, seconds):
+        if socketio.server is not None and socketio.async_mode != 'threading':
+            socketio.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+    def _run(self):
+        while True:
+            self._sleep(self.app.config['SWEEP_INTERVAL_SECONDS'])
+            ready = self._ready
+            for restaurant in restaurants(self.app.config):
+                if ready is not None and restaurant not in ready:
+                    continue
+                with restaurant_context(self.app, restaurant):
+                    try:
+                        self.sweep()
+                    except Exception:
+                        db.session.rollback()
+                        self.app.logger.exception(f"Lifecycle sweep failed for {restaurant}")
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        # The loop never ends, so outside eventlet or gevent it needs a daemon
+        # thread that does not keep the process alive
+        if socketio.server is not None and socketio.async_mode != 'threading':
+            socketio.start_background_task(self._run)
+        else:
+            threading.Thread(target=self._run, daemon=True).start()
+
+
+lifecycle_sweeper = LifecycleSweeper()
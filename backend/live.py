@@ -0,0 +1,160 @@
+import threading
+from types import SimpleNamespace
+
+from flask import current_app
+from flask_socketio import SocketIO, join_room, leave_room
+
+from dashboard import dashboard_counters
+from models import Table, Reservation, Waitlist
+from tenancy import DEFAULT_RESTAURANT, current_restaurant, restaurants
+import changes
+
+socketio = SocketIO()
+
+ROOMS = ('tables', 'reservations', 'waitlist', 'dashboard')
+MODEL_ROOMS = {'Table': 'tables', 'Reservation': 'reservations', 'Waitlist': 'waitlist'}
+MODELS = {'Table': Table, 'Reservation': Reservation, 'Waitlist': Waitlist}
+
+# Seconds to collect changes before broadcasting them as one batch
+COALESCE_SECONDS = 0.1
+
+
+def _room_name(restaurant, room):
+    """
+    The Socket.IO room of one restaurant's room; the default restaurant keeps the plain names
+    """
+    return room if restaurant == DEFAULT_RESTAURANT else f"{restaurant}/{room}"
+
+
+def _payload(change):
+    """
+    The changed row as the REST endpoints return it: its model's to_dict()
+    over the committed values, which leaves out internal columns such as
+    version and the guest search keys
+    """
+    return MODELS[change.model].to_dict(SimpleNamespace(**change.values))
+
+
+# Delta types that introduce a row clients have not seen yet
+CREATED_TYPES = ('table_created', 'reservation_created', 'waitlist_joined')
+
+_PAST_TENSE = {'insert': 'created', 'update': 'updated', 'delete': 'deleted'}
+
+
+def _delta_type(change):
+    """
+    Name the state transition a change represents for clients
+    """
+    values = change.values
+    if change.model == 'Table':
+        if change.op == 'update' and change.changed('is_occupied'):
+            return 'table_occupied' if values['is_occupied'] else 'table_freed'
+        return f"table_{_PAST_TENSE[change.op]}"
+    if change.model == 'Reservation':
+        if change.op == 'update' and change.changed('status'):
+            return f"reservation_{values['status']}"
+        return f"reservation_{_PAST_TENSE[change.op]}"
+    if change.op == 'insert':
+        return 'waitlist_joined'
+    if change.op == 'update' and change.changed('status'):
+        return f"waitlist_{values['status']}"
+    return f"waitlist_{_PAST_TENSE[change.op]}"
+
+
+class LiveBroadcaster:
+    """
+    Broadcasts committed changes to subscribed Socket.IO rooms
+
+    Changes are buffered for COALESCE_SECONDS and sent as one 'deltas' event
+    per room; several changes to the same row within that time collapse into
+    the latest one. The dashboard room receives the current counters once per
+    batch. Every restaurant has its own set of rooms.
+    """
+
+    def __init__(self, socketio):
+        self.socketio = socketio
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._scheduled = False
+
+    def apply(self, committed):
+        if self.socketio.server is None:
+            return
+
+        restaurant = current_restaurant()
+        with self._lock:
+            for change in committed:
+                room = MODEL_ROOMS.get(change.model)
+                if room is None:
+                    continue
+                # A table claimed for a booking only has its version bumped
+                if change.op == 'update' and not set(change.previous) - {'version'}:
+                    continue
+                key = (restaurant, room, change.id)
+                delta_type = _delta_type(change)
+                earlier = self._pending.get(key)
+                if earlier is not None and earlier['type'] in CREATED_TYPES and change.op == 'update':
+                    delta_type = earlier['type']
+                self._pending[key] = {
+                    'type': delta_type,
+                    'id': change.id,
+                    'data': None if change.op == 'delete' else _payload(change)
+                }
+
+            if self._pending and not self._scheduled:
+                self._scheduled = True
+                self.socketio.start_background_task(self._flush_later)
+
+    def _flush_later(self):
+        self.socketio.sleep(COALESCE_SECONDS)
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._scheduled = False
+
+        by_room = {}
+        for (restaurant, room, _), delta in pending.items():
+            by_room.setdefault((restaurant, room), []).append(delta)
+        for (restaurant, room), deltas in by_room.items():
+            self.socketio.emit('deltas', {'room': room, 'deltas': deltas}, to=_room_name(restaurant, room))
+
+        for restaurant in {restaurant for restaurant, _ in by_room}:
+            counters = dashboard_counters.get(restaurant).snapshot()
+            if counters is not None:
+                self.socketio.emit('deltas', {'room': 'dashboard', 'deltas': [{'type': 'dashboard', 'data': counters}]},
+                                   to=_room_name(restaurant, 'dashboard'))
+
+
+broadcaster = LiveBroadcaster(socketio)
+changes.subscribe(broadcaster.apply)
+
+
+def _requested_rooms(data):
+    data = data or {}
+    restaurant = data.get('restaurant', DEFAULT_RESTAURANT)
+    if restaurant not in restaurants(current_app.config):
+        return restaurant, []
+    return restaurant, [room for room in data.get('rooms', ROOMS) if room in ROOMS]
+
+
+@socketio.on('subscribe')
+def subscribe(data):
+    """
+    Join the requested rooms of a restaurant, e.g.
+    {'restaurant': 'downtown', 'rooms': ['tables', 'dashboard']}; without a
+    restaurant the default one's
+    """
+    restaurant, rooms = _requested_rooms(data)
+    for room in rooms:
+        join_room(_room_name(restaurant, room))
+    return {'restaurant': restaurant, 'rooms': rooms}
+
+
+@socketio.on('unsubscribe')
+def unsubscribe(data):
+    restaurant, rooms = _requested_rooms(data)
+    for room in rooms:
+        leave_room(_room_name(restaurant, room))
+    return {'restaurant': restaurant, 'rooms': rooms}
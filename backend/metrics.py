@@ -0,0 +1,200 @@
+"""
+Request and SQL metrics served at /metrics in the Prometheus text format
+
+Every request records its latency by endpoint, method and status, and the
+number and total duration of the SQL statements it ran, timed by cursor
+events on every engine. A request running one statement
+N_PLUS_ONE_THRESHOLD times or more, such as a query per table in a loop, is
+counted as an N+1 pattern and logged once per endpoint and statement. The
+allocation functions behind booking and seating are timed with @timed.
+
+Values are kept per process; with several workers each one reports its own.
+"""
+from functools import wraps
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    return '{' + ','.join(f'{name}="{_label(value)}"' for name, value in pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._series = {}
+
+    def inc(self, values, amount=1):
+        self._series[values] = self._series.get(values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, total in sorted(self._series.items()):
+            lines.append(f"{self.name}{_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Histogram:
+    """
+    Bucket counts, sum and count per combination of label values
+    """
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}   # label values -> [count per bucket, sum, count]
+
+    def observe(self, values, value):
+        series = self._series.get(values)
+        if series is None:
+            series = self._series[values] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                lines.append(f"{self.name}_bucket{_labels(self.labels, values, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labels, values, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labels, values)} {count}")
+        return lines
+
+
+class RequestMetrics:
+    """
+    Per-process request, SQL and function timings, enabled by METRICS
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.app = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = Histogram('http_request_duration_seconds', "Request latency",
+                                      ('endpoint', 'method', 'status'), LATENCY_BUCKETS)
+            self.queries = Histogram('http_request_sql_queries', "SQL statements run per request",
+                                     ('endpoint',), QUERY_BUCKETS)
+            self.query_seconds = Histogram('http_request_sql_duration_seconds', "Time spent in SQL per request",
+                                           ('endpoint',), LATENCY_BUCKETS)
+            self.n_plus_one = Counter('http_request_n_plus_one_total',
+                                      "Requests that ran one statement N_PLUS_ONE_THRESHOLD times or more",
+                                      ('endpoint',))
+            self.functions = Histogram('function_duration_seconds', "Latency of timed functions",
+                                       ('function',), LATENCY_BUCKETS)
+            self._flagged = set()
+
+    def init_app(self, app):
+        if not app.config['METRICS']:
+            return
+        self.app = app
+        app.extensions['request_metrics'] = self
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.render_response)
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_statements = {}   # statement -> [executions, seconds]
+
+    def _after_request(self, response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        statements = g.pop('metrics_statements', {})
+        # Both mounts of the API blueprint report under the view's name
+        endpoint = request.endpoint.rsplit('.', 1)[-1] if request.endpoint else 'unmatched'
+        threshold = self.app.config['N_PLUS_ONE_THRESHOLD']
+        repeated = [statement for statement, (executions, _) in statements.items() if executions >= threshold]
+
+        with self._lock:
+            self.requests.observe((endpoint, request.method, response.status_code), elapsed)
+            self.queries.observe((endpoint,), sum(executions for executions, _ in statements.values()))
+            self.query_seconds.observe((endpoint,), sum(seconds for _, seconds in statements.values()))
+            new = []
+            if repeated:
+                self.n_plus_one.inc((endpoint,))
+                new = [statement for statement in repeated if (endpoint, statement) not in self._flagged]
+                self._flagged.update((endpoint, statement) for statement in new)
+
+        for statement in new:
+            self.app.logger.warning("Possible N+1 query in %s, run %d times in one request: %s",
+                                    endpoint, statements[statement][0], ' '.join(statement.split())[:300])
+        return response
+
+    def observe_function(self, name, seconds):
+        with self._lock:
+            self.functions.observe((name,), seconds)
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.queries, self.query_seconds, self.n_plus_one, self.functions):
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def render_response(self):
+        return Response(self.render(), content_type=CONTENT_TYPE)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'metrics_statements' in g:
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('metrics_started')
+    if not started or not has_request_context() or 'metrics_statements' not in g:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    stats = g.metrics_statements.setdefault(statement, [0, 0.0])
+    stats[0] += 1
+    stats[1] += elapsed
+
+
+request_metrics = RequestMetrics()
+
+
+def timed(function):
+    """
+    Record how long each call of function takes in function_duration_seconds
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            request_metrics.observe_function(function.__name__, time.perf_counter() - started)
+    return wrapper
@@ -0,0 +1,207 @@
+"""
+Schema migrations for existing databases
+
+db.create_all() only creates missing tables, so changes to tables that
+already exist are applied here. Each migration runs once, in order, and the
+highest applied version is recorded in the schema_migrations table.
+
+    python migrations.py            # upgrade the configured database
+    flask init-db                   # the same through the app's CLI
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import Column, Integer, MetaData, Table as SqlTable, bindparam, inspect, select, text
+
+from models import db, Table, Reservation, Waitlist, TableTurn, ReservationArchive, WaitlistArchive, TableAdjacency
+from guests import name_key, phone_key, email_key
+
+_version_table = SqlTable('schema_migrations', MetaData(), Column('version', Integer, nullable=False))
+
+# Advisory lock id held while the schema changes on PostgreSQL
+_LOCK_KEY = 720_413
+
+
+def _create_indexes(connection, *indexes):
+    """
+    Create each (name, table, columns) index that does not exist yet
+
+    Migrations list their indexes rather than reading them from the models,
+    which describe the newest schema: an index on a column a later migration
+    adds cannot be created by an earlier one.
+    """
+    inspector = inspect(connection)
+    for name, table, columns in indexes:
+        if name not in {index['name'] for index in inspector.get_indexes(table)}:
+            connection.execute(text(f'CREATE INDEX {name} ON "{table}" ({", ".join(columns)})'))
+
+
+def add_hot_path_indexes(connection):
+    _create_indexes(
+        connection,
+        ('ix_table_is_occupied_capacity', 'table', ('is_occupied', 'capacity')),
+        ('ix_reservation_table_status_time', 'reservation', ('table_id', 'status', 'reservation_time')),
+        ('ix_reservation_time_id', 'reservation', ('reservation_time', 'id')),
+        ('ix_waitlist_status_joined_party', 'waitlist', ('status', 'joined_at', 'party_size')),
+    )
+
+
+def _add_column(connection, model, name, definition):
+    table = model.__tablename__
+    if name not in {column['name'] for column in inspect(connection).get_columns(table)}:
+        connection.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {name} {definition}'))
+
+
+def add_version_columns(connection):
+    for model in (Table, Waitlist):
+        _add_column(connection, model, 'version', 'INTEGER NOT NULL DEFAULT 0')
+
+
+def add_table_turns(connection):
+    # Tables occupied before this migration have no start time, so their
+    # current turn is not recorded
+    _add_column(connection, Table, 'occupied_since', 'DATETIME')
+    TableTurn.__table__.create(connection, checkfirst=True)
+    _create_indexes(connection, ('ix_table_turn_capacity_freed', 'table_turn', ('capacity', 'freed_at')))
+
+
+def add_archive_tables(connection):
+    for model in (ReservationArchive, WaitlistArchive):
+        model.__table__.create(connection, checkfirst=True)
+    _create_indexes(
+        connection,
+        ('ix_reservation_status_time', 'reservation', ('status', 'reservation_time')),
+        ('ix_reservation_archive_reservation_time', 'reservation_archive', ('reservation_time',)),
+        ('ix_waitlist_archive_joined_at', 'waitlist_archive', ('joined_at',)),
+    )
+
+
+def add_table_combining(connection):
+    for model in (Reservation, ReservationArchive):
+        _add_column(connection, model, 'joined_table_ids', 'VARCHAR(200)')
+    TableAdjacency.__table__.create(connection, checkfirst=True)
+
+
+def add_guest_keys(connection):
+    for model in (Reservation, Waitlist):
+        for name, length in (('name_key', 100), ('phone_key', 20), ('email_key', 100)):
+            _add_column(connection, model, name, f"VARCHAR({length}) NOT NULL DEFAULT ''")
+        # Fill in the keys of existing rows the same way the models do
+        table = model.__table__
+        rows = connection.execute(select(table.c.id, table.c.customer_name, table.c.phone_number, table.c.email)).all()
+        if rows:
+            connection.execute(table.update().where(table.c.id == bindparam('row_id')), [
+                {'row_id': row_id, 'name_key': name_key(name), 'phone_key': phone_key(phone), 'email_key': email_key(email)}
+                for row_id, name, phone, email in rows
+            ])
+    _create_indexes(connection, *[(f'ix_{table}_{name}', table, (name,))
+                                  for table in ('reservation', 'waitlist')
+                                  for name in ('phone_key', 'email_key', 'name_key')])
+
+
+# (version, migration) pairs, oldest first; never reorder or remove entries
+MIGRATIONS = [
+    (1, add_hot_path_indexes),
+    (2, add_version_columns),
+    (3, add_table_turns),
+    (4, add_archive_tables),
+    (5, add_table_combining),
+    (6, add_guest_keys),
+]
+
+
+def current_version(connection):
+    if not inspect(connection).has_table('schema_migrations'):
+        return 0
+    return connection.execute(_version_table.select()).scalar() or 0
+
+
+@contextmanager
+def schema_lock(engine):
+    """
+    A connection in a transaction that holds a lock on the whole database, so
+    one process at a time changes the schema while the others wait
+
+    SQLite takes the write lock up front with BEGIN IMMEDIATE, which needs the
+    driver's own transaction handling switched off meanwhile; PostgreSQL takes
+    a transaction-level advisory lock. Other databases get a plain transaction.
+    """
+    with engine.connect() as connection:
+        sqlite = engine.dialect.name == 'sqlite'
+        if sqlite:
+            driver_connection = connection.connection.dbapi_connection
+            isolation_level = driver_connection.isolation_level
+            driver_connection.isolation_level = None
+        try:
+            with connection.begin():
+                if sqlite:
+                    connection.exec_driver_sql('BEGIN IMMEDIATE')
+                elif engine.dialect.name == 'postgresql':
+                    connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': _LOCK_KEY})
+                yield connection
+        finally:
+            if sqlite:
+                driver_connection.isolation_level = isolation_level
+
+
+def apply_migrations(connection):
+    """
+    Apply every migration newer than the database's recorded version
+    Returns the list of versions applied
+    """
+    applied = []
+    _version_table.create(connection, checkfirst=True)
+    version = current_version(connection)
+    for number, migration in MIGRATIONS:
+        if number <= version:
+            continue
+        migration(connection)
+        applied.append(number)
+
+    if applied:
+        connection.execute(_version_table.delete())
+        connection.execute(_version_table.insert().values(version=applied[-1]))
+    return applied
+
+
+def upgrade(engine):
+    """
+    Apply pending migrations under the schema lock
+    Returns the list of versions applied
+    """
+    with schema_lock(engine) as connection:
+        return apply_migrations(connection)
+
+
+def ensure_schema(db, seed=None):
+    """
+    Create the tables and apply pending migrations, unless the recorded
+    version shows the database is already up to date, then call
+    seed(connection) in the same transaction
+
+    Several processes can get their first request at once, so the version is
+    read again once the schema lock is held: only the first of them does the
+    work. Returns False if the database was up to date, otherwise what seed
+    returned, or True without one.
+    """
+    with db.engine.connect() as connection:
+        if current_version(connection) >= MIGRATIONS[-1][0]:
+            return False
+    with schema_lock(db.engine) as connection:
+        if current_version(connection) >= MIGRATIONS[-1][0]:
+            return False
+        db.metadata.create_all(connection)
+        apply_migrations(connection)
+        return seed(connection) if seed else True
+
+
+if __name__ == '__main__':
+    from flask import Flask
+    from config import Config
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        applied = upgrade(db.engine)
+    print(f"Applied migrations: {applied}" if applied else "Database is up to date")
@@ -1,13 +1,51 @@
-from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 
-db = SQLAlchemy()
+from sqlalchemy.orm import validates
+
+from tenancy import RoutingSQLAlchemy
+from guests import phone_key, email_key, name_key
+
+# Each restaurant's rows live in its own database, picked per app context
+db = RoutingSQLAlchemy()
+
+# Guest search keys are kept in sync with the fields they come from and are
+# left out of the API's default fields
+GUEST_KEY_INFO = {'guest_key': True}
+
+class GuestKeys:
+    """
+    Normalized, indexed copies of the guest's name, phone number and email
+    """
+    name_key = db.Column(db.String(100), nullable=False, server_default='', info=GUEST_KEY_INFO)
+    phone_key = db.Column(db.String(20), nullable=False, server_default='', info=GUEST_KEY_INFO)
+    email_key = db.Column(db.String(100), nullable=False, server_default='', info=GUEST_KEY_INFO)
+    
+    @validates('customer_name', 'phone_number', 'email')
+    def _update_guest_key(self, field, value):
+        if field == 'customer_name':
+            self.name_key = name_key(value)
+        elif field == 'phone_number':
+            self.phone_key = phone_key(value)
+        else:
+            self.email_key = email_key(value)
+        return value
 
 class Table(db.Model):
+    __table_args__ = (
+        # Immediate seating: unoccupied tables that fit, smallest first
+        db.Index('ix_table_is_occupied_capacity', 'is_occupied', 'capacity'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     table_number = db.Column(db.Integer, nullable=False)
     capacity = db.Column(db.Integer, nullable=False)
     is_occupied = db.Column(db.Boolean, default=False)
+    occupied_since = db.Column(db.DateTime, nullable=True)
+    # Incremented on every update; an UPDATE based on an outdated read matches
+    # no row and fails instead of overwriting another worker's change
+    version = db.Column(db.Integer, nullable=False, server_default='0')
+    
+    __mapper_args__ = {'version_id_col': version}
     
     def to_dict(self):
         return {
@@ -17,7 +55,20 @@ class Table(db.Model):
             'is_occupied': self.is_occupied
         }
 
-class Reservation(db.Model):
+class Reservation(GuestKeys, db.Model):
+    __table_args__ = (
+        # Conflict checks for one table around a time
+        db.Index('ix_reservation_table_status_time', 'table_id', 'status', 'reservation_time'),
+        # Date range scans and keyset pagination
+        db.Index('ix_reservation_time_id', 'reservation_time', 'id'),
+        # Overdue active reservations for the lifecycle sweep
+        db.Index('ix_reservation_status_time', 'status', 'reservation_time'),
+        # Guest lookup by phone, email or name prefix
+        db.Index('ix_reservation_phone_key', 'phone_key'),
+        db.Index('ix_reservation_email_key', 'email_key'),
+        db.Index('ix_reservation_name_key', 'name_key'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     customer_name = db.Column(db.String(100), nullable=False)
     phone_number = db.Column(db.String(20), nullable=False)
@@ -25,8 +76,11 @@ class Reservation(db.Model):
     party_size = db.Column(db.Integer, nullable=False)
     reservation_time = db.Column(db.DateTime, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    status = db.Column(db.String(20), default='pending')  # pending, confirmed, seated, cancelled
+    status = db.Column(db.String(20), default='pending')  # pending, confirmed, seated, cancelled, no_show
     table_id = db.Column(db.Integer, db.ForeignKey('table.id'), nullable=True)
+    # Comma separated ids of the tables pushed together with table_id for a
+    # party too large for one table; empty for a single table
+    joined_table_ids = db.Column(db.String(200), nullable=True)
     
     table = db.relationship('Table', backref=db.backref('reservations', lazy=True))
     
@@ -40,10 +94,19 @@ class Reservation(db.Model):
             'reservation_time': self.reservation_time.isoformat(),
             'created_at': self.created_at.isoformat(),
             'status': self.status,
-            'table_id': self.table_id
+            'table_id': self.table_id,
+            'joined_table_ids': self.joined_table_ids
         }
 
-class Waitlist(db.Model):
+class Waitlist(GuestKeys, db.Model):
+    __table_args__ = (
+        # Waiting parties in queue order, with party size for wait estimates
+        db.Index('ix_waitlist_status_joined_party', 'status', 'joined_at', 'party_size'),
+        db.Index('ix_waitlist_phone_key', 'phone_key'),
+        db.Index('ix_waitlist_email_key', 'email_key'),
+        db.Index('ix_waitlist_name_key', 'name_key'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     customer_name = db.Column(db.String(100), nullable=False)
     phone_number = db.Column(db.String(20), nullable=False)
@@ -52,6 +115,9 @@ class Waitlist(db.Model):
     joined_at = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(20), default='waiting')  # waiting, notified, seated, left
     estimated_wait_time = db.Column(db.Integer, nullable=True)  # in minutes
+    version = db.Column(db.Integer, nullable=False, server_default='0')
+    
+    __mapper_args__ = {'version_id_col': version}
     
     def to_dict(self):
         return {
@@ -63,4 +129,64 @@ class Waitlist(db.Model):
             'joined_at': self.joined_at.isoformat(),
             'status': self.status,
             'estimated_wait_time': self.estimated_wait_time
-        }
\ No newline at end of file
+        }
+
+# Two tables that stand next to each other and can be pushed together;
+# each pair is stored once, lower id first
+class TableAdjacency(db.Model):
+    table_id = db.Column(db.Integer, db.ForeignKey('table.id'), primary_key=True)
+    adjacent_id = db.Column(db.Integer, db.ForeignKey('table.id'), primary_key=True)
+    
+    def to_dict(self):
+        return {
+            'table_id': self.table_id,
+            'adjacent_id': self.adjacent_id
+        }
+
+# One party's stay at a table, recorded when the table is freed
+class TableTurn(db.Model):
+    __table_args__ = (
+        # Most recent turns per capacity for wait estimates
+        db.Index('ix_table_turn_capacity_freed', 'capacity', 'freed_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    table_id = db.Column(db.Integer, db.ForeignKey('table.id'), nullable=False)
+    capacity = db.Column(db.Integer, nullable=False)
+    seated_at = db.Column(db.DateTime, nullable=False)
+    freed_at = db.Column(db.DateTime, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'table_id': self.table_id,
+            'capacity': self.capacity,
+            'seated_at': self.seated_at.isoformat(),
+            'freed_at': self.freed_at.isoformat()
+        }
+
+# Closed reservations and waitlist entries moved out of the live tables by
+# the lifecycle sweep, keeping their original ids
+class ReservationArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    customer_name = db.Column(db.String(100), nullable=False)
+    phone_number = db.Column(db.String(20), nullable=False)
+    email = db.Column(db.String(100))
+    party_size = db.Column(db.Integer, nullable=False)
+    reservation_time = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime)
+    status = db.Column(db.String(20))
+    table_id = db.Column(db.Integer, nullable=True)
+    joined_table_ids = db.Column(db.String(200), nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+class WaitlistArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    customer_name = db.Column(db.String(100), nullable=False)
+    phone_number = db.Column(db.String(20), nullable=False)
+    email = db.Column(db.String(100))
+    party_size = db.Column(db.Integer, nullable=False)
+    joined_at = db.Column(db.DateTime, index=True)
+    status = db.Column(db.String(20))
+    estimated_wait_time = db.Column(db.Integer, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False)
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""
+Sampling profiler for slow requests, enabled by PROFILE_SLOW_REQUESTS
+
+A daemon thread samples the stack of every thread serving a request each
+PROFILE_INTERVAL_MS. When a request takes longer than PROFILE_SLOW_MS, its
+samples are written to PROFILE_DIR in the collapsed format read by
+flamegraph.pl and speedscope, one file per request. Stacks are taken from
+sys._current_frames(), so requests served by eventlet or gevent greenlets
+are not sampled.
+"""
+from collections import Counter
+import os
+import sys
+import threading
+import time
+
+from flask import g, request
+
+
+def _collapse(frame):
+    """
+    One sample as 'outermost;...;innermost' frame names
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SlowRequestProfiler:
+    """
+    Keeps the samples of requests in flight and dumps those of slow ones
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = {}   # thread ident -> Counter of collapsed stacks
+        self._started = False
+        self.app = None
+
+    def init_app(self, app):
+        if not app.config['PROFILE_SLOW_REQUESTS']:
+            return
+        self.app = app
+        app.extensions['slow_request_profiler'] = self
+        app.before_request(self._begin)
+        app.teardown_request(self._end)
+
+    def _begin(self):
+        self.start()
+        g.profile_started = time.perf_counter()
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+
+    def _end(self, exc):
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+        started = g.pop('profile_started', None)
+        if samples is None or started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms >= self.app.config['PROFILE_SLOW_MS'] and samples:
+            self.dump(samples, request.endpoint or 'unmatched', elapsed_ms)
+
+    def dump(self, samples, endpoint, elapsed_ms):
+        directory = self.app.config['PROFILE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{endpoint}-{int(elapsed_ms)}ms-{threading.get_ident()}.folded"
+        path = os.path.join(directory, name)
+        with open(path, 'w') as out:
+            for stack, count in samples.most_common():
+                out.write(f"{stack} {count}\n")
+        self.app.logger.info("Slow request to %s took %d ms, stacks written to %s", endpoint, elapsed_ms, path)
+
+    def _sample(self):
+        interval = self.app.config['PROFILE_INTERVAL_MS'] / 1000
+        while True:
+            time.sleep(interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, samples in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        samples[_collapse(frame)] += 1
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._sample, daemon=True).start()
+
+
+slow_request_profiler = SlowRequestProfiler()
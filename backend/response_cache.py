@@ -0,0 +1,133 @@
+"""
+Conditional GETs and an in-process cache for the read endpoints
+
+Every restaurant's resources have a version counter bumped after each
+commit that changes a model they are built from. A response's ETag is
+derived from that version, so a poll whose If-None-Match still matches is
+answered with 304 without touching the database, and a changed poll is
+served from an LRU cache of encoded bodies keyed by the full request path.
+
+Counters only see this process's commits, so ETags also carry the current
+max_age period; responses can trail writes made by other workers by at most
+that many seconds.
+"""
+from collections import OrderedDict
+from functools import wraps
+import threading
+import time
+import uuid
+import zlib
+
+from flask import Response, current_app, make_response, request
+
+from tenancy import current_restaurant
+import changes
+
+# The resources whose responses are built from each model
+MODEL_RESOURCES = {
+    'Table': ('tables', 'waitlist', 'dashboard'),
+    'Reservation': ('reservations', 'dashboard'),
+    'Waitlist': ('waitlist', 'dashboard'),
+    'TableTurn': ('waitlist',),
+    'TableAdjacency': ('tables',),
+}
+
+
+class ResponseCache:
+    """
+    Resource version counters plus encoded responses held by request path,
+    evicting least recently used bodies beyond max_bytes
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Versions restart with the process; keep its ETags apart from other processes'
+        self._token = uuid.uuid4().hex[:8]
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._versions = {}
+            self._entries = OrderedDict()   # path -> (etag, body, status, headers)
+            self._bytes = 0
+
+    def etag(self, resource, path, max_age):
+        with self._lock:
+            version = self._versions.get((current_restaurant(), resource), 0)
+        period = int(time.time() // max_age) if max_age else 0
+        return f"{resource}-{self._token}-{period}-{version}-{zlib.crc32(path.encode()):08x}"
+
+    def get(self, path, etag):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != etag:
+                return None
+            self._entries.move_to_end(path)
+            return entry
+
+    def put(self, path, etag, body, status, headers, max_bytes):
+        if len(body) > max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(path, None)
+            if previous is not None:
+                self._bytes -= len(previous[1])
+            self._entries[path] = (etag, body, status, headers)
+            self._bytes += len(body)
+            while self._bytes > max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[1])
+
+    def apply(self, committed):
+        """
+        Bump the version of every resource built from a changed model
+        """
+        restaurant = current_restaurant()
+        resources = set()
+        for change in committed:
+            # A table claimed for a booking only has its version bumped
+            if change.op == 'update' and not set(change.previous) - {'version'}:
+                continue
+            resources.update(MODEL_RESOURCES.get(change.model, ()))
+        with self._lock:
+            for resource in resources:
+                key = (restaurant, resource)
+                self._versions[key] = self._versions.get(key, 0) + 1
+
+
+response_cache = ResponseCache()
+changes.subscribe(response_cache.apply)
+
+
+def conditional(resource):
+    """
+    Decorate a GET view so it answers If-None-Match with 304 and is served
+    from the response cache while resource is unchanged
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            config = current_app.config
+            path = request.full_path
+            # Read the version before building the body, so a write that
+            # lands meanwhile can only make the cached body newer than its ETag
+            etag = response_cache.etag(resource, path, config['RESPONSE_CACHE_SECONDS'])
+            if etag in request.if_none_match:
+                response = Response(status=304)
+            else:
+                cached = response_cache.get(path, etag)
+                if cached is not None:
+                    _, body, status, headers = cached
+                    response = Response(body, status=status, headers=headers)
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    if not response.is_streamed:
+                        response_cache.put(path, etag, response.get_data(), response.status_code,
+                                           list(response.headers), config['RESPONSE_CACHE_MB'] * 1024 * 1024)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
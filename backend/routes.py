@@ -1,15 +1,105 @@
-from flask import Blueprint, request, jsonify
-from datetime import datetime
-from models import db, Table, Reservation, Waitlist
-from table_allocation import find_available_table, allocate_table_for_reservation, seat_waitlist_party, calculate_wait_time
+from flask import Blueprint, Response, request, jsonify, current_app, abort, make_response
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_, literal, func
+from sqlalchemy.exc import IntegrityError
+import base64
+import json
+from models import db, Table, Reservation, Waitlist, TableAdjacency
+from availability import naive, free_slots, joined_ids
+from dashboard import dashboard_counters
+from wait_times import wait_estimator
+from table_allocation import (find_available_table, allocate_table_for_reservation, seat_waitlist_party,
+                              calculate_wait_time, assign_tables, with_retries, AllocationConflict)
+from table_optimizer import optimize_window
+from serialization import rows_response, records, dumps, check_format
+from response_cache import conditional
+from idempotency import idempotent
+from guests import parse_query, prefix_filter
+from write_pipeline import write_pipeline, WriteTimeout
+import analytics
 
 api = Blueprint('api', __name__)
 
+def parse_reservation_time(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def guest_values(data):
+    """
+    The guest columns of a reservation or waitlist payload
+    Raises KeyError for a missing field and TypeError, ValueError or
+    AttributeError for an invalid one
+    """
+    if not isinstance(data, dict):
+        raise TypeError("Expected a JSON object")
+    party_size = int(data['party_size'])
+    if party_size < 1:
+        raise ValueError("party_size must be positive")
+    return dict(
+        customer_name=data['customer_name'],
+        phone_number=data['phone_number'],
+        email=data.get('email', ''),
+        party_size=party_size
+    )
+
+def invalid_payload(error):
+    if isinstance(error, KeyError):
+        return f"Missing field {error.args[0]}"
+    return str(error) or "Invalid request"
+
+def parse_fields(value, model):
+    """
+    Turn a comma separated fields parameter into a list of column names,
+    defaulting to every column but the guest search keys
+    """
+    columns = [column.name for column in model.__table__.columns if not column.info.get('guest_key')]
+    if not value:
+        return columns
+    
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in columns]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+# Columns returned by the list endpoints, matching the models' to_dict
+TABLE_FIELDS = ['id', 'table_number', 'capacity', 'is_occupied']
+WAITLIST_FIELDS = ['id', 'customer_name', 'phone_number', 'email', 'party_size', 'joined_at', 'status',
+                   'estimated_wait_time']
+
+def select_columns(model, fields):
+    return db.session.query(*[getattr(model, name) for name in fields])
+
+def list_response(fields, rows):
+    """
+    Encode rows of fields in the format asked for by the format query
+    parameter ('records' by default or 'columnar'), streaming large lists
+    Always returns a response the caller can add headers to; an unknown
+    format ends the request with 400 instead.
+    """
+    config = current_app.config
+    try:
+        return rows_response(fields, rows, request.args.get('format', 'records'),
+                             stream_rows=config['STREAM_RESPONSE_ROWS'], chunk_rows=config['STREAM_CHUNK_ROWS'])
+    except ValueError as e:
+        abort(make_response(jsonify({'error': str(e)}), 400))
+
+def encode_cursor(reservation_time, reservation_id):
+    token = f"{reservation_time.isoformat()}|{reservation_id}"
+    return base64.urlsafe_b64encode(token.encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        reservation_time, reservation_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(reservation_time), int(reservation_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
 # Table routes
 @api.route('/tables', methods=['GET'])
+@conditional('tables')
 def get_tables():
-    tables = Table.query.all()
-    return jsonify([table.to_dict() for table in tables])
+    return list_response(TABLE_FIELDS, select_columns(Table, TABLE_FIELDS)
+                         .yield_per(current_app.config['STREAM_CHUNK_ROWS']))
 
 @api.route('/tables', methods=['POST'])
 def create_table():
@@ -22,100 +112,401 @@ def create_table():
     db.session.commit()
     return jsonify(new_table.to_dict()), 201
 
+@api.route('/tables/adjacency', methods=['GET'])
+@conditional('tables')
+def get_table_adjacency():
+    pairs = db.session.query(TableAdjacency.table_id, TableAdjacency.adjacent_id) \
+        .order_by(TableAdjacency.table_id, TableAdjacency.adjacent_id).all()
+    return jsonify({'pairs': [list(pair) for pair in pairs]})
+
+@api.route('/tables/adjacency', methods=['PUT'])
+def set_table_adjacency():
+    """
+    Replace the pairs of tables that stand next to each other and can be
+    pushed together for a large party, e.g. {'pairs': [[5, 6], [6, 7]]}
+    """
+    try:
+        pairs = {tuple(sorted((int(a), int(b)))) for a, b in request.json['pairs']}
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': "pairs must be a list of [table_id, table_id] pairs"}), 400
+    
+    table_ids = {table_id for pair in pairs for table_id in pair}
+    known = {table_id for (table_id,) in db.session.query(Table.id).filter(Table.id.in_(table_ids))}
+    if any(a == b for a, b in pairs) or known != table_ids:
+        return jsonify({'error': "pairs must join two different existing tables"}), 400
+    
+    # Row by row rather than a bulk delete, so each removed pair is a Change
+    # that invalidates the adjacency groups and cached responses
+    existing = {(row.table_id, row.adjacent_id): row for row in TableAdjacency.query}
+    for pair, row in existing.items():
+        if pair not in pairs:
+            db.session.delete(row)
+    db.session.add_all([TableAdjacency(table_id=a, adjacent_id=b) for a, b in sorted(pairs - existing.keys())])
+    db.session.commit()
+    return jsonify({'pairs': [list(pair) for pair in sorted(pairs)]})
+
 @api.route('/tables/<int:table_id>', methods=['PUT'])
 def update_table(table_id):
-    table = Table.query.get_or_404(table_id)
     data = request.json
     
-    if 'capacity' in data:
-        table.capacity = data['capacity']
-    if 'is_occupied' in data:
-        table.is_occupied = data['is_occupied']
+    # Re-applied on a fresh read if another worker changed the table meanwhile
+    def attempt():
+        table = Table.query.get_or_404(table_id)
+        
+        if 'capacity' in data:
+            table.capacity = data['capacity']
+        if 'is_occupied' in data:
+            table.is_occupied = data['is_occupied']
+        
+        db.session.commit()
+        return table
     
-    db.session.commit()
+    try:
+        table = with_retries(attempt)
+    except AllocationConflict:
+        return jsonify({'error': "Table is being updated concurrently, please try again"}), 409
     return jsonify(table.to_dict())
 
 # Reservation routes
 @api.route('/reservations', methods=['GET'])
+@conditional('reservations')
 def get_reservations():
-    reservations = Reservation.query.all()
-    return jsonify([reservation.to_dict() for reservation in reservations])
+    """
+    List reservations ordered by (reservation_time, id), one page at a time
+
+    Query parameters: from / to (reservation_time range), status (comma
+    separated), table_id, fields (comma separated columns to return), limit,
+    cursor (the X-Next-Cursor header of the previous page) and format.
+    """
+    args = request.args
+    try:
+        limit = min(int(args.get('limit', current_app.config['RESERVATIONS_PAGE_SIZE'])),
+                    current_app.config['RESERVATIONS_MAX_PAGE_SIZE'])
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        fields = parse_fields(args.get('fields'), Reservation)
+        check_format(args.get('format', 'records'))
+        cursor = decode_cursor(args['cursor']) if args.get('cursor') else None
+        start = naive(parse_reservation_time(args['from'])) if args.get('from') else None
+        end = naive(parse_reservation_time(args['to'])) if args.get('to') else None
+        table_id = int(args['table_id']) if args.get('table_id') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Always select the sort key so the next cursor can be built
+    columns = list(dict.fromkeys(fields + ['reservation_time', 'id']))
+    query = select_columns(Reservation, columns)
+    
+    if start:
+        query = query.filter(Reservation.reservation_time >= start)
+    if end:
+        query = query.filter(Reservation.reservation_time < end)
+    if args.get('status'):
+        query = query.filter(Reservation.status.in_(args['status'].split(',')))
+    if table_id is not None:
+        query = query.filter(or_(
+            Reservation.table_id == table_id,
+            (literal(',') + Reservation.joined_table_ids + ',').contains(f',{table_id},')
+        ))
+    if cursor:
+        cursor_time, cursor_id = cursor
+        query = query.filter(or_(
+            Reservation.reservation_time > cursor_time,
+            and_(Reservation.reservation_time == cursor_time, Reservation.id > cursor_id)
+        ))
+    
+    rows = query.order_by(Reservation.reservation_time, Reservation.id).limit(limit + 1).all()
+    
+    response = list_response(fields, [row[:len(fields)] for row in rows[:limit]])
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        response.headers['X-Next-Cursor'] = encode_cursor(last.reservation_time, last.id)
+    return response
 
 @api.route('/reservations', methods=['POST'])
+@idempotent
 def create_reservation():
     data = request.json
     
-    # Parse reservation time
-    reservation_time = datetime.fromisoformat(data['reservation_time'].replace('Z', '+00:00'))
+    # Checked here so a bad request never reaches a write batch
+    try:
+        values = guest_values(data)
+        values['reservation_time'] = parse_reservation_time(data['reservation_time'])
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        return jsonify({'error': invalid_payload(e)}), 400
     
-    new_reservation = Reservation(
-        customer_name=data['customer_name'],
-        phone_number=data['phone_number'],
-        email=data.get('email', ''),
-        party_size=data['party_size'],
-        reservation_time=reservation_time,
-        status='pending'
-    )
+    # Batched with concurrent bookings into one transaction by the writer thread
+    if current_app.config['WRITE_PIPELINE']:
+        try:
+            return jsonify(write_pipeline.reserve(values)), 201
+        except WriteTimeout as e:
+            return jsonify({'error': str(e)}), 503
+    
+    new_reservation = Reservation(status='pending', **values)
     
     db.session.add(new_reservation)
     db.session.commit()
     
-    # Try to allocate a table immediately
-    table = find_available_table(data['party_size'], reservation_time)
-    if table:
-        new_reservation.table_id = table.id
-        new_reservation.status = 'confirmed'
+    # Try to allocate a table immediately; if other workers keep taking the
+    # chosen tables the reservation stays pending
+    def attempt():
+        assign_tables([new_reservation])
         db.session.commit()
     
+    try:
+        with_retries(attempt)
+    except AllocationConflict:
+        pass
+    
     return jsonify(new_reservation.to_dict()), 201
 
+
+def read_bulk_rows():
+    """
+    Read the rows of a bulk request, sent either as a JSON array or as
+    newline-delimited JSON (one reservation per line)
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        rows = []
+        for line in request.stream:
+            line = line.strip()
+            if line:
+                rows.append(json.loads(line))
+        return rows
+    
+    rows = request.get_json()
+    if not isinstance(rows, list):
+        raise ValueError("Expected a JSON array of reservations")
+    return rows
+
+@api.route('/reservations/bulk', methods=['POST'])
+def bulk_create_reservations():
+    try:
+        rows = read_bulk_rows()
+    except ValueError as e:
+        return jsonify({'error': f"Invalid request body: {e}"}), 400
+    
+    limit = current_app.config['BULK_RESERVATION_LIMIT']
+    if len(rows) > limit:
+        return jsonify({'error': f"At most {limit} reservations can be imported at once"}), 413
+    
+    # Validate every row before allocating anything
+    results = [None] * len(rows)
+    valid = []
+    for index, data in enumerate(rows):
+        try:
+            fields = dict(guest_values(data), reservation_time=parse_reservation_time(data['reservation_time']),
+                          status='pending')
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            results[index] = {'index': index, 'error': invalid_payload(e)}
+        else:
+            valid.append((index, fields))
+    
+    # Allocate the whole batch in one pass against the availability index and
+    # insert everything in a single transaction, starting over if another
+    # worker booked one of the chosen tables meanwhile
+    def attempt():
+        # Rows that arrive with their ids go out as one executemany INSERT;
+        # without them the flush inserts row by row to read each new id back.
+        # A worker inserting at the same time can take the same ids, which
+        # fails the flush and starts over like a lost table.
+        first_id = (db.session.query(func.max(Reservation.id)).scalar() or 0) + 1
+        reservations = [Reservation(id=first_id + i, **fields) for i, (_, fields) in enumerate(valid)]
+        db.session.add_all(reservations)
+        try:
+            assign_tables(reservations)
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            raise AllocationConflict("Reservation ids were taken by another worker")
+        for (index, _), reservation in zip(valid, reservations):
+            results[index] = {'index': index, 'reservation': reservation.to_dict()}
+        db.session.commit()
+    
+    try:
+        with_retries(attempt)
+    except AllocationConflict:
+        return jsonify({'error': "Tables are being booked concurrently, please try again"}), 409
+    
+    created = len(valid)
+    return jsonify({
+        'created': created,
+        'failed': len(rows) - created,
+        'results': results
+    }), 201 if created else 400
+
+@api.route('/reservations/optimize', methods=['POST'])
+def optimize_reservations():
+    data = request.json or {}
+    
+    try:
+        start = parse_reservation_time(data['start'])
+        end = parse_reservation_time(data['end'])
+    except KeyError as e:
+        return jsonify({'error': f"Missing field {e.args[0]}"}), 400
+    except (AttributeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if end < start:
+        return jsonify({'error': "end must not be before start"}), 400
+    
+    try:
+        result = with_retries(lambda: optimize_window(start, end, apply=not data.get('dry_run', False)))
+    except AllocationConflict:
+        return jsonify({'error': "Tables are being booked concurrently, please try again"}), 409
+    return jsonify(result)
+
 @api.route('/reservations/<int:reservation_id>', methods=['PUT'])
 def update_reservation(reservation_id):
     reservation = Reservation.query.get_or_404(reservation_id)
     data = request.json
     
     if 'status' in data:
-        reservation.status = data['status']
-        
-        # If confirming a reservation, try to allocate a table
+        # If confirming a reservation, try to allocate a table, which
+        # confirms it in its own transaction
         if data['status'] == 'confirmed' and not reservation.table_id:
             success, message = allocate_table_for_reservation(reservation_id)
             if not success:
                 return jsonify({'error': message}), 400
+        else:
+            reservation.status = data['status']
     
-    if 'table_id' in data:
+    if 'table_ids' in data:
+        # Tables pushed together by hand, the first one as table_id
+        table_ids = data['table_ids'] or [None]
+        reservation.table_id = table_ids[0]
+        reservation.joined_table_ids = joined_ids(table_ids)
+    elif 'table_id' in data:
         reservation.table_id = data['table_id']
+        reservation.joined_table_ids = None
     
     db.session.commit()
     return jsonify(reservation.to_dict())
 
+# Availability route
+@api.route('/availability', methods=['GET'])
+def get_availability():
+    """
+    List every start time on a date at which a party can still be booked
+
+    Query parameters: party_size, date (YYYY-MM-DD) and granularity (minutes
+    between candidate start times). Candidates run from SERVICE_OPENS to
+    SERVICE_LAST_SEATING; times already past are left out.
+    """
+    args = request.args
+    config = current_app.config
+    try:
+        party_size = int(args['party_size'])
+        day = datetime.strptime(args['date'], '%Y-%m-%d').date()
+        granularity = int(args.get('granularity', config['AVAILABILITY_GRANULARITY_MINUTES']))
+        if party_size < 1:
+            raise ValueError("party_size must be positive")
+        if not 1 <= granularity <= 24 * 60:
+            raise ValueError("granularity must be between 1 and 1440 minutes")
+    except KeyError as e:
+        return jsonify({'error': f"Missing parameter {e.args[0]}"}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    opens = datetime.combine(day, datetime.strptime(config['SERVICE_OPENS'], '%H:%M').time())
+    last_seating = datetime.combine(day, datetime.strptime(config['SERVICE_LAST_SEATING'], '%H:%M').time())
+    booked_out = free_slots.booked_out(party_size, opens, last_seating, config['AVAILABILITY_CACHE_SECONDS'])
+    if booked_out is None:
+        # No table is large enough for the party
+        booked_out = [(opens, last_seating)]
+    
+    # Walk the candidate times and the sorted booked-out intervals together
+    slots = []
+    now = datetime.utcnow()
+    step = timedelta(minutes=granularity)
+    candidate = opens
+    i = 0
+    while candidate <= last_seating:
+        while i < len(booked_out) and booked_out[i][1] < candidate:
+            i += 1
+        if candidate >= now and not (i < len(booked_out) and booked_out[i][0] <= candidate):
+            slots.append(candidate.isoformat())
+        candidate += step
+    
+    return jsonify({'date': day.isoformat(), 'party_size': party_size, 'granularity': granularity, 'slots': slots})
+
+# Guest lookup route
+@api.route('/guests/search', methods=['GET'])
+def search_guests():
+    """
+    Find the reservations and waitlist entries of guests whose phone number,
+    email or name starts with q, latest first
+
+    Query parameters: q (a phone number searches phone numbers whatever its
+    punctuation, anything with an @ emails, anything else names; at least
+    GUEST_SEARCH_MIN_CHARS characters) and limit (rows per list).
+    """
+    args = request.args
+    config = current_app.config
+    try:
+        key, prefix = parse_query(args.get('q', ''))
+        limit = min(int(args.get('limit', config['GUEST_SEARCH_LIMIT'])), config['GUEST_SEARCH_LIMIT'])
+        if len(prefix) < config['GUEST_SEARCH_MIN_CHARS']:
+            raise ValueError(f"q must have at least {config['GUEST_SEARCH_MIN_CHARS']} characters")
+        if limit < 1:
+            raise ValueError("limit must be positive")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    reservation_fields = parse_fields(None, Reservation)
+    reservations = select_columns(Reservation, reservation_fields).filter(
+        prefix_filter(getattr(Reservation, f'{key}_key'), prefix)
+    ).order_by(Reservation.reservation_time.desc(), Reservation.id.desc()).limit(limit).all()
+    waitlist = select_columns(Waitlist, WAITLIST_FIELDS).filter(
+        prefix_filter(getattr(Waitlist, f'{key}_key'), prefix)
+    ).order_by(Waitlist.joined_at.desc(), Waitlist.id.desc()).limit(limit).all()
+    
+    return Response(dumps({
+        'key': key,
+        'reservations': records(reservation_fields, reservations),
+        'waitlist': records(WAITLIST_FIELDS, waitlist)
+    }), mimetype='application/json')
+
 # Waitlist routes
 @api.route('/waitlist', methods=['GET'])
+@conditional('waitlist')
 def get_waitlist():
-    waitlist = Waitlist.query.filter(Waitlist.status == 'waiting').order_by(Waitlist.joined_at).all()
-    return jsonify([entry.to_dict() for entry in waitlist])
+    rows = select_columns(Waitlist, WAITLIST_FIELDS).filter(Waitlist.status == 'waiting') \
+        .order_by(Waitlist.joined_at).yield_per(current_app.config['STREAM_CHUNK_ROWS'])
+    
+    # Estimates move as the queue and the tables change, so report current ones
+    estimates = wait_estimator.estimates()
+    rows = (tuple(row[:-1]) + (estimates.get(row.id, row.estimated_wait_time),) for row in rows)
+    return list_response(WAITLIST_FIELDS, rows)
 
 @api.route('/waitlist', methods=['POST'])
+@idempotent
 def add_to_waitlist():
-    data = request.json
+    try:
+        values = guest_values(request.json)
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        return jsonify({'error': invalid_payload(e)}), 400
     
-    new_entry = Waitlist(
-        customer_name=data['customer_name'],
-        phone_number=data['phone_number'],
-        email=data.get('email', ''),
-        party_size=data['party_size'],
-        status='waiting'
-    )
+    if current_app.config['WRITE_PIPELINE']:
+        try:
+            message, entry = write_pipeline.join_waitlist(values)
+        except WriteTimeout as e:
+            return jsonify({'error': str(e)}), 503
+        if message:
+            return jsonify({'message': message, 'waitlist': entry}), 201
+        return jsonify(entry), 201
+    
+    new_entry = Waitlist(status='waiting', **values)
     
     # Calculate estimated wait time
-    new_entry.estimated_wait_time = calculate_wait_time(data['party_size'])
+    new_entry.estimated_wait_time = calculate_wait_time(values['party_size'])
     
     db.session.add(new_entry)
     db.session.commit()
     
     # Check if we can seat them immediately
-    table = find_available_table(data['party_size'])
-    if table:
+    tables = find_available_table(values['party_size'])
+    if tables:
         success, message = seat_waitlist_party(new_entry.id)
         if success:
             return jsonify({'message': message, 'waitlist': new_entry.to_dict()}), 201
@@ -127,40 +518,64 @@ def update_waitlist(waitlist_id):
     waitlist_entry = Waitlist.query.get_or_404(waitlist_id)
     data = request.json
     
-    if 'status' in data:
-        waitlist_entry.status = data['status']
-        
-        # If trying to seat a party
-        if data['status'] == 'seated':
-            success, message = seat_waitlist_party(waitlist_id)
-            if not success:
-                return jsonify({'error': message}), 400
+    # If trying to seat a party, find a table and seat them in one
+    # transaction; the party must still be waiting for that
+    if data.get('status') == 'seated':
+        success, message = seat_waitlist_party(waitlist_id)
+        if not success:
+            return jsonify({'error': message}), 400
+        return jsonify(waitlist_entry.to_dict())
     
-    db.session.commit()
+    # Re-applied on a fresh read if the auto-seat drain changed the entry meanwhile
+    def attempt():
+        entry = Waitlist.query.get_or_404(waitlist_id)
+        if 'status' in data:
+            entry.status = data['status']
+        db.session.commit()
+        return entry
+    
+    try:
+        waitlist_entry = with_retries(attempt)
+    except AllocationConflict:
+        return jsonify({'error': "Waitlist entry is being updated concurrently, please try again"}), 409
     return jsonify(waitlist_entry.to_dict())
 
 # Dashboard summary route
 @api.route('/dashboard', methods=['GET'])
+@conditional('dashboard')
 def dashboard_summary():
-    current_time = datetime.utcnow()
-    
-    # Get counts of today's reservations
-    today_reservations = Reservation.query.filter(
-        Reservation.reservation_time >= current_time.replace(hour=0, minute=0, second=0),
-        Reservation.reservation_time < current_time.replace(hour=23, minute=59, second=59)
-    ).count()
-    
-    # Get counts of occupied and available tables
-    total_tables = Table.query.count()
-    occupied_tables = Table.query.filter_by(is_occupied=True).count()
+    return jsonify(dashboard_counters.summary(current_app.config['DASHBOARD_RECONCILE_SECONDS']))
+
+# Analytics route
+@api.route('/analytics', methods=['GET'])
+def analytics_report():
+    """
+    Occupancy, turn and rejection figures over the last days, and the same
+    demand replayed on other layouts and turn durations
+
+    Query parameters: days, end (YYYY-MM-DD, not included, default tomorrow),
+    layout (table capacities such as 2x4,4x6,8; repeat it for several),
+    turn_minutes (comma separated), slot_minutes and heatmaps (0 leaves the
+    heatmaps out).
+    """
+    if not analytics.AVAILABLE:
+        return jsonify({'error': "Analytics need NumPy, which is not installed"}), 501
     
-    # Get waitlist count
-    waitlist_count = Waitlist.query.filter_by(status='waiting').count()
+    args = request.args
+    config = current_app.config
+    try:
+        days = int(args.get('days', 28))
+        end = datetime.strptime(args['end'], '%Y-%m-%d') if 'end' in args else None
+        layouts = [analytics.parse_layout(value, config['ANALYTICS_MAX_TABLES']) for value in args.getlist('layout')]
+        turn_minutes = [int(value) for value in args.get('turn_minutes', '').split(',') if value.strip()]
+        slot_minutes = int(args.get('slot_minutes', analytics.SLOT_MINUTES))
+        if not 1 <= days <= config['ANALYTICS_MAX_DAYS']:
+            raise ValueError(f"days must be between 1 and {config['ANALYTICS_MAX_DAYS']}")
+        if (len(layouts) + 1) * (len(turn_minutes) + 1) > config['ANALYTICS_MAX_SIMULATIONS']:
+            raise ValueError(f"At most {config['ANALYTICS_MAX_SIMULATIONS']} simulations can be run at once")
+        start, end = analytics.day_range(days, end)
+        result = analytics.report(start, end, layouts, turn_minutes, slot_minutes, args.get('heatmaps') != '0')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify({
-        'today_reservations': today_reservations,
-        'total_tables': total_tables,
-        'occupied_tables': occupied_tables,
-        'available_tables': total_tables - occupied_tables,
-        'waitlist_count': waitlist_count
-    })
\ No newline at end of file
+    return jsonify(result)
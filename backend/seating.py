@@ -0,0 +1,191 @@
+from bisect import bisect_left
+from heapq import heappush, heappop
+import threading
+import time
+
+from models import db, Table, Waitlist
+from live import socketio
+from table_allocation import with_retries, AllocationConflict
+from tenancy import PerRestaurant, current_restaurant, restaurant_context
+import changes
+
+
+class SeatingScheduler:
+    """
+    Seats waiting parties as soon as tables are freed
+
+    Committed changes that free a table (or add one) schedule a drain in a
+    background task. A drain matches every free table, smallest first, to the
+    waiting party that suits it best and seats them all in one transaction.
+    Each table prefers the longest-waiting party it is the best fit for, then
+    the longest-waiting smaller party. Waiting parties are kept in memory in
+    one heap per party size, ordered by joined_at, so a match looks at the
+    head of each size instead of scanning the queue.
+
+    Enabled with the AUTO_SEAT setting once init_app has been called. There
+    is one scheduler per restaurant, each draining its own database.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.app = None
+        self.reset()
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['seating_scheduler'] = self
+
+    def reset(self):
+        with self._lock:
+            self._loaded = False
+            self._loaded_at = 0
+            self._waiting = {}       # waitlist_id -> (party_size, joined_at)
+            self._buckets = {}       # party_size -> heap of (joined_at, waitlist_id)
+            self._scheduled = False
+
+    def _load(self):
+        rows = db.session.query(Waitlist.id, Waitlist.party_size, Waitlist.joined_at).filter(
+            Waitlist.status == 'waiting'
+        ).all()
+        with self._lock:
+            self._waiting = {}
+            self._buckets = {}
+            for waitlist_id, party_size, joined_at in rows:
+                self._push(waitlist_id, party_size, joined_at)
+            self._loaded = True
+            self._loaded_at = time.monotonic()
+
+    def _push(self, waitlist_id, party_size, joined_at):
+        self._waiting[waitlist_id] = (party_size, joined_at)
+        heappush(self._buckets.setdefault(party_size, []), (joined_at, waitlist_id))
+
+    def _head(self, party_size):
+        # Entries of parties that left the queue are dropped lazily here
+        heap = self._buckets[party_size]
+        while heap and self._waiting.get(heap[0][1]) != (party_size, heap[0][0]):
+            heappop(heap)
+        return heap[0] if heap else None
+
+    def _pick(self, capacity, smaller):
+        """
+        Pop the longest-waiting party that needs a table of this capacity, i.e.
+        does not fit the next smaller one, or else the longest-waiting party
+        that fits
+        """
+        best_fit = None
+        fits = None
+        for party_size in self._buckets:
+            if party_size > capacity:
+                continue
+            head = self._head(party_size)
+            if head is None:
+                continue
+            if party_size > smaller and (best_fit is None or head < best_fit[0]):
+                best_fit = (head, party_size)
+            if fits is None or head < fits[0]:
+                fits = (head, party_size)
+        chosen = best_fit or fits
+        if chosen is None:
+            return None
+        heappop(self._buckets[chosen[1]])
+        return chosen
+
+    def match(self, tables, capacities):
+        """
+        Pair free tables, smallest first, with waiting parties
+        capacities lists every table capacity in the restaurant, smallest first
+        Returns [(table, waitlist_id)]; the queue itself is left unchanged
+        """
+        with self._lock:
+            pairs = []
+            popped = []
+            for table in sorted(tables, key=lambda table: (table.capacity, table.id)):
+                i = bisect_left(capacities, table.capacity)
+                chosen = self._pick(table.capacity, capacities[i - 1] if i else 0)
+                if chosen is not None:
+                    popped.append(chosen)
+                    pairs.append((table, chosen[0][1]))
+            for head, party_size in popped:
+                heappush(self._buckets[party_size], head)
+            return pairs
+
+    def drain(self):
+        """
+        Seat waiting parties at every free table in one transaction
+        Returns [(waitlist_id, table_id)] for the parties seated
+        """
+        with self._lock:
+            self._scheduled = False
+            if not self._loaded or time.monotonic() - self._loaded_at >= self.app.config['QUEUE_RELOAD_SECONDS']:
+                self._load()
+
+        def attempt():
+            tables = Table.query.filter(Table.is_occupied == False).all()
+            if not tables:
+                return []
+            capacities = sorted(capacity for (capacity,) in db.session.query(Table.capacity).distinct())
+            pairs = self.match(tables, capacities)
+            if not pairs:
+                return []
+
+            entries = {entry.id: entry for entry in Waitlist.query.filter(
+                Waitlist.id.in_([waitlist_id for _, waitlist_id in pairs])
+            )}
+            stale = [waitlist_id for _, waitlist_id in pairs
+                     if waitlist_id not in entries or entries[waitlist_id].status != 'waiting']
+            if stale:
+                # Another worker seated or removed them; forget them and match again
+                with self._lock:
+                    for waitlist_id in stale:
+                        self._waiting.pop(waitlist_id, None)
+                raise AllocationConflict(f"Waitlist entry {stale[0]} is no longer waiting")
+
+            # Both rows are versioned, so a concurrent seating fails the commit
+            for table, waitlist_id in pairs:
+                table.is_occupied = True
+                entries[waitlist_id].status = 'seated'
+            seated = [(waitlist_id, table.id) for table, waitlist_id in pairs]
+            db.session.commit()
+            return seated
+
+        try:
+            return with_retries(attempt)
+        except AllocationConflict:
+            return []
+
+    def _run(self, restaurant):
+        with restaurant_context(self.app, restaurant):
+            self.drain()
+
+    def _start(self):
+        # Changes are applied in the committing context, which names the restaurant
+        restaurant = current_restaurant()
+        if socketio.server is not None:
+            socketio.start_background_task(self._run, restaurant)
+        else:
+            threading.Thread(target=self._run, args=(restaurant,), daemon=True).start()
+
+    def apply(self, committed):
+        """
+        Follow the waiting queue from committed changes and schedule a drain
+        when a table becomes free
+        """
+        with self._lock:
+            freed = False
+            for change in committed:
+                values = change.values
+                if change.model == 'Table':
+                    if change.op == 'insert' or change.changed('is_occupied') or change.changed('capacity'):
+                        freed = freed or (change.op != 'delete' and not values['is_occupied'])
+                elif change.model == 'Waitlist' and self._loaded:
+                    self._waiting.pop(change.id, None)
+                    if change.op != 'delete' and values['status'] == 'waiting':
+                        self._push(change.id, values['party_size'], values['joined_at'])
+
+            if freed and not self._scheduled and self.app is not None and self.app.config['AUTO_SEAT']:
+                self._scheduled = True
+                self._start()
+
+
+seating_scheduler = PerRestaurant(SeatingScheduler)
+changes.subscribe(seating_scheduler.apply)
@@ -0,0 +1,88 @@
+"""
+JSON responses built straight from selected column tuples
+
+List endpoints select only the columns they return instead of loading ORM
+objects and calling to_dict on each one. Rows are encoded with orjson when it
+is installed and with a compact json.dumps otherwise; both write datetimes as
+isoformat() does. Large results are streamed in chunks as they are read from
+the database, and any list can be returned in a columnar form
+({column: [values...]}) that repeats no keys.
+"""
+from datetime import date, datetime
+from itertools import chain, islice
+import json
+
+from flask import Response, stream_with_context
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FORMATS = ('records', 'columnar')
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value):
+    """
+    Encode value as compact JSON bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, default=_default, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def records(names, rows):
+    return [dict(zip(names, row)) for row in rows]
+
+
+def columnar(names, rows):
+    """
+    Transpose rows into one list of values per column
+    """
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    return {name: list(values) for name, values in zip(names, columns)}
+
+
+def check_format(format):
+    if format not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    return format
+
+
+def _chunks(names, rows, chunk_rows):
+    yield b'['
+    separator = b''
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            break
+        yield separator + dumps(records(names, chunk))[1:-1]
+        separator = b','
+    yield b']'
+
+
+def rows_response(names, rows, format='records', status=200, stream_rows=None, chunk_rows=500):
+    """
+    Build a JSON response from rows of values for names
+
+    rows may be a list or any iterable, such as query.yield_per(n). format is
+    'records' (a list of objects, as to_dict gives) or 'columnar'. Record
+    lists longer than stream_rows are sent chunked, chunk_rows rows at a time,
+    reading the rest of rows only as each chunk is sent, so neither the rows
+    nor the encoded body are ever held in memory whole.
+    """
+    check_format(format)
+    rows = iter(rows)
+    if format == 'columnar':
+        return Response(dumps(columnar(names, list(rows))), status=status, mimetype='application/json')
+    head = list(rows) if stream_rows is None else list(islice(rows, stream_rows + 1))
+    if stream_rows is not None and len(head) > stream_rows:
+        return Response(stream_with_context(_chunks(names, chain(head, rows), chunk_rows)), status=status,
+                        mimetype='application/json')
+    return Response(dumps(records(names, head)), status=status, mimetype='application/json')
@@ -0,0 +1,92 @@
+"""
+Engine and connection settings for the configured database
+
+With the 'production' profile every SQLite connection is switched to WAL, so
+readers keep reading while a writer commits, and connections are pooled
+instead of reopened on every checkout. The 'default' profile leaves SQLite
+as it ships: rollback journal and a new connection per checkout.
+"""
+from functools import partial
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+PROFILES = ('production', 'default')
+
+
+def engine_options(config, uri=None):
+    """
+    SQLAlchemy engine options for the database at uri, by default config's,
+    and the storage profile
+    """
+    url = make_url(uri or config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() != 'sqlite':
+        return {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True
+        }
+
+    if config['STORAGE_PROFILE'] == 'default' or url.database in (None, '', ':memory:'):
+        return {}
+    return {
+        'poolclass': QueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        # A pooled connection is used by one thread at a time, but not always the same one
+        'connect_args': {'check_same_thread': False, 'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}
+    }
+
+
+def sqlite_pragmas(config):
+    """
+    (name, value) PRAGMAs to run on every new SQLite connection
+    """
+    if config['STORAGE_PROFILE'] == 'default':
+        return []
+    return [
+        ('journal_mode', 'WAL'),
+        # With WAL, NORMAL only syncs at checkpoints; a power loss can drop the
+        # last commits but never corrupts the database
+        ('synchronous', 'NORMAL'),
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT_MS']),
+        # A negative cache_size is in KiB
+        ('cache_size', -config['SQLITE_CACHE_MB'] * 1024),
+        ('mmap_size', config['SQLITE_MMAP_MB'] * 1024 * 1024),
+        ('temp_store', 'MEMORY')
+    ]
+
+
+def _apply_pragmas(pragmas, dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas:
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+
+def configure_engine(config, engine):
+    """
+    Run the storage profile's PRAGMAs on every new connection of engine
+    """
+    # Creating an engine does not connect yet, so every connection gets them
+    pragmas = sqlite_pragmas(config)
+    if engine.dialect.name == 'sqlite' and pragmas:
+        event.listen(engine, 'connect', partial(_apply_pragmas, pragmas))
+
+
+def init_app(app):
+    """
+    Apply the storage profile to app's engine; call after db.init_app(app)
+    Options already in SQLALCHEMY_ENGINE_OPTIONS take precedence.
+    """
+    if app.config['STORAGE_PROFILE'] not in PROFILES:
+        raise ValueError(f"STORAGE_PROFILE must be one of {', '.join(PROFILES)}")
+
+    options = engine_options(app.config)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    db = app.extensions['sqlalchemy'].db
+    configure_engine(app.config, db.get_engine(app))
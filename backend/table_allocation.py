@@ -1,39 +1,152 @@
 from models import Table, Reservation, Waitlist, db
-from datetime import datetime, timedelta
+import random
+import time
+from flask import current_app
+from sqlalchemy import or_
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+from availability import availability_index, CONFLICT_WINDOW, ACTIVE_STATUSES, naive, reservation_tables, joined_ids
+from wait_times import wait_estimator
+from metrics import timed
 
+
+class AllocationConflict(Exception):
+    """
+    Another worker booked or seated the chosen table first
+    """
+
+
+def with_retries(attempt):
+    """
+    Call attempt() until it completes without losing a race to another worker
+    
+    attempt must do all of its reads and writes, including the commit, itself:
+    when it raises AllocationConflict, a StaleDataError from a versioned row or
+    a locked database, the session is rolled back and attempt runs again after
+    a short random backoff, up to ALLOCATION_RETRIES times. Anything left
+    uncommitted in the session before the call is lost on a retry.
+    Raises AllocationConflict once the retries are used up.
+    """
+    retries = current_app.config['ALLOCATION_RETRIES']
+    for retry in range(retries + 1):
+        try:
+            return attempt()
+        except (AllocationConflict, StaleDataError, OperationalError) as e:
+            db.session.rollback()
+            if isinstance(e, OperationalError) and 'database is locked' not in str(e.orig):
+                raise
+        if retry < retries:
+            time.sleep(random.uniform(0, current_app.config['ALLOCATION_RETRY_DELAY'] * 2 ** retry))
+    raise AllocationConflict(f"Gave up after {retries} retries")
+
+
+def claim_tables(tables):
+    """
+    Bump the version of each table so that the flush fails with StaleDataError
+    if another worker changed any of them since they were read
+    """
+    for table in tables:
+        table.version += 1
+
+
+def find_conflicts(reservations):
+    """
+    Return the reservations with a table held by another active reservation
+    within the conflict window, checked against the database
+    """
+    reservations = [r for r in reservations if r.table_id is not None]
+    if not reservations:
+        return []
+    
+    times = [naive(r.reservation_time) for r in reservations]
+    held = [reservation_tables(r.table_id, r.joined_table_ids) for r in reservations]
+    own = {r.id for r in reservations}
+    # Tables joined to another reservation are not indexed, so those
+    # reservations are read whatever their first table is
+    rows = db.session.query(
+        Reservation.id, Reservation.table_id, Reservation.joined_table_ids, Reservation.reservation_time
+    ).filter(
+        or_(Reservation.table_id.in_({table_id for tables in held for table_id in tables}),
+            Reservation.joined_table_ids.isnot(None)),
+        Reservation.status.in_(ACTIVE_STATUSES),
+        Reservation.reservation_time.between(min(times) - CONFLICT_WINDOW, max(times) + CONFLICT_WINDOW)
+    ).all()
+    
+    booked = {}
+    for reservation_id, table_id, joined_table_ids, reservation_time in rows:
+        if reservation_id not in own:
+            for other_table in reservation_tables(table_id, joined_table_ids):
+                booked.setdefault(other_table, []).append(reservation_time)
+    return [r for r, t, tables in zip(reservations, times, held)
+            if any(abs(other - t) <= CONFLICT_WINDOW for table_id in tables for other in booked.get(table_id, ()))]
+
+
+@timed
+def assign_tables(reservations):
+    """
+    Give every reservation without a table the smallest table that is free at
+    its time, or else the smallest free group of adjacent tables, and confirm
+    it; reservations that do not fit anywhere are left unchanged. Returns the
+    list of assigned Tables (or None) for each reservation.
+    
+    Tables are chosen from the in-memory availability index, which does not
+    see bookings made by other workers until they conflict. The chosen tables
+    are claimed by bumping their version, so a concurrent claim on the same
+    table fails at flush, and once flushed the choices are checked against the
+    database. Either failure drops the affected days from the index and raises,
+    for with_retries to start over. The caller commits.
+    """
+    unassigned = [r for r in reservations if r.table_id is None]
+    
+    # New reservations are inserted once their table is set, not before
+    with db.session.no_autoflush:
+        table_ids = availability_index.find_table_ids(
+            [(r.party_size, r.reservation_time) for r in unassigned]
+        )
+        chosen_ids = {table_id for found in table_ids if found is not None for table_id in found}
+        chosen = {table.id: table for table in Table.query.filter(Table.id.in_(chosen_ids))} if chosen_ids else {}
+    
+    assigned = {}
+    for reservation, found in zip(unassigned, table_ids):
+        if found is not None:
+            reservation.table_id = found[0]
+            reservation.joined_table_ids = joined_ids(found)
+            reservation.status = 'confirmed'
+            assigned[id(reservation)] = [chosen[table_id] for table_id in found]
+    
+    if chosen:
+        claim_tables(chosen.values())
+        times = [naive(r.reservation_time) for r in unassigned]
+        try:
+            db.session.flush()
+            conflicts = find_conflicts(unassigned)
+        except StaleDataError:
+            availability_index.invalidate(min(times) - CONFLICT_WINDOW, max(times) + CONFLICT_WINDOW)
+            raise
+        if conflicts:
+            availability_index.invalidate(min(times) - CONFLICT_WINDOW, max(times) + CONFLICT_WINDOW)
+            raise AllocationConflict(f"Table {conflicts[0].table_id} was booked by another worker")
+    
+    return [assigned.get(id(r)) for r in reservations]
+
+
+@timed
 def find_available_table(party_size, reservation_time=None):
     """
-    Find an available table that can accommodate the party size
+    Find available tables that can accommodate the party size: one table if
+    any fits, or else a group of adjacent tables pushed together
     If reservation_time is provided, check for availability at that time
     Otherwise, check for current availability
+    Returns a list of Tables, or None
     """
     # If checking for a future reservation
     if reservation_time:
-        # Get all tables
-        tables = Table.query.filter(Table.capacity >= party_size).order_by(Table.capacity).all()
-        
-        # Check which tables are available at the requested time
-        available_tables = []
-        
-        for table in tables:
-            # Check if table has any reservations that would conflict
-            # A reservation typically lasts 2 hours
-            reservation_start = reservation_time - timedelta(hours=1.5)
-            reservation_end = reservation_time + timedelta(hours=1.5)
-            
-            conflicting_reservation = Reservation.query.filter(
-                Reservation.table_id == table.id,
-                Reservation.status.in_(['confirmed', 'pending']),
-                Reservation.reservation_time.between(reservation_start, reservation_end)
-            ).first()
-            
-            if not conflicting_reservation:
-                available_tables.append(table)
-        
-        # Return the smallest available table that fits the party
-        if available_tables:
-            return available_tables[0]
-        return None
+        # Conflicts are checked against the in-memory availability index,
+        # so only the chosen tables are loaded from the database
+        table_ids = availability_index.find_tables(party_size, reservation_time)
+        if table_ids is None:
+            return None
+        return Table.query.filter(Table.id.in_(table_ids)).order_by(Table.id).all()
     
     # If checking for immediate seating
     else:
@@ -42,79 +155,98 @@ def find_available_table(party_size, reservation_time=None):
             Table.capacity >= party_size,
             Table.is_occupied == False
         ).order_by(Table.capacity).first()
+        if available_table:
+            return [available_table]
         
-        return available_table
+        # Otherwise the smallest group of adjacent unoccupied tables
+        combinations = availability_index.combinations()
+        if not combinations:
+            return None
+        occupied = [table_id for (table_id,) in db.session.query(Table.id).filter(Table.is_occupied == True)]
+        table_ids = combinations.find(party_size, combinations.mask(occupied))
+        if table_ids is None:
+            return None
+        return Table.query.filter(Table.id.in_(table_ids)).order_by(Table.id).all()
 
+def _describe(tables):
+    if len(tables) == 1:
+        return f"Table {tables[0].table_number}"
+    return f"Tables {' + '.join(str(table.table_number) for table in tables)}"
+
+@timed
 def allocate_table_for_reservation(reservation_id):
     """
-    Allocate a table for a confirmed reservation
+    Allocate a table for an active reservation and confirm it
     """
-    reservation = Reservation.query.get(reservation_id)
-    if not reservation:
-        return False, "Reservation not found"
-    
-    if reservation.status != 'confirmed':
-        return False, "Reservation is not confirmed"
-    
-    # Find an available table
-    table = find_available_table(reservation.party_size, reservation.reservation_time)
-    
-    if not table:
-        return False, "No suitable table available"
-    
-    # Assign the table to the reservation
-    reservation.table_id = table.id
-    db.session.commit()
+    def attempt():
+        reservation = Reservation.query.get(reservation_id)
+        if not reservation:
+            return False, "Reservation not found"
+        
+        if reservation.status not in ACTIVE_STATUSES:
+            return False, f"Reservation is {reservation.status}"
+        
+        # Assign the smallest free table, or group of tables, to the reservation
+        tables, = assign_tables([reservation])
+        
+        if not tables:
+            return False, "No suitable table available"
+        
+        db.session.commit()
+        
+        return True, f"{_describe(tables)} assigned to reservation"
     
-    return True, f"Table {table.table_number} assigned to reservation"
+    try:
+        return with_retries(attempt)
+    except AllocationConflict:
+        return False, "Tables are being booked concurrently, please try again"
 
+def seat_party(waitlist_entry, tables):
+    """
+    Mark the tables occupied and the party on the waitlist seated; the caller commits
+    Returns the message for the client
+    """
+    for table in tables:
+        table.is_occupied = True
+    waitlist_entry.status = 'seated'
+    return f"Party seated at {_describe(tables).lower()}"
+
+@timed
 def seat_waitlist_party(waitlist_id):
     """
     Find an available table for a party on the waitlist
+    Both rows are versioned, so if another worker seats someone at the same
+    table or seats the same party first, the commit fails and is retried
     """
-    waitlist_entry = Waitlist.query.get(waitlist_id)
-    if not waitlist_entry:
-        return False, "Waitlist entry not found"
-    
-    if waitlist_entry.status != 'waiting':
-        return False, f"Party is already {waitlist_entry.status}"
-    
-    # Find an available table
-    table = find_available_table(waitlist_entry.party_size)
-    
-    if not table:
-        return False, "No suitable table available at this time"
-    
-    # Mark the table as occupied
-    table.is_occupied = True
-    
-    # Update waitlist status
-    waitlist_entry.status = 'seated'
-    
-    db.session.commit()
+    def attempt():
+        waitlist_entry = Waitlist.query.get(waitlist_id)
+        if not waitlist_entry:
+            return False, "Waitlist entry not found"
+        
+        if waitlist_entry.status != 'waiting':
+            return False, f"Party is already {waitlist_entry.status}"
+        
+        # Find an available table, or adjacent tables to push together
+        tables = find_available_table(waitlist_entry.party_size)
+        
+        if not tables:
+            return False, "No suitable table available at this time"
+        
+        message = seat_party(waitlist_entry, tables)
+        db.session.commit()
+        
+        return True, message
     
-    return True, f"Party seated at table {table.table_number}"
+    try:
+        return with_retries(attempt)
+    except AllocationConflict:
+        return False, "Tables are being seated concurrently, please try again"
 
+@timed
 def calculate_wait_time(party_size):
     """
-    Estimate the wait time for a party of a given size
-    This is a simplified algorithm that could be improved
+    Estimate the wait time for a party of a given size joining the waitlist now
+    Based on the parties already waiting for the same or smaller tables and on
+    how long tables of each size have recently stayed occupied
     """
-    # Count how many parties are waiting for tables that could accommodate this party
-    waiting_ahead = Waitlist.query.filter(
-        Waitlist.status == 'waiting',
-        Waitlist.party_size <= party_size,
-        Waitlist.joined_at < datetime.utcnow()
-    ).count()
-    
-    # Get count of suitable tables
-    suitable_tables = Table.query.filter(Table.capacity >= party_size).count()
-    
-    # Simplified wait time calculation - 15 minutes per party waiting
-    # divided by number of suitable tables (minimum 1)
-    if suitable_tables > 0:
-        estimated_wait = max(15, (waiting_ahead * 15) // suitable_tables)
-    else:
-        estimated_wait = waiting_ahead * 15
-    
-    return estimated_wait
\ No newline at end of file
+    return wait_estimator.estimate(party_size)
\ No newline at end of file
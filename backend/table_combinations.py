@@ -0,0 +1,112 @@
+"""
+Groups of adjacent tables that can be pushed together for one large party
+
+Tables are adjacent when a TableAdjacency row pairs them, and a group is any
+set of up to MAX_COMBINED_TABLES tables connected through such pairs. Groups
+are enumerated once per floor plan and kept ordered by total capacity, each
+with a bitmask of its tables, so finding one for a party is a bisect on the
+party size followed by one mask test per larger group against the tables
+that are busy at the time.
+"""
+from bisect import bisect_left
+from itertools import combinations
+
+
+def _extend(group, extension, root, neighbours, max_tables, found):
+    """
+    Collect every connected group that contains group and otherwise only
+    tables above root, each exactly once (the ESU enumeration)
+    """
+    if len(group) > 1:
+        found.append(tuple(sorted(group)))
+    if len(group) == max_tables:
+        return
+    near = set(group).union(*(neighbours[table_id] for table_id in group))
+    extension = set(extension)
+    while extension:
+        table_id = extension.pop()
+        exclusive = {other for other in neighbours[table_id] if other > root and other not in near}
+        _extend(group + [table_id], extension | exclusive, root, neighbours, max_tables, found)
+
+
+class TableCombinations:
+    """
+    Every group of adjacent tables, smallest total capacity first
+
+    tables is [(capacity, table_id)] and pairs the adjacent (table_id,
+    table_id) pairs. Among groups of the same total capacity, those made of
+    fewer tables come first.
+    """
+
+    def __init__(self, tables, pairs, max_tables):
+        self.capacity_of = {table_id: capacity for capacity, table_id in tables}
+        self._bits = {table_id: 1 << i for i, (_, table_id) in enumerate(tables)}
+
+        neighbours = {table_id: set() for table_id in self.capacity_of}
+        for a, b in pairs:
+            if a != b and a in neighbours and b in neighbours:
+                neighbours[a].add(b)
+                neighbours[b].add(a)
+
+        found = []
+        if max_tables > 1:
+            for root in neighbours:
+                _extend([root], {other for other in neighbours[root] if other > root}, root,
+                        neighbours, max_tables, found)
+
+        ordered = sorted((sum(self.capacity_of[table_id] for table_id in group), len(group), group)
+                         for group in found)
+        self._totals = [total for total, _, _ in ordered]
+        self._groups = [(group, self.mask(group)) for _, _, group in ordered]
+
+    def __len__(self):
+        return len(self._groups)
+
+    def __iter__(self):
+        return (group for group, _ in self._groups)
+
+    def mask(self, table_ids):
+        mask = 0
+        for table_id in table_ids:
+            mask |= self._bits.get(table_id, 0)
+        return mask
+
+    def find(self, party_size, busy):
+        """
+        Return the free group with the fewest seats that fits the party, as a
+        tuple of table ids, or None; busy is the mask of the busy tables
+        """
+        for i in range(bisect_left(self._totals, party_size), len(self._groups)):
+            group, mask = self._groups[i]
+            if not mask & busy:
+                return group
+        return None
+
+    def size_class(self, party_size):
+        """
+        The smallest total capacity that fits the party, or None; parties of
+        the same class can use the same groups
+        """
+        i = bisect_left(self._totals, party_size)
+        return self._totals[i] if i < len(self._totals) else None
+
+    def fitting(self, size_class):
+        """
+        The groups of at least size_class seats that matter when asking
+        whether any of them is free
+
+        A group that contains a smaller fitting group, or a table that seats
+        the party alone, is busy whenever that one is, so it is left out.
+        """
+        kept = []
+        kept_set = set()
+        for i in range(bisect_left(self._totals, size_class), len(self._groups)):
+            group = self._groups[i][0]
+            if any(self.capacity_of[table_id] >= size_class for table_id in group):
+                continue
+            # Groups are small, so checking each of their subsets is cheap
+            if any(subset in kept_set for size in range(2, len(group)) for subset in combinations(group, size)):
+                continue
+            kept.append(group)
+            kept_set.add(group)
+        return kept
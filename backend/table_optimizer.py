@@ -0,0 +1,271 @@
+from bisect import bisect_left, bisect_right
+from heapq import heappush, heappop
+from itertools import groupby
+
+from models import db, Table, Reservation
+from availability import CONFLICT_WINDOW, ACTIVE_STATUSES, naive, reservation_tables
+from table_allocation import claim_tables
+
+# Marks a booking that the optimizer may not move
+FIXED = None
+
+# Weight bonuses that make the solver keep existing bookings before adding covers
+KEEP_BONUS = 10 ** 6
+FIXED_BONUS = 10 ** 9
+
+
+class _Schedule:
+    """
+    Per-table sorted start times of the bookings placed so far
+    """
+
+    def __init__(self, tables, blockers=()):
+        self.tables = tables                          # [(capacity, table_id)] smallest first
+        self.capacities = [capacity for capacity, _ in tables]
+        self.times = {table_id: [] for _, table_id in tables}
+        self.owners = {table_id: [] for _, table_id in tables}
+        self.table_of = {}                            # reservation_id -> table_id
+        for table_id, reservation_time in blockers:
+            if table_id in self.times:
+                self.place(table_id, reservation_time, FIXED)
+
+    def place(self, table_id, reservation_time, owner):
+        times = self.times[table_id]
+        i = bisect_right(times, reservation_time)
+        times.insert(i, reservation_time)
+        self.owners[table_id].insert(i, owner)
+        if owner is not FIXED:
+            self.table_of[owner] = table_id
+
+    def is_free(self, table_id, reservation_time):
+        times = self.times[table_id]
+        i = bisect_left(times, reservation_time - CONFLICT_WINDOW)
+        return i == len(times) or times[i] > reservation_time + CONFLICT_WINDOW
+
+    def best_fit(self, party_size, reservation_time):
+        for _, table_id in self.tables[bisect_left(self.capacities, party_size):]:
+            if self.is_free(table_id, reservation_time):
+                return table_id
+        return None
+
+    def fill(self, reservations):
+        """
+        Best-fit every reservation that is not placed yet, largest parties first
+        """
+        for r in sorted(reservations, key=lambda r: (-r['party_size'], r['time'], r['id'])):
+            if r['id'] not in self.table_of:
+                table_id = self.best_fit(r['party_size'], r['time'])
+                if table_id is not None:
+                    self.place(table_id, r['time'], r['id'])
+
+    def assignment(self, reservations):
+        return {r['id']: self.table_of.get(r['id']) for r in reservations}
+
+
+def _max_weight_intervals(intervals, machines):
+    """
+    Pick the heaviest set of (time, weight, key) bookings that can share
+    machines tables, returning their keys
+
+    Each booking holds its table over [time, time + CONFLICT_WINDOW], so two
+    bookings overlap exactly when their start times conflict. Solved exactly
+    as a min-cost flow (Carlisle & Lloyd): one node per start or end point in
+    time order, a chain of edges carrying up to machines units at no cost and
+    one unit-capacity edge per booking costing -weight. Each unit of flow is
+    one table's service; successive shortest paths push them one at a time.
+    """
+    # Start points sort before end points at the same instant so that touching
+    # bookings, which conflict, cannot follow each other on one unit of flow
+    points = sorted({(t, 0) for t, _, _ in intervals} | {(t + CONFLICT_WINDOW, 1) for t, _, _ in intervals})
+    index = {point: i + 1 for i, point in enumerate(points)}
+    source, sink = 0, len(points) + 1
+    graph = [[] for _ in range(sink + 1)]
+
+    def add_edge(u, v, capacity, cost):
+        graph[u].append([v, capacity, cost, len(graph[v])])
+        graph[v].append([u, 0, -cost, len(graph[u]) - 1])
+
+    for u in range(sink):
+        add_edge(u, u + 1, machines, 0)
+    booking_edges = []
+    for t, weight, key in intervals:
+        u = index[(t, 0)]
+        add_edge(u, index[(t + CONFLICT_WINDOW, 1)], 1, -weight)
+        booking_edges.append((u, len(graph[u]) - 1, key))
+
+    # Every edge points forward in time, so the initial potentials are one DAG pass
+    potential = [0] * (sink + 1)
+    for u in range(sink + 1):
+        for v, capacity, cost, _ in graph[u]:
+            if capacity and potential[u] + cost < potential[v]:
+                potential[v] = potential[u] + cost
+
+    for _ in range(machines):
+        distance = [None] * (sink + 1)
+        parent = [None] * (sink + 1)
+        distance[source] = 0
+        heap = [(0, source)]
+        while heap:
+            d, u = heappop(heap)
+            if d > distance[u]:
+                continue
+            for i, (v, capacity, cost, _) in enumerate(graph[u]):
+                if not capacity:
+                    continue
+                nd = d + cost + potential[u] - potential[v]
+                if distance[v] is None or nd < distance[v]:
+                    distance[v] = nd
+                    parent[v] = (u, i)
+                    heappush(heap, (nd, v))
+        if distance[sink] is None:
+            break
+        for u in range(sink + 1):
+            if distance[u] is not None:
+                potential[u] += distance[u]
+        if potential[sink] - potential[source] >= 0:
+            break
+
+        v = sink
+        while v != source:
+            u, i = parent[v]
+            edge = graph[u][i]
+            edge[1] -= 1
+            graph[v][edge[3]][1] += 1
+            v = u
+
+    return [key for u, i, key in booking_edges if graph[u][i][1] == 0]
+
+
+def _solve(tables, blockers, reservations, keep, pinned=None):
+    """
+    Fill the smallest table class first: choose the heaviest set of parties
+    that fit it and can share its tables, hand them out in time order, and
+    pass everyone else up to the next class
+
+    Parties in keep outweigh any number of covers. pinned maps reservation ids
+    to the only table capacity they may be offered.
+    """
+    pinned = pinned or {}
+    schedule = _Schedule(tables, blockers)
+    fixed_times = {}
+    for table_id, reservation_time in blockers:
+        fixed_times.setdefault(table_id, []).append(reservation_time)
+
+    remaining = sorted(reservations, key=lambda r: r['party_size'])
+    for capacity, group in groupby(tables, key=lambda table: table[0]):
+        table_ids = [table_id for _, table_id in group]
+        candidates = [r for r in remaining if r['party_size'] <= capacity and pinned.get(r['id'], capacity) == capacity]
+        if not candidates:
+            continue
+
+        intervals = [(t, FIXED_BONUS, FIXED) for table_id in table_ids for t in fixed_times.get(table_id, [])]
+        intervals += [(r['time'], r['party_size'] + (KEEP_BONUS if r['id'] in keep else 0), r['id'])
+                      for r in candidates]
+        chosen = set(_max_weight_intervals(intervals, len(table_ids)))
+
+        for r in sorted(candidates, key=lambda r: (r['time'], r['id'])):
+            if r['id'] not in chosen:
+                continue
+            for table_id in table_ids:
+                if schedule.is_free(table_id, r['time']):
+                    schedule.place(table_id, r['time'], r['id'])
+                    break
+
+        remaining = [r for r in remaining if r['id'] not in schedule.table_of]
+
+    schedule.fill(reservations)
+    return schedule.assignment(reservations)
+
+
+def _covers(reservations, assignment):
+    return sum(r['party_size'] for r in reservations if assignment.get(r['id']) is not None)
+
+
+def optimize_window(start, end, apply=True):
+    """
+    Re-assign tables for every active reservation starting between start and end
+    to seat as many covers as possible
+
+    Reservations that already have a table keep one (possibly a different one);
+    unassigned reservations are confirmed when room can be made for them.
+    Bookings just outside the window, seated reservations and parties at
+    tables pushed together stay where they are. The new table ids are written
+    in one transaction unless apply is False. Every table that receives a
+    reservation is claimed with the version read here, so the commit fails
+    with StaleDataError if another worker changed it while the plan was being
+    solved.
+    """
+    start, end = naive(start), naive(end)
+
+    table_rows = Table.query.order_by(Table.capacity, Table.id).all()
+    tables = [(table.capacity, table.id) for table in table_rows]
+
+    rows = db.session.query(
+        Reservation.id, Reservation.party_size, Reservation.reservation_time,
+        Reservation.status, Reservation.table_id, Reservation.joined_table_ids
+    ).filter(
+        Reservation.reservation_time >= start - CONFLICT_WINDOW,
+        Reservation.reservation_time <= end + CONFLICT_WINDOW,
+        Reservation.status.in_(ACTIVE_STATUSES + ('seated',))
+    ).all()
+
+    reservations = []
+    blockers = []
+    for reservation_id, party_size, reservation_time, status, table_id, joined_table_ids in rows:
+        if joined_table_ids:
+            # Parties at tables pushed together stay where they are
+            blockers += [(held, reservation_time) for held in reservation_tables(table_id, joined_table_ids)]
+        elif start <= reservation_time <= end and status in ACTIVE_STATUSES:
+            reservations.append({
+                'id': reservation_id,
+                'party_size': party_size,
+                'time': reservation_time,
+                'table_id': table_id
+            })
+        elif table_id is not None:
+            blockers.append((table_id, reservation_time))
+
+    current = {r['id']: r['table_id'] for r in reservations}
+    keep = {r['id'] for r in reservations if r['table_id'] is not None}
+
+    # Keeping the current plan and filling its gaps is the fallback whenever
+    # the solver cannot beat it without moving someone off a table
+    schedule = _Schedule(tables, blockers)
+    for r in reservations:
+        if r['table_id'] in schedule.times:
+            schedule.place(r['table_id'], r['time'], r['id'])
+    schedule.fill(reservations)
+    best = schedule.assignment(reservations)
+
+    # Solve once letting seated parties change table class and once keeping
+    # each of them in its current class, which always has room for them
+    capacity_of = {table_id: capacity for capacity, table_id in tables}
+    pinned = {r['id']: capacity_of[r['table_id']] for r in reservations if r['table_id'] in capacity_of}
+    for solved in (_solve(tables, blockers, reservations, keep),
+                   _solve(tables, blockers, reservations, keep, pinned)):
+        if all(solved[rid] is not None for rid in keep) and \
+                _covers(reservations, solved) > _covers(reservations, best):
+            best = solved
+
+    changed = [r for r in reservations if best[r['id']] != current[r['id']]]
+
+    if apply and changed:
+        by_id = {r.id: r for r in Reservation.query.filter(
+            Reservation.id.in_([r['id'] for r in changed])
+        )}
+        for r in changed:
+            reservation = by_id[r['id']]
+            reservation.table_id = best[r['id']]
+            reservation.status = 'confirmed'
+        targets = {best[r['id']] for r in changed}
+        claim_tables([table for table in table_rows if table.id in targets])
+        db.session.commit()
+
+    return {
+        'reservations': len(reservations),
+        'covers_before': _covers(reservations, current),
+        'covers_after': _covers(reservations, best),
+        'changed': [{'id': r['id'], 'from_table_id': current[r['id']], 'to_table_id': best[r['id']]}
+                    for r in changed],
+        'applied': bool(apply and changed)
+    }
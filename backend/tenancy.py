@@ -0,0 +1,155 @@
+"""
+Several restaurants served by one deployment, each in its own database
+
+Requests under /api/restaurants/<restaurant>/ work on that restaurant's
+database, built from the RESTAURANT_DATABASE_URI template, while /api/ keeps
+working on DATABASE_URI as the 'default' restaurant. With SQLite every
+restaurant gets its own file, so a busy location never holds the write lock
+of another. The restaurant of the current app context picks the engine, and
+in-memory caches keep one instance per restaurant.
+"""
+from contextlib import contextmanager
+import re
+import threading
+
+from flask import abort, current_app, g, has_app_context
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.engine import make_url
+
+import storage
+
+DEFAULT_RESTAURANT = 'default'
+
+# Restaurant keys end up in URLs and file names
+RESTAURANT_KEY = re.compile(r'^[a-z0-9][a-z0-9_-]{0,63}$')
+
+
+def restaurants(config):
+    """
+    The default restaurant followed by the keys listed in RESTAURANTS
+    """
+    return [DEFAULT_RESTAURANT] + [key.strip() for key in config['RESTAURANTS'].split(',') if key.strip()]
+
+
+def current_restaurant():
+    if has_app_context():
+        return g.get('restaurant', DEFAULT_RESTAURANT)
+    return DEFAULT_RESTAURANT
+
+
+def use_restaurant(restaurant):
+    """
+    Route the database work of the current app context to restaurant
+    """
+    if restaurant != current_restaurant():
+        # A session opened before this point is bound to the other database
+        session = current_app.extensions['sqlalchemy'].db.session
+        if session.registry.has():
+            session.remove()
+    g.restaurant = restaurant
+
+
+@contextmanager
+def restaurant_context(app, restaurant):
+    """
+    An app context working on restaurant, for background tasks and commands
+    """
+    with app.app_context():
+        use_restaurant(restaurant)
+        yield
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """
+    Flask-SQLAlchemy with one engine per restaurant
+
+    Sessions, queries and create_all() use the engine of the current
+    restaurant. Restaurant engines get the storage profile's options and
+    PRAGMAs for their own URI.
+    """
+
+    _restaurant_lock = threading.Lock()
+
+    def get_engine(self, app=None, bind=None):
+        restaurant = current_restaurant()
+        if bind is not None or restaurant == DEFAULT_RESTAURANT:
+            return super().get_engine(app, bind)
+
+        app = self.get_app(app)
+        engines = app.extensions.setdefault('restaurant_engines', {})
+        with self._restaurant_lock:
+            engine = engines.get(restaurant)
+            if engine is None:
+                engine = engines[restaurant] = self._create_restaurant_engine(app, restaurant)
+            return engine
+
+    def _create_restaurant_engine(self, app, restaurant):
+        uri = app.config['RESTAURANT_DATABASE_URI'].format(restaurant=restaurant)
+        sa_url, options = self.apply_driver_hacks(app, make_url(uri), self.apply_pool_defaults(app, {}))
+        options.update(storage.engine_options(app.config, uri))
+        engine = self.create_engine(sa_url, options)
+        storage.configure_engine(app.config, engine)
+        return engine
+
+
+class PerRestaurant:
+    """
+    One instance of an in-memory cache per restaurant, made by factory on
+    first use
+
+    Attribute access goes to the current restaurant's instance. apply, reset
+    and init_app are forwarded explicitly so they can be subscribed to
+    changes and called before any restaurant is selected.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._instances = {}
+        self._app = None
+
+    def get(self, restaurant=None):
+        restaurant = restaurant or current_restaurant()
+        with self._lock:
+            instance = self._instances.get(restaurant)
+            if instance is None:
+                instance = self._instances[restaurant] = self._factory()
+                if self._app is not None:
+                    instance.init_app(self._app)
+            return instance
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def init_app(self, app):
+        with self._lock:
+            self._app = app
+            instances = list(self._instances.values())
+        for instance in instances:
+            instance.init_app(app)
+
+    def apply(self, committed):
+        self.get().apply(committed)
+
+    def reset(self):
+        with self._lock:
+            instances = list(self._instances.values())
+        for instance in instances:
+            instance.reset()
+
+
+def init_app(app):
+    """
+    Check the configured restaurant keys and select the restaurant named by
+    the <restaurant> URL segment for each request
+    """
+    for key in restaurants(app.config)[1:]:
+        if not RESTAURANT_KEY.match(key) or key == DEFAULT_RESTAURANT:
+            raise ValueError(f"Invalid restaurant key {key!r} in RESTAURANTS")
+
+    @app.url_value_preprocessor
+    def select_restaurant(endpoint, values):
+        restaurant = (values or {}).pop('restaurant', DEFAULT_RESTAURANT)
+        if restaurant not in restaurants(app.config):
+            abort(404)
+        use_restaurant(restaurant)
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules are imported as top-level modules, as app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from config import Config
+from availability import availability_index, free_slots
+from dashboard import dashboard_counters
+from response_cache import response_cache
+from wait_times import wait_estimator
+
+
+@pytest.fixture
+def make_client(tmp_path):
+    """
+    Build an app on a fresh database, with config overriding settings, and
+    return its test client
+    """
+    def make(**config):
+        settings = {
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'test.db'),
+            'LIFECYCLE_SWEEP': False,
+            'METRICS': False
+        }
+        settings.update(config)
+        for cache in (availability_index, free_slots, dashboard_counters, wait_estimator, response_cache):
+            cache.reset()
+        # Set before create_app, which reads some settings to decide what to register
+        return create_app(type('TestConfig', (Config,), settings)).test_client()
+    return make
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client()
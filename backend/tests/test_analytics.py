@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import analytics
+
+pytestmark = pytest.mark.skipif(not analytics.AVAILABLE, reason="NumPy is not installed")
+
+
+def test_layout_with_too_many_tables_is_refused(client):
+    response = client.get('/api/analytics?layout=2x100000')
+    assert response.status_code == 400
+    assert response.json == {'error': "A layout can have at most 500 tables"}
+    assert client.get('/api/analytics?layout=2x1000000000000').status_code == 400
+
+
+def test_layout_at_the_limit_is_simulated(client):
+    response = client.get('/api/analytics?days=1&heatmaps=0&layout=2x250,4x250')
+    assert response.status_code == 200
+
+
+def test_layout_parsing():
+    assert analytics.parse_layout('2,2,4x3, 6') == [2, 2, 4, 4, 4, 6]
+    for value in ('', '0x2', '4x', 'big', '2,4x-1', '2,4x0'):
+        with pytest.raises(ValueError):
+            analytics.parse_layout(value)
+
+
+def test_history_is_replayed_on_other_layouts(client):
+    time = (datetime.utcnow() + timedelta(days=1)).replace(hour=19, minute=0, second=0, microsecond=0)
+    for party_size in (2, 2, 8):
+        client.post('/api/reservations', json={'customer_name': "Guest", 'phone_number': "555",
+                                               'party_size': party_size, 'reservation_time': time.isoformat()})
+
+    response = client.get('/api/analytics?days=2&end=' + (time + timedelta(days=1)).strftime('%Y-%m-%d') +
+                          '&layout=2&turn_minutes=30')
+    assert response.status_code == 200
+    report = response.json
+    assert (report['requests'], report['covers_requested'], report['rejected']) == (3, 12, 0)
+    assert len(report['tables']) == 6 and len(report['table_occupancy']) == 6
+    current, current_short, single, single_short = report['simulations']
+    assert (current['layout'], current['turn_minutes'], current['rejected']) == ([2, 2, 4, 4, 6, 8], 90, 0)
+    assert (single['layout'], single['rejected'], single['rejected_by_party_size']) == ([2], 2, {'2': 1, '8': 1})
+    assert single_short['turn_minutes'] == 30
+
+
+@pytest.mark.parametrize('query', ['days=0', 'days=1000', 'slot_minutes=7', 'turn_minutes=0', 'end=tomorrow',
+                                   'layout=2&layout=4&layout=6&turn_minutes=30,60,120,150'])
+def test_bad_parameters_are_refused(client, query):
+    assert client.get('/api/analytics?' + query).status_code == 400
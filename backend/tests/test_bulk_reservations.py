@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+import json
+
+from sqlalchemy import event
+
+from models import db
+
+
+def rows(count, start=0):
+    day = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    return [{'customer_name': f"Guest {i}", 'phone_number': "555 0100", 'party_size': 2 + i % 3,
+             'reservation_time': (day + timedelta(minutes=30 * i)).isoformat()} for i in range(start, start + count)]
+
+
+def test_rows_are_inserted_in_one_statement(client):
+    client.get('/api/tables')   # prepare the schema
+    inserts = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT INTO reservation'):
+            inserts.append(len(parameters) if executemany else 1)
+
+    with client.application.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = client.post('/api/reservations/bulk', json=rows(40))
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert response.status_code == 201
+    assert response.json['created'] == 40
+    assert inserts == [40]
+    ids = [result['reservation']['id'] for result in response.json['results']]
+    assert ids == list(range(1, 41))
+
+    # Ids carry on from the rows already there
+    more = client.post('/api/reservations/bulk', json=rows(2, start=40)).json
+    assert [result['reservation']['id'] for result in more['results']] == [41, 42]
+    assert len(client.get('/api/reservations?limit=1000').json) == 42
+
+
+def test_invalid_rows_are_reported_per_row(client):
+    body = rows(1) + [7, None, ["Guest"], {'customer_name': "No size"}]
+    response = client.post('/api/reservations/bulk', data=json.dumps(body), content_type='application/json')
+    assert response.status_code == 201
+    assert response.json['created'] == 1
+    assert [result.get('error') for result in response.json['results']] == [
+        None, "Expected a JSON object", "Expected a JSON object", "Expected a JSON object",
+        "Missing field party_size"]
+
+
+def test_ndjson_rows_are_allocated_without_double_booking(client):
+    # Six parties of 4 at the same time, for the two 4-tops, the 6-top and the 8-top
+    same_time = [dict(row, party_size=4, reservation_time=rows(1)[0]['reservation_time']) for row in rows(6)]
+    body = '\n'.join(json.dumps(row) for row in same_time) + '\n'
+    response = client.post('/api/reservations/bulk', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 201
+    reservations = [result['reservation'] for result in response.json['results']]
+    assert [reservation['status'] for reservation in reservations] == ['confirmed'] * 4 + ['pending'] * 2
+    assert sorted(reservation['table_id'] for reservation in reservations[:4]) == [3, 4, 5, 6]
+
+
+def test_refused_bodies(make_client):
+    client = make_client(BULK_RESERVATION_LIMIT=3)
+    assert client.post('/api/reservations/bulk', json=rows(4)).status_code == 413
+    response = client.post('/api/reservations/bulk', json={'customer_name': "Guest"})
+    assert response.status_code == 400
+    assert response.json == {'error': "Invalid request body: Expected a JSON array of reservations"}
+    response = client.post('/api/reservations/bulk', json=[{'customer_name': "No size"}])
+    assert (response.status_code, response.json['created']) == (400, 0)
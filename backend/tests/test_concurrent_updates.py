@@ -0,0 +1,76 @@
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import Table, Waitlist
+
+
+def other_worker_writes(tmp_path, model, statement, times):
+    """
+    Run statement on a connection of its own just before each of the next
+    times flushes that update a row of model, as another worker committing
+    in between would
+    Returns a function that stops doing so and returns how many times it ran
+    """
+    remaining = [times]
+
+    def before_flush(session, flush_context, instances):
+        if remaining[0] and any(isinstance(obj, model) for obj in session.dirty):
+            remaining[0] -= 1
+            with sqlite3.connect(tmp_path / 'test.db') as connection:
+                connection.execute(statement)
+
+    def stop():
+        event.remove(Session, 'before_flush', before_flush)
+        return times - remaining[0]
+
+    event.listen(Session, 'before_flush', before_flush)
+    return stop
+
+
+def join(client, party_size):
+    response = client.post('/api/waitlist', json={'customer_name': 'Guest', 'phone_number': '555',
+                                                  'party_size': party_size})
+    return response.json.get('waitlist', response.json)
+
+
+def test_waitlist_update_is_retried_after_a_concurrent_change(client, tmp_path):
+    client.put('/api/tables/6', json={'is_occupied': True})
+    entry = join(client, 8)
+    assert entry['status'] == 'waiting'
+
+    stop = other_worker_writes(tmp_path, Waitlist, 'UPDATE waitlist SET version = version + 1', 2)
+    try:
+        response = client.put(f"/api/waitlist/{entry['id']}", json={'status': 'cancelled'})
+    finally:
+        stop()
+    assert response.status_code == 200
+    assert response.json['status'] == 'cancelled'
+
+
+def test_waitlist_update_gives_up_with_409(make_client, tmp_path):
+    client = make_client(ALLOCATION_RETRIES=2)
+    client.put('/api/tables/6', json={'is_occupied': True})
+    entry = join(client, 8)
+
+    stop = other_worker_writes(tmp_path, Waitlist, 'UPDATE waitlist SET version = version + 1', 3)
+    try:
+        response = client.put(f"/api/waitlist/{entry['id']}", json={'status': 'cancelled'})
+    finally:
+        stop()
+    assert response.status_code == 409
+    assert client.get('/api/waitlist').json[0]['status'] == 'waiting'
+
+
+def test_table_taken_by_another_worker_is_not_double_booked(client, tmp_path):
+    # The only table for 8 gets occupied by another worker while this one seats a party there
+    stop = other_worker_writes(tmp_path, Table,
+                               'UPDATE "table" SET is_occupied = 1, version = version + 1 WHERE id = 6', 1)
+    try:
+        entry = join(client, 8)
+    finally:
+        assert stop() == 1
+    assert entry['status'] == 'waiting'
+    tables = {table['id']: table['is_occupied'] for table in client.get('/api/tables').json}
+    assert tables[6] is True
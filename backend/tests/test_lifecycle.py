@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+from lifecycle import lifecycle_sweeper
+from tenancy import DEFAULT_RESTAURANT, restaurant_context
+
+
+def sweep(client, now):
+    with restaurant_context(client.application, DEFAULT_RESTAURANT):
+        return lifecycle_sweeper.sweep(now)
+
+
+def test_sweep_marks_no_shows_frees_tables_and_archives(client):
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=1)
+    client.post('/api/reservations', json={'customer_name': "Guest", 'phone_number': "555", 'party_size': 2,
+                                           'reservation_time': start.isoformat()})
+    client.put('/api/tables/3', json={'is_occupied': True})
+
+    assert sweep(client, start) == {'no_shows': 0, 'released_tables': 1, 'archived_reservations': 0,
+                                    'archived_waitlist': 0}
+    assert sweep(client, start + timedelta(minutes=31))['no_shows'] == 1
+    assert client.get('/api/reservations').json[0]['status'] == 'no_show'
+    assert not any(table['is_occupied'] for table in client.get('/api/tables').json)
+
+    assert sweep(client, start + timedelta(days=31))['archived_reservations'] == 1
+    assert client.get('/api/reservations?limit=10').json == []
+
+
+def test_sweeper_starts_once_the_schema_is_ready(make_client, monkeypatch):
+    started = []
+    monkeypatch.setattr(lifecycle_sweeper, '_ready', None)
+    monkeypatch.setattr(lifecycle_sweeper, 'start', lambda: started.append(set(lifecycle_sweeper._ready)))
+    client = make_client(LIFECYCLE_SWEEP=True)
+    # With AUTO_MIGRATE the schema check starts it, not a first-request hook
+    assert client.application.before_first_request_funcs == []
+    assert started == []
+
+    client.get('/api/tables')
+    assert started == [{DEFAULT_RESTAURANT}]
@@ -0,0 +1,51 @@
+from datetime import date, datetime, timedelta
+import json
+
+import pytest
+
+import serialization
+
+
+def book(client, count):
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=1)
+    for i in range(count):
+        client.post('/api/reservations', json={
+            'customer_name': f"Guest {i}", 'phone_number': "555 0100", 'party_size': 2,
+            'reservation_time': (start + timedelta(hours=3 * i)).isoformat()})
+
+
+@pytest.mark.parametrize('path', ['/api/reservations?limit=1', '/api/tables', '/api/waitlist'])
+def test_unknown_format_is_refused(client, path):
+    book(client, 2)
+    response = client.get(path + ('&' if '?' in path else '?') + 'format=bogus')
+    assert response.status_code == 400
+    assert response.json == {'error': "format must be one of records, columnar"}
+
+
+def test_long_lists_are_streamed_in_chunks(make_client):
+    client = make_client(STREAM_RESPONSE_ROWS=3, STREAM_CHUNK_ROWS=2)
+    assert 'Content-Length' in client.get('/api/waitlist').headers
+    response = client.get('/api/tables')
+    assert 'Content-Length' not in response.headers
+    assert [table['capacity'] for table in response.json] == [2, 2, 4, 4, 6, 8]
+    assert response.json[0] == {'id': 1, 'table_number': 1, 'capacity': 2, 'is_occupied': False}
+
+
+def test_columnar_format(client):
+    book(client, 2)
+    tables = client.get('/api/tables?format=columnar').json
+    assert tables['capacity'] == [2, 2, 4, 4, 6, 8]
+    assert set(tables) == {'id', 'table_number', 'capacity', 'is_occupied'}
+
+    records = client.get('/api/reservations').json
+    columns = client.get('/api/reservations?format=columnar').json
+    assert columns['reservation_time'] == [record['reservation_time'] for record in records]
+    assert client.get('/api/waitlist?format=columnar').json['id'] == []
+
+
+def test_encoding_matches_without_orjson(monkeypatch):
+    row = {'at': datetime(2026, 1, 2, 3, 4, 5), 'day': date(2026, 1, 2), 'name': "Zoë", 'size': 4}
+    encoded = serialization.dumps(row)
+    monkeypatch.setattr(serialization, 'orjson', None)
+    assert serialization.dumps(row) == encoded
+    assert json.loads(encoded)['at'] == row['at'].isoformat()
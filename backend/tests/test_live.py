@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+import time
+
+from live import broadcaster, socketio
+
+
+def latest_rows(socket_client, room):
+    """
+    The last data sent for each row id in room
+    """
+    time.sleep(0.3)   # changes are coalesced for COALESCE_SECONDS before they are sent
+    return {delta['id']: delta['data'] for event in socket_client.get_received() if event['name'] == 'deltas'
+            for payload in event['args'] if payload['room'] == room for delta in payload['deltas']}
+
+
+def test_deltas_carry_the_rest_payload(client):
+    client.get('/api/tables')   # prepare the schema
+    broadcaster.flush()   # anything still pending from other tests
+    live = socketio.test_client(client.application)
+    live.emit('subscribe', {'rooms': ['reservations', 'waitlist', 'tables']})
+    live.get_received()
+
+    reservation = client.post('/api/reservations', json={
+        'customer_name': "Ada", 'phone_number': "555 0100", 'party_size': 2,
+        'reservation_time': (datetime.utcnow() + timedelta(days=1)).isoformat()}).json
+    assert latest_rows(live, 'reservations')[reservation['id']] == reservation
+
+    response = client.post('/api/waitlist', json={'customer_name': "Bo", 'phone_number': "555 0101", 'party_size': 8})
+    entry = response.json.get('waitlist', response.json)
+    sent = latest_rows(live, 'waitlist')[entry['id']]
+    assert set(sent) == set(entry)
+    assert {key: sent[key] for key in sent if key != 'estimated_wait_time'} == \
+        {key: entry[key] for key in entry if key != 'estimated_wait_time'}
+
+    client.put('/api/tables/1', json={'is_occupied': True})
+    assert latest_rows(live, 'tables')[1] == {'id': 1, 'table_number': 1, 'capacity': 2, 'is_occupied': True}
+    live.disconnect()
@@ -0,0 +1,66 @@
+import logging
+import time
+
+import pytest
+
+from metrics import request_metrics
+from models import db, Table
+
+
+@pytest.fixture
+def metrics_client(make_client):
+    request_metrics.reset()
+    return make_client(METRICS=True, N_PLUS_ONE_THRESHOLD=5)
+
+
+def sample(text, name):
+    # Summed over every series whose line starts with name
+    return sum(float(line.rsplit(' ', 1)[1]) for line in text.splitlines() if line.startswith(name))
+
+
+def test_requests_are_reported_without_counting_the_schema_check(metrics_client, caplog):
+    with caplog.at_level(logging.WARNING):
+        metrics_client.get('/api/tables')
+        metrics_client.post('/api/waitlist', json={'customer_name': "Guest", 'phone_number': "555", 'party_size': 2})
+        response = metrics_client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+
+    text = response.get_data(as_text=True)
+    assert sample(text, 'http_request_duration_seconds_count{endpoint="get_tables",method="GET",status="200"}') == 1
+    assert sample(text, 'http_request_duration_seconds_count{endpoint="add_to_waitlist",method="POST",status="201"}') == 1
+    # The first request created the schema, but only its own SELECT is counted
+    assert sample(text, 'http_request_sql_queries_sum{endpoint="get_tables"}') == 1
+    assert sample(text, 'function_duration_seconds_count{function="seat_waitlist_party"}') == 1
+    assert sample(text, 'http_request_n_plus_one_total') == 0
+    assert 'N+1' not in caplog.text
+
+
+def test_repeated_statements_are_flagged_once(metrics_client, caplog):
+    def tables_one_by_one():
+        return {'capacities': [db.session.query(Table.capacity).filter(Table.id == table_id).scalar()
+                               for table_id in range(1, 7)]}
+
+    metrics_client.application.add_url_rule('/one-by-one', 'one_by_one', tables_one_by_one)
+    with caplog.at_level(logging.WARNING):
+        metrics_client.get('/one-by-one')
+        metrics_client.get('/one-by-one')
+    text = metrics_client.get('/metrics').get_data(as_text=True)
+    assert sample(text, 'http_request_n_plus_one_total{endpoint="one_by_one"}') == 2
+    assert caplog.text.count('Possible N+1 query in one_by_one, run 6 times') == 1
+
+
+def test_slow_requests_are_profiled(make_client, tmp_path):
+    client = make_client(PROFILE_SLOW_REQUESTS=True, PROFILE_SLOW_MS=50, PROFILE_INTERVAL_MS=1,
+                         PROFILE_DIR=str(tmp_path / 'profiles'))
+
+    def slow():
+        time.sleep(0.1)
+        return ''
+
+    client.application.add_url_rule('/slow', 'slow', slow)
+    client.get('/api/tables')
+    client.get('/slow')
+    [profile] = (tmp_path / 'profiles').glob('*-slow-*.folded')
+    stacks = profile.read_text().splitlines()
+    assert any('slow (test_metrics.py' in line.rsplit(' ', 1)[0] for line in stacks)
@@ -0,0 +1,19 @@
+from datetime import datetime
+import sqlite3
+
+import pytest
+
+
+@pytest.mark.parametrize('reload_seconds, sees_other_worker', [(0, True), (300, False)])
+def test_wait_estimates_reload_other_workers_rows(make_client, tmp_path, reload_seconds, sees_other_worker):
+    client = make_client(QUEUE_RELOAD_SECONDS=reload_seconds)
+    assert client.get('/api/waitlist').json == []
+
+    # A party added by another worker, with an estimate this one would not give
+    with sqlite3.connect(tmp_path / 'test.db') as connection:
+        connection.execute(
+            "INSERT INTO waitlist (customer_name, phone_number, email, party_size, joined_at, status, "
+            "estimated_wait_time) VALUES ('Other', '555', '', 2, ?, 'waiting', 999)", (datetime.utcnow(),))
+    # A new path, so the response cache cannot answer for this worker
+    [row] = client.get('/api/waitlist?limit=10').json
+    assert (row['estimated_wait_time'] != 999) == sees_other_worker
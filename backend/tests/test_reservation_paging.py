@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+from test_list_responses import book
+
+
+def pages(client, path):
+    ids = []
+    while path:
+        response = client.get(path)
+        assert response.status_code == 200
+        ids.extend(row['id'] for row in response.json)
+        cursor = response.headers.get('X-Next-Cursor')
+        path = f"/api/reservations?limit=2&cursor={cursor}" if cursor else None
+    return ids
+
+
+def test_cursor_pages_through_every_reservation(client):
+    book(client, 5)
+    assert pages(client, '/api/reservations?limit=2') == [1, 2, 3, 4, 5]
+    response = client.get('/api/reservations?limit=5', headers={'Origin': 'http://localhost:3000'})
+    assert 'X-Next-Cursor' not in response.headers
+    assert 'X-Next-Cursor' in response.headers['Access-Control-Expose-Headers']
+
+
+def test_filters_and_fields(client):
+    book(client, 4)
+    client.put('/api/reservations/2', json={'status': 'cancelled'})
+    start = (datetime.utcnow() + timedelta(days=1, hours=2)).isoformat()
+
+    assert [row['id'] for row in client.get('/api/reservations?status=confirmed').json] == [1, 3, 4]
+    assert [row['id'] for row in client.get(f'/api/reservations?from={start}').json] == [2, 3, 4]
+    table_id = client.get('/api/reservations').json[2]['table_id']
+    assert 3 in [row['id'] for row in client.get(f'/api/reservations?table_id={table_id}').json]
+    assert client.get('/api/reservations?fields=id,status&limit=1').json == [{'id': 1, 'status': 'confirmed'}]
+
+
+def test_bad_parameters_are_refused(client):
+    for query in ('limit=0', 'limit=x', 'fields=id,secret', 'cursor=bogus', 'from=yesterday'):
+        assert client.get(f'/api/reservations?{query}').status_code == 400, query
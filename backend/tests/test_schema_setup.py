@@ -0,0 +1,36 @@
+import multiprocessing
+import sqlite3
+
+import pytest
+
+from app import create_app
+from config import Config
+
+WORKERS = 4
+
+
+def first_request(uri, profile, barrier, statuses):
+    app = create_app(type('TestConfig', (Config,), {
+        'SQLALCHEMY_DATABASE_URI': uri, 'STORAGE_PROFILE': profile, 'LIFECYCLE_SWEEP': False, 'METRICS': False}))
+    client = app.test_client()
+    barrier.wait()
+    statuses.put(client.get('/api/tables').status_code)
+
+
+@pytest.mark.parametrize('profile', ['production', 'default'])
+def test_workers_starting_together_prepare_the_schema_once(tmp_path, profile):
+    # Forked processes stand in for the worker processes of one deployment
+    context = multiprocessing.get_context('fork')
+    for trial in range(3):
+        path = tmp_path / f'trial{trial}.db'
+        barrier = context.Barrier(WORKERS)
+        statuses = context.Queue()
+        workers = [context.Process(target=first_request, args=(f'sqlite:///{path}', profile, barrier, statuses))
+                   for _ in range(WORKERS)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+        assert sorted(statuses.get(timeout=5) for _ in workers) == [200] * WORKERS
+        with sqlite3.connect(path) as connection:
+            assert connection.execute('SELECT COUNT(*) FROM "table"').fetchone() == (6,)
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+from table_combinations import TableCombinations
+
+
+def availability(client, party_size):
+    day = (datetime.utcnow() + timedelta(days=1)).date().isoformat()
+    return client.get(f'/api/availability?party_size={party_size}&date={day}').json['slots']
+
+
+def test_clearing_pairs_stops_combining_tables(client):
+    # The default tables seat 2, 2, 4, 4, 6 and 8; only 5 and 6 together fit 12
+    assert availability(client, 12) == []
+    assert client.put('/api/tables/adjacency', json={'pairs': [[5, 6]]}).status_code == 200
+    assert client.get('/api/tables/adjacency').json == {'pairs': [[5, 6]]}
+    assert availability(client, 12)
+
+    cached = client.get('/api/tables/adjacency')
+    assert client.put('/api/tables/adjacency', json={'pairs': []}).json == {'pairs': []}
+    cleared = client.get('/api/tables/adjacency', headers={'If-None-Match': cached.headers['ETag']})
+    assert cleared.status_code == 200
+    assert cleared.json == {'pairs': []}
+    assert availability(client, 12) == []
+
+
+def test_replacing_pairs_keeps_unchanged_ones(client):
+    client.put('/api/tables/adjacency', json={'pairs': [[1, 2], [3, 4]]})
+    response = client.put('/api/tables/adjacency', json={'pairs': [[4, 3], [5, 6]]})
+    assert response.json == {'pairs': [[3, 4], [5, 6]]}
+    assert client.get('/api/tables/adjacency').json == {'pairs': [[3, 4], [5, 6]]}
+
+
+def test_large_parties_are_booked_on_combined_tables(client):
+    client.put('/api/tables/adjacency', json={'pairs': [[3, 4], [4, 5]]})
+    time = (datetime.utcnow() + timedelta(days=1)).replace(microsecond=0).isoformat()
+
+    def book(party_size):
+        return client.post('/api/reservations', json={'customer_name': "Guest", 'phone_number': "555",
+                                                      'party_size': party_size, 'reservation_time': time}).json
+
+    # 3 and 4 seat 8 together, fewer seats than 4 and 5; the 8-top is taken first
+    assert book(8)['table_id'] == 6
+    first = book(8)
+    assert (first['status'], first['table_id'], first['joined_table_ids']) == ('confirmed', 3, '4')
+    assert book(8)['status'] == 'pending'
+    assert [row['id'] for row in client.get('/api/reservations?table_id=4').json] == [first['id']]
+
+
+def test_groups_are_connected_and_bounded():
+    tables = [(4, table_id) for table_id in range(1, 6)]
+    # A row of five tables: 4 pairs, 3 triples, no larger groups
+    combinations = TableCombinations(tables, [(1, 2), (2, 3), (3, 4), (4, 5)], max_tables=3)
+    assert sorted(map(len, combinations)) == [2] * 4 + [3] * 3
+    assert (1, 3) not in list(combinations)
+    assert combinations.find(10, combinations.mask([2])) == (3, 4, 5)
+    assert combinations.find(13, 0) is None
+    assert len(TableCombinations(tables, [(1, 2)], max_tables=1)) == 0
+
+
+def test_invalid_pairs_are_refused(client):
+    for pairs in ([[1, 1]], [[1, 99]], [[1]], 'x'):
+        assert client.put('/api/tables/adjacency', json={'pairs': pairs}).status_code == 400
+    assert client.put('/api/tables/adjacency', json={}).status_code == 400
@@ -0,0 +1,38 @@
+def join(client, party_size):
+    response = client.post('/api/waitlist', json={'customer_name': 'Guest', 'phone_number': '555',
+                                                  'party_size': party_size})
+    assert response.status_code == 201
+    return response.json.get('waitlist', response.json)
+
+
+def test_party_only_fitting_combined_tables_gets_an_estimate(client):
+    # The default tables seat 2, 2, 4, 4, 6 and 8; nothing fits 12 on its own
+    turned_away = join(client, 12)
+    assert turned_away['estimated_wait_time'] is None
+    client.put(f"/api/waitlist/{turned_away['id']}", json={'status': 'cancelled'})
+
+    # Tables 5 and 6 together seat 14, so the next party is seated at once
+    client.put('/api/tables/adjacency', json={'pairs': [[5, 6]]})
+    seated = join(client, 12)
+    assert (seated['status'], seated['estimated_wait_time']) == ('seated', 0)
+
+    # Later ones wait a turn of the group for each party ahead of them
+    assert join(client, 12)['estimated_wait_time'] == 60
+    assert join(client, 14)['estimated_wait_time'] == 120
+    assert join(client, 2)['estimated_wait_time'] == 0
+    assert [row['estimated_wait_time'] for row in client.get('/api/waitlist?limit=10').json] == [60, 120]
+
+
+def test_estimates_follow_the_queue(client):
+    for table_id in range(1, 7):
+        client.put(f'/api/tables/{table_id}', json={'is_occupied': True})
+
+    # Six tables fit a party of 2, turning over every 60 minutes until a turn is recorded
+    first = join(client, 2)
+    assert first['estimated_wait_time'] == 10
+    assert join(client, 2)['estimated_wait_time'] == 20
+    # Only the 8-top fits 8, and both parties ahead may take it
+    assert join(client, 8)['estimated_wait_time'] == 180
+
+    client.put(f"/api/waitlist/{first['id']}", json={'status': 'cancelled'})
+    assert [row['estimated_wait_time'] for row in client.get('/api/waitlist?limit=10').json] == [10, 120]
@@ -0,0 +1,117 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from write_pipeline import WritePipeline, write_pipeline
+
+
+def booking(name, party_size=2):
+    tomorrow = datetime.utcnow().replace(hour=19, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    return {'customer_name': name, 'phone_number': "555 0100", 'party_size': party_size,
+            'reservation_time': tomorrow.isoformat()}
+
+
+@pytest.mark.parametrize('party_size', [None, 0, 'two'])
+def test_invalid_payload_is_refused_before_queueing(make_client, party_size):
+    client = make_client(WRITE_PIPELINE=True)
+    assert client.post('/api/reservations', json=booking("Bad", party_size)).status_code == 400
+    assert client.post('/api/waitlist', json=booking("Bad", party_size)).status_code == 400
+    assert client.post('/api/reservations', json={'customer_name': "Bad"}).json == {
+        'error': "Missing field party_size"}
+
+
+def test_concurrent_requests_are_committed_in_batches(make_client, monkeypatch):
+    client = make_client(WRITE_PIPELINE=True, WRITE_BATCH_MAX=5, WRITE_BATCH_LATENCY_MS=300)
+    client.get('/api/tables')   # prepare the schema
+    original = WritePipeline._complete
+    batches = []
+
+    def record(self, batch):
+        batches.append(len(batch))
+        return original(self, batch)
+
+    monkeypatch.setattr(WritePipeline, '_complete', record)
+    # Eight parties of 4 at the same time, for the four tables that seat them
+    with ThreadPoolExecutor(8) as pool:
+        responses = list(pool.map(lambda i: client.post('/api/reservations', json=booking(f"Guest {i}", 4)),
+                                  range(8)))
+    assert batches == [5, 3]
+    assert sorted(response.json['customer_name'] for response in responses) == [f"Guest {i}" for i in range(8)]
+    confirmed = [response.json['table_id'] for response in responses if response.json['status'] == 'confirmed']
+    assert sorted(confirmed) == [3, 4, 5, 6]
+
+
+def test_waitlist_join_is_seated_in_the_same_batch(make_client):
+    client = make_client(WRITE_PIPELINE=True)
+    response = client.post('/api/waitlist', json=booking("Walk-in"))
+    assert response.status_code == 201
+    assert response.json['waitlist']['status'] == 'seated'
+    assert response.json['message'].startswith("Party seated at")
+    assert client.get('/api/tables').json[0]['is_occupied'] is True
+
+def test_failing_job_does_not_fail_its_batch(make_client):
+    client = make_client(WRITE_PIPELINE=True, WRITE_BATCH_LATENCY_MS=200)
+    app = client.application
+    client.get('/api/tables')   # prepare the schema
+    good = [dict(booking(f"Guest {i}"), reservation_time=datetime.utcnow() + timedelta(days=1)) for i in range(3)]
+    # Skips the endpoint's checks, as a job that fails inside the writer would
+    bad = dict(good[0], customer_name="Bad", party_size=None)
+
+    def reserve(values):
+        with app.app_context():
+            return write_pipeline.reserve(values)
+
+    with ThreadPoolExecutor(len(good) + 1) as pool:
+        futures = [pool.submit(reserve, values) for values in good + [bad]]
+        assert [future.result()['customer_name'] for future in futures[:-1]] == ["Guest 0", "Guest 1", "Guest 2"]
+        with pytest.raises(Exception):
+            futures[-1].result()
+    assert len(client.get('/api/reservations').json) == 3
+
+
+def test_writer_survives_an_error_outside_the_write(make_client, monkeypatch):
+    client = make_client(WRITE_PIPELINE=True)
+    original = WritePipeline._complete
+    calls = []
+
+    def fail_once(self, batch):
+        calls.append(batch)
+        if len(calls) == 1:
+            raise RuntimeError("rollback failed")
+        return original(self, batch)
+
+    monkeypatch.setattr(WritePipeline, '_complete', fail_once)
+    assert client.post('/api/reservations', json=booking("First")).status_code == 500
+    assert client.post('/api/reservations', json=booking("Second")).status_code == 201
+
+
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_request_gives_up_and_dead_writer_is_restarted(make_client, monkeypatch):
+    client = make_client(WRITE_PIPELINE=True, WRITE_TIMEOUT_SECONDS=0.5)
+    original = WritePipeline._complete
+    calls = []
+
+    def die_once(self, batch):
+        calls.append(batch)
+        if len(calls) == 1:
+            # Escapes the writer's error handling and ends its thread
+            raise SystemExit
+        return original(self, batch)
+
+    monkeypatch.setattr(WritePipeline, '_complete', die_once)
+    response = client.post('/api/waitlist', json=booking("Lost"))
+    assert response.status_code == 503
+    assert client.post('/api/reservations', json=booking("After")).status_code == 201
+    assert [row['customer_name'] for row in client.get('/api/reservations').json] == ["After"]
+
+
+@pytest.mark.parametrize('pipeline', [True, False])
+@pytest.mark.parametrize('body', [None, [], 3, "booking"])
+def test_body_must_be_a_json_object(make_client, pipeline, body):
+    client = make_client(WRITE_PIPELINE=pipeline)
+    for path in ('/api/reservations', '/api/waitlist'):
+        response = client.post(path, data=json.dumps(body), content_type='application/json')
+        assert response.status_code == 400
+        assert response.json == {'error': "Expected a JSON object"}
@@ -0,0 +1,298 @@
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+import math
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from availability import availability_index
+from models import db, Table, Waitlist, TableTurn
+from tenancy import PerRestaurant
+import changes
+
+# Most recent table turns per capacity that the estimate averages over
+TURN_SAMPLES = 50
+
+# Turn length assumed for a capacity before any of its tables has been freed
+DEFAULT_TURN_MINUTES = 60
+
+
+@event.listens_for(Session, 'before_flush')
+def _record_turns(session, flush_context, instances):
+    # Stamp when a table is occupied and log a TableTurn when it is freed,
+    # whichever code path changed is_occupied
+    now = datetime.utcnow()
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Table):
+            continue
+        if obj.is_occupied and obj.occupied_since is None:
+            obj.occupied_since = now
+        elif not obj.is_occupied and obj.occupied_since is not None:
+            session.add(TableTurn(table_id=obj.id, capacity=obj.capacity,
+                                  seated_at=obj.occupied_since, freed_at=now))
+            obj.occupied_since = None
+
+
+class _Fenwick:
+    """
+    Counts per position with O(log n) updates and prefix sums
+    """
+
+    def __init__(self, size):
+        self.tree = [0] * (size + 1)
+
+    def add(self, position, delta):
+        i = position + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, position):
+        """
+        Sum of the counts before position
+        """
+        total = 0
+        i = position
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+
+class WaitEstimator:
+    """
+    In-memory model of the waiting queue for estimating wait times
+
+    Each waiting party gets a position in join order and belongs to the
+    smallest table capacity that fits it. One Fenwick tree per capacity
+    counts the parties at each position, so the number of parties ahead that
+    fit the same or a smaller table is a handful of O(log n) prefix sums.
+    The time for a table to turn over is the mean of the latest TURN_SAMPLES
+    recorded turns of each capacity.
+
+    A party too large for any single table belongs to the smallest total
+    capacity of a group of adjacent tables that fits it, from the
+    TableCombinations of the floor plan, and only waits behind other such
+    parties. Its wait is a whole turn of the group for each party ahead of
+    it, less one if a fitting group is free now.
+
+    Loaded from the database on first use and every QUEUE_RELOAD_SECONDS, and
+    kept up to date from committed changes in between.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._loaded = False
+            self._loaded_at = 0
+            self._capacities = []    # distinct table capacities, smallest first
+            self._group_sizes = []   # distinct group totals above the largest capacity
+            self._combinations = None
+            self._occupied = set()   # ids of occupied tables
+            self._tables = []        # number of tables per capacity
+            self._free = []          # unoccupied tables per capacity
+            self._turns = {}         # capacity -> deque of recent turn minutes
+            self._entries = {}       # waitlist_id -> (joined_at, capacity index or None)
+            self._positions = {}     # waitlist_id -> position in the trees
+            self._trees = []
+            self._size = 0           # positions the trees can hold
+            self._next = 0
+            self._last_joined = None
+
+    def _load(self):
+        tables = {}
+        occupied = set()
+        for table_id, capacity, is_occupied in db.session.query(Table.id, Table.capacity, Table.is_occupied):
+            total, free = tables.get(capacity, (0, 0))
+            tables[capacity] = (total + 1, free + (not is_occupied))
+            if is_occupied:
+                occupied.add(table_id)
+        combinations = availability_index.combinations()
+
+        turns = {}
+        for capacity in tables:
+            rows = db.session.query(TableTurn.seated_at, TableTurn.freed_at).filter(
+                TableTurn.capacity == capacity
+            ).order_by(TableTurn.freed_at.desc()).limit(TURN_SAMPLES).all()
+            turns[capacity] = deque(((freed_at - seated_at).total_seconds() / 60 for seated_at, freed_at in reversed(rows)),
+                                    maxlen=TURN_SAMPLES)
+
+        waiting = db.session.query(Waitlist.id, Waitlist.party_size, Waitlist.joined_at).filter(
+            Waitlist.status == 'waiting'
+        ).all()
+
+        with self._lock:
+            self._capacities = sorted(tables)
+            self._tables = [tables[capacity][0] for capacity in self._capacities]
+            self._free = [tables[capacity][1] for capacity in self._capacities]
+            largest = self._capacities[-1] if self._capacities else 0
+            totals = (sum(combinations.capacity_of[table_id] for table_id in group) for group in combinations)
+            self._group_sizes = sorted({total for total in totals if total > largest})
+            self._combinations = combinations
+            self._occupied = occupied
+            self._turns = turns
+            self._entries = {waitlist_id: (joined_at, self._class_of(party_size))
+                             for waitlist_id, party_size, joined_at in waiting}
+            self._rebuild()
+            self._loaded = True
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if not self._loaded or time.monotonic() - self._loaded_at >= current_app.config['QUEUE_RELOAD_SECONDS']:
+            self._load()
+
+    def _class_of(self, party_size):
+        # Capacities are classes 0 to len - 1, group totals the ones after
+        k = bisect_left(self._capacities, party_size)
+        if k == len(self._capacities):
+            k += bisect_left(self._group_sizes, party_size)
+        return k if k < len(self._capacities) + len(self._group_sizes) else None
+
+    def _rebuild(self):
+        # Renumber the queue in join order, leaving room to append as many again
+        order = sorted(self._entries, key=lambda waitlist_id: (self._entries[waitlist_id][0], waitlist_id))
+        self._size = max(64, 2 * len(order))
+        self._trees = [_Fenwick(self._size) for _ in range(len(self._capacities) + len(self._group_sizes))]
+        self._positions = {}
+        for position, waitlist_id in enumerate(order):
+            self._positions[waitlist_id] = position
+            k = self._entries[waitlist_id][1]
+            if k is not None:
+                self._trees[k].add(position, 1)
+        self._next = len(order)
+        self._last_joined = self._entries[order[-1]][0] if order else None
+
+    def _push(self, waitlist_id, party_size, joined_at):
+        k = self._class_of(party_size)
+        self._entries[waitlist_id] = (joined_at, k)
+        if self._next >= self._size or self._last_joined is not None and joined_at < self._last_joined:
+            self._rebuild()
+            return
+        self._positions[waitlist_id] = self._next
+        if k is not None:
+            self._trees[k].add(self._next, 1)
+        self._next += 1
+        self._last_joined = joined_at
+
+    def _remove(self, waitlist_id):
+        entry = self._entries.pop(waitlist_id, None)
+        if entry is None:
+            return
+        position = self._positions.pop(waitlist_id)
+        if entry[1] is not None:
+            self._trees[entry[1]].add(position, -1)
+
+    def _ahead(self, k, position):
+        first = 0 if k < len(self._capacities) else len(self._capacities)
+        return sum(self._trees[j].prefix(position) for j in range(first, k + 1))
+
+    def _minutes(self, k, ahead):
+        """
+        Expected wait for the party after ahead competing parties when it can
+        use tables of capacity index k and larger
+        """
+        if k >= len(self._capacities):
+            return self._group_minutes(self._group_sizes[k - len(self._capacities)], ahead)
+        tables = sum(self._tables[k:])
+        free = sum(self._free[k:])
+        if ahead < free:
+            return 0
+        turn = sum(count * self._turn_minutes(capacity)
+                   for capacity, count in zip(self._capacities[k:], self._tables[k:])) / tables
+        return math.ceil((ahead + 1 - free) * turn / tables)
+
+    def _group_minutes(self, size, ahead):
+        """
+        Expected wait for the party after ahead competing parties when it
+        needs a group of adjacent tables seating at least size
+        """
+        busy = self._combinations.mask(self._occupied)
+        free = self._combinations.find(size, busy) is not None
+        if ahead < free:
+            return 0
+        # The group is only free once the last of its tables has turned over
+        group = self._combinations.find(size, 0)
+        turn = max(self._turn_minutes(self._combinations.capacity_of[table_id]) for table_id in group)
+        return math.ceil((ahead + 1 - free) * turn)
+
+    def _turn_minutes(self, capacity):
+        turns = self._turns.get(capacity)
+        return sum(turns) / len(turns) if turns else DEFAULT_TURN_MINUTES
+
+    def turn_minutes(self, capacity):
+        """
+        Minutes a table of this capacity is expected to stay occupied
+        """
+        with self._lock:
+            self._ensure_loaded()
+            return self._turn_minutes(capacity)
+
+    def estimate(self, party_size):
+        """
+        Minutes a party joining the queue now would wait, or None if neither
+        a table nor a group of adjacent tables is large enough
+        """
+        with self._lock:
+            self._ensure_loaded()
+            k = self._class_of(party_size)
+            if k is None:
+                return None
+            return self._minutes(k, self._ahead(k, self._next))
+
+    def estimates(self):
+        """
+        Minutes each waiting party still has to wait, by waitlist id
+        """
+        with self._lock:
+            self._ensure_loaded()
+            return {waitlist_id: None if k is None else self._minutes(k, self._ahead(k, self._positions[waitlist_id]))
+                    for waitlist_id, (_, k) in self._entries.items()}
+
+    def apply(self, committed):
+        """
+        Update the queue and turn statistics from a list of committed changes
+        """
+        with self._lock:
+            if not self._loaded:
+                return
+
+            for change in committed:
+                values = change.values
+
+                if change.model == 'Table':
+                    if change.op != 'update' or change.changed('capacity'):
+                        # Capacity classes changed; start over on the next read
+                        self._loaded = False
+                        return
+                    if change.changed('is_occupied'):
+                        k = self._capacities.index(values['capacity'])
+                        self._free[k] += bool(change.previous['is_occupied']) - bool(values['is_occupied'])
+                        if values['is_occupied']:
+                            self._occupied.add(change.id)
+                        else:
+                            self._occupied.discard(change.id)
+
+                elif change.model == 'TableAdjacency':
+                    # Groups of adjacent tables changed; start over on the next read
+                    self._loaded = False
+                    return
+
+                elif change.model == 'TableTurn' and change.op == 'insert':
+                    minutes = (values['freed_at'] - values['seated_at']).total_seconds() / 60
+                    self._turns.setdefault(values['capacity'], deque(maxlen=TURN_SAMPLES)).append(minutes)
+
+                elif change.model == 'Waitlist':
+                    self._remove(change.id)
+                    if change.op != 'delete' and values['status'] == 'waiting':
+                        self._push(change.id, values['party_size'], values['joined_at'])
+
+
+wait_estimator = PerRestaurant(WaitEstimator)
+changes.subscribe(wait_estimator.apply)
@@ -0,0 +1,182 @@
+"""
+Group commit for bookings and waitlist joins, enabled by WRITE_PIPELINE
+
+Without it every POST /api/reservations commits a pending row and commits
+again once a table is assigned, and every POST /api/waitlist commits the
+entry and commits again to seat the party. With it, requests hand their
+rows to one writer thread per restaurant, which takes up to WRITE_BATCH_MAX
+of them at a time, waiting at most WRITE_BATCH_LATENCY_MS after the first,
+allocates and seats them together and commits the whole batch once. Each
+request then gets back its own row.
+
+Rows in a batch see each other's tables, since they share a session, but a
+wait estimate does not count the parties that joined in the same batch.
+Payloads are validated by the endpoints before they are queued; should a
+batch still fail, its requests are written again one at a time, so only the
+one at fault gets the error. A request waits at most WRITE_TIMEOUT_SECONDS
+for its write and then raises WriteTimeout; its row is left out if the
+writer has not taken it yet. A writer thread found dead is started again.
+"""
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+import queue
+import threading
+import time
+
+from models import db, Reservation, Waitlist
+from table_allocation import (assign_tables, find_available_table, seat_party, calculate_wait_time,
+                              with_retries, AllocationConflict)
+from tenancy import PerRestaurant, current_restaurant, restaurant_context
+
+
+class WriteTimeout(Exception):
+    """
+    The writer did not finish a request's write in WRITE_TIMEOUT_SECONDS
+    """
+
+
+class WritePipeline:
+    """
+    The queue and writer thread of one restaurant
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.app = None
+
+    def init_app(self, app):
+        self.app = app
+
+    def reserve(self, values):
+        """
+        Insert a reservation with the given column values and give it a table
+        if one is free; returns the reservation as a dict
+        """
+        return self._wait(self._submit('reservation', values))
+
+    def join_waitlist(self, values):
+        """
+        Add a party to the waitlist and seat it if a table is free; returns
+        (message or None, the entry as a dict)
+        """
+        return self._wait(self._submit('waitlist', values))
+
+    def _submit(self, kind, values):
+        self._start()
+        future = Future()
+        self._queue.put((kind, values, future))
+        return future
+
+    def _wait(self, future):
+        try:
+            return future.result(timeout=self.app.config['WRITE_TIMEOUT_SECONDS'])
+        except FutureTimeout:
+            # Only succeeds while the job is queued; once taken, it may still be written
+            future.cancel()
+            raise WriteTimeout("The write could not be completed in time, please try again")
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            # Requests are served in the restaurant's context, so the writer keeps it
+            self._thread = threading.Thread(target=self._run, args=(current_restaurant(),), daemon=True)
+            self._thread.start()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        limit = self.app.config['WRITE_BATCH_MAX']
+        deadline = time.monotonic() + self.app.config['WRITE_BATCH_LATENCY_MS'] / 1000
+        while len(batch) < limit:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, restaurant):
+        while True:
+            batch = []
+            try:
+                # Jobs whose request gave up waiting are dropped
+                batch = [job for job in self._next_batch() if job[2].set_running_or_notify_cancel()]
+                if batch:
+                    with restaurant_context(self.app, restaurant):
+                        self._complete(batch)
+            except Exception as e:
+                # Fail what the batch left unanswered, and keep the writer running
+                self.app.logger.exception("Write pipeline batch failed")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _complete(self, batch):
+        """
+        Write the batch and resolve each job's future
+        """
+        try:
+            results = self._write(batch)
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) == 1:
+                batch[0][2].set_exception(e)
+            else:
+                for job in batch:
+                    self._complete([job])
+            return
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _write(self, batch):
+        """
+        Write the batch in one transaction and return each job's result
+        """
+        try:
+            return with_retries(lambda: self._attempt(batch, allocate=True))
+        except AllocationConflict:
+            # Other workers keep taking the chosen tables: store the rows
+            # unallocated, as the unbatched endpoints do
+            db.session.rollback()
+            return self._attempt(batch, allocate=False)
+
+    def _attempt(self, batch, allocate):
+        reservations = [Reservation(status='pending', **values)
+                        for kind, values, _ in batch if kind == 'reservation']
+        db.session.add_all(reservations)
+        if allocate:
+            assign_tables(reservations)
+
+        entries = []
+        for kind, values, _ in batch:
+            if kind != 'waitlist':
+                continue
+            entry = Waitlist(status='waiting', estimated_wait_time=calculate_wait_time(values['party_size']), **values)
+            db.session.add(entry)
+            message = None
+            if allocate:
+                # The autoflush lets this see the tables seated earlier in the batch
+                tables = find_available_table(entry.party_size)
+                if tables:
+                    message = seat_party(entry, tables)
+            entries.append((entry, message))
+
+        # Results are read before the commit expires every row
+        db.session.flush()
+        reservations = iter(reservations)
+        entries = iter(entries)
+        results = []
+        for kind, _, _ in batch:
+            if kind == 'reservation':
+                results.append(next(reservations).to_dict())
+            else:
+                entry, message = next(entries)
+                results.append((message, entry.to_dict()))
+        db.session.commit()
+        return results
+
+
+write_pipeline = PerRestaurant(WritePipeline)
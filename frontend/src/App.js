@@ -1,9 +1,32 @@
 import React, { useState, useEffect } from 'react';
 import 'bootstrap/dist/css/bootstrap.min.css';
 import axios from 'axios';
+import { io } from 'socket.io-client';
 import { Container, Row, Col, Card, Button, Form, Table, Tabs, Tab, Badge, Alert } from 'react-bootstrap';
 
 const API_BASE_URL = 'http://localhost:5000/api';
+const SOCKET_URL = 'http://localhost:5000';
+
+// Apply a batch of row deltas to a list, keeping only rows that pass keep()
+const mergeDeltas = (rows, deltas, keep = () => true) => {
+  const byId = new Map(rows.map(row => [row.id, row]));
+  deltas.forEach(delta => {
+    if (delta.data && keep(delta.data)) {
+      byId.set(delta.id, delta.data);
+    } else {
+      byId.delete(delta.id);
+    }
+  });
+  return Array.from(byId.values());
+};
+
+// Turn a columnar response ({column: [values...]}) back into row objects
+const fromColumns = (columns) => {
+  const names = Object.keys(columns);
+  const count = names.length ? columns[names[0]].length : 0;
+  return Array.from({ length: count }, (_, i) =>
+    Object.fromEntries(names.map(name => [name, columns[name][i]])));
+};
 
 function App() {
   const [tables, setTables] = useState([]);
@@ -31,14 +54,28 @@ function App() {
   // Fetch all data
   const fetchData = async () => {
     try {
-      const tablesRes = await axios.get(`${API_BASE_URL}/tables`);
-      const reservationsRes = await axios.get(`${API_BASE_URL}/reservations`);
-      const waitlistRes = await axios.get(`${API_BASE_URL}/waitlist`);
+      // Lists come in the compact columnar format
+      const columnar = { format: 'columnar' };
+      const tablesRes = await axios.get(`${API_BASE_URL}/tables`, { params: columnar });
+      // Reservations are paginated server-side; show today's onwards,
+      // following X-Next-Cursor until the last page
+      const today = new Date();
+      today.setHours(0, 0, 0, 0);
+      let reservationRows = [];
+      let cursor = null;
+      do {
+        const page = await axios.get(`${API_BASE_URL}/reservations`, {
+          params: { ...columnar, from: today.toISOString(), limit: 1000, ...(cursor ? { cursor } : {}) }
+        });
+        reservationRows = reservationRows.concat(fromColumns(page.data));
+        cursor = page.headers['x-next-cursor'];
+      } while (cursor);
+      const waitlistRes = await axios.get(`${API_BASE_URL}/waitlist`, { params: columnar });
       const dashboardRes = await axios.get(`${API_BASE_URL}/dashboard`);
       
-      setTables(tablesRes.data);
-      setReservations(reservationsRes.data);
-      setWaitlist(waitlistRes.data);
+      setTables(fromColumns(tablesRes.data));
+      setReservations(reservationRows);
+      setWaitlist(fromColumns(waitlistRes.data));
       setStats(dashboardRes.data);
     } catch (error) {
       console.error("Error fetching data:", error);
@@ -105,12 +142,32 @@ function App() {
     }
   };
 
-  // Load data on component mount
+  // Apply live updates pushed by the server
+  const handleDeltas = ({ room, deltas }) => {
+    if (room === 'tables') {
+      setTables(prev => mergeDeltas(prev, deltas).sort((a, b) => a.id - b.id));
+    } else if (room === 'reservations') {
+      setReservations(prev => mergeDeltas(prev, deltas).sort((a, b) =>
+        a.reservation_time.localeCompare(b.reservation_time) || a.id - b.id));
+    } else if (room === 'waitlist') {
+      setWaitlist(prev => mergeDeltas(prev, deltas, entry => entry.status === 'waiting').sort((a, b) =>
+        a.joined_at.localeCompare(b.joined_at) || a.id - b.id));
+    } else if (room === 'dashboard') {
+      setStats(deltas[deltas.length - 1].data);
+    }
+  };
+
+  // Load data on component mount, then keep it current over the socket
   useEffect(() => {
     fetchData();
-    // Poll for updates every 30 seconds
-    const interval = setInterval(fetchData, 30000);
-    return () => clearInterval(interval);
+    const socket = io(SOCKET_URL);
+    socket.on('connect', () => {
+      socket.emit('subscribe', { rooms: ['tables', 'reservations', 'waitlist', 'dashboard'] });
+    });
+    socket.on('deltas', handleDeltas);
+    // Anything missed while disconnected is picked up by a full reload
+    socket.io.on('reconnect', fetchData);
+    return () => socket.disconnect();
   }, []);
 
   return (
@@ -274,12 +331,16 @@ function App() {
                               <Badge bg={
                                 res.status === 'confirmed' ? 'success' : 
                                 res.status === 'seated' ? 'primary' : 
-                                res.status === 'cancelled' ? 'danger' : 'warning'
+                                res.status === 'cancelled' || res.status === 'no_show' ? 'danger' : 'warning'
                               }>
                                 {res.status}
                               </Badge>
                             </td>
-                            <td>{res.table_id || 'Not assigned'}</td>
+                            <td>
+                              {!res.table_id ? 'Not assigned' :
+                                res.joined_table_ids ? `${res.table_id} + ${res.joined_table_ids.split(',').join(' + ')}` :
+                                res.table_id}
+                            </td>
                           </tr>
                         ))
                       ) : (